@@ -0,0 +1,44 @@
+"""add archived receipts
+
+Revision ID: a6c2e8f17d43
+Revises: f4b9d2a6c831
+Create Date: 2026-10-19 18:40:12.204518
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6c2e8f17d43'
+down_revision: Union[str, None] = 'f4b9d2a6c831'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('archived_receipts',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('public_id', sa.String(length=36), nullable=False),
+    sa.Column('payment_type', postgresql.ENUM('CASH', 'CASHLESS', name='paymenttype', create_type=False), nullable=False),
+    sa.Column('total_amount', sa.BigInteger(), nullable=False),
+    sa.Column('created', postgresql.TIMESTAMP(timezone=True), nullable=False),
+    sa.Column('archived', postgresql.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('payload', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('public_id')
+    )
+    op.create_index('ix_archived_receipts_user_id_created', 'archived_receipts', ['user_id', 'created'], unique=False)
+
+
+def downgrade() -> None:
+    # Payload is compressed by the app and can`t be moved back to receipts in SQL
+    if op.get_bind().execute(sa.text('SELECT EXISTS (SELECT 1 FROM archived_receipts)')).scalar():
+        raise RuntimeError('archived_receipts is not empty, downgrade would lose archived receipts')
+    op.drop_index('ix_archived_receipts_user_id_created', table_name='archived_receipts')
+    op.drop_table('archived_receipts')
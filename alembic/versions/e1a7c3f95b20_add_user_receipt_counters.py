@@ -0,0 +1,43 @@
+"""add user receipt counters
+
+Revision ID: e1a7c3f95b20
+Revises: b84e0d51c7a2
+Create Date: 2026-10-19 16:05:41.318224
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1a7c3f95b20'
+down_revision: Union[str, None] = 'b84e0d51c7a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('receipt_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column(
+        'users',
+        sa.Column('receipt_total_amount', sa.DECIMAL(precision=14, scale=2), server_default='0', nullable=False),
+    )
+    op.execute(
+        """
+        UPDATE users
+        SET receipt_count = counters.receipt_count, receipt_total_amount = counters.receipt_total_amount
+        FROM (
+            SELECT user_id, count(*) AS receipt_count, sum(total_amount) AS receipt_total_amount
+            FROM receipts
+            GROUP BY user_id
+        ) AS counters
+        WHERE users.id = counters.user_id
+        """,
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'receipt_total_amount')
+    op.drop_column('users', 'receipt_count')
@@ -0,0 +1,78 @@
+"""store money in cents
+
+Revision ID: f4b9d2a6c831
+Revises: e1a7c3f95b20
+Create Date: 2026-10-19 17:22:09.540183
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b9d2a6c831'
+down_revision: Union[str, None] = 'e1a7c3f95b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+RECEIPT_AMOUNTS = ('total_amount', 'payment_amount', 'rest_amount')
+
+
+def convert_products(amount: str) -> str:
+    """Query converting amounts of products JSON, amount is SQL expression of amount element"""
+    return f"""
+        UPDATE receipts
+        SET products = (
+            SELECT coalesce(
+                json_agg(
+                    json_build_object(
+                        'name', product->'name',
+                        'price', {amount.format(field='price')},
+                        'quantity', product->'quantity',
+                        'total', {amount.format(field='total')}
+                    )
+                    ORDER BY position
+                ),
+                '[]'::json
+            )
+            FROM json_array_elements(products) WITH ORDINALITY AS items(product, position)
+        )
+    """
+
+
+def upgrade() -> None:
+    for column in RECEIPT_AMOUNTS:
+        op.alter_column(
+            'receipts',
+            column,
+            type_=sa.BigInteger(),
+            postgresql_using=f'round({column} * 100)::bigint',
+        )
+    op.alter_column(
+        'users',
+        'receipt_total_amount',
+        type_=sa.BigInteger(),
+        server_default='0',
+        postgresql_using='round(receipt_total_amount * 100)::bigint',
+    )
+    op.execute(convert_products("round((product->>'{field}')::numeric * 100)::bigint"))
+
+
+def downgrade() -> None:
+    op.execute(convert_products("((product->>'{field}')::numeric / 100)::float8"))
+    op.alter_column(
+        'users',
+        'receipt_total_amount',
+        type_=sa.DECIMAL(precision=14, scale=2),
+        server_default='0',
+        postgresql_using='receipt_total_amount / 100.0',
+    )
+    for column in RECEIPT_AMOUNTS:
+        op.alter_column(
+            'receipts',
+            column,
+            type_=sa.DECIMAL(precision=10, scale=2),
+            postgresql_using=f'{column} / 100.0',
+        )
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 
-from app.api.dependencies import get_user_interactor, get_user_repo
-from app.core.security import create_access_token, get_current_user_id
+from app.api.dependencies import (get_current_active_user_id,
+                                  get_token_interactor, get_user_interactor)
+from app.core.security import get_current_user_id
+from app.interactors.auth_token import TokenInteractor
 from app.interactors.user import UserCreateDTO, UserInteractor, UserUpdateDTO
-from app.repositories.user import UserRepository
+from app.schemas.auth_token import TokenRefreshDTO
+from app.schemas.user import UserResponse
 
 router = APIRouter(tags=["users"])
 
@@ -25,6 +28,7 @@ async def register(
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     interactor: UserInteractor = Depends(get_user_interactor),
+    token_interactor: TokenInteractor = Depends(get_token_interactor),
 ):
     """Authenticate user with login and password"""
     user = await interactor.authenticate(form_data.username, form_data.password)
@@ -34,24 +38,28 @@ async def login(
             detail="Incorrect email or password",
         )
 
-    access_token, expiration_time = create_access_token(
-        data={"sub": str(user["id"])},
-    )
+    return await token_interactor.issue_tokens(user["id"])
 
-    return {
-        "access_token": access_token,
-        "expiration_time": expiration_time,
-        "token_type": "bearer",
-    }
+
+@router.post("/token/refresh")
+async def refresh_token(
+    data: TokenRefreshDTO,
+    token_interactor: TokenInteractor = Depends(get_token_interactor),
+):
+    """
+    Exchange refresh token for new access and refresh tokens.
+    Refresh token can be used only once. Reusing it revokes all tokens issued from the same login.
+    """
+    return await token_interactor.refresh(data.refresh_token)
 
 
-@router.get("/me")
+@router.get("/me", response_model=UserResponse)
 async def get_current_user(
     current_user_id: int = Depends(get_current_user_id),
-    repo: UserRepository = Depends(get_user_repo),
+    interactor: UserInteractor = Depends(get_user_interactor),
 ):
     """Get info about authenticated user. User need to be authorized"""
-    user = await repo.get_by_id(current_user_id)
+    user = await interactor.get_user(current_user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return user
@@ -60,7 +68,7 @@ async def get_current_user(
 @router.patch("/me")
 async def update_me(
     user_data: UserUpdateDTO,
-    current_user_id: int = Depends(get_current_user_id),
+    current_user_id: int = Depends(get_current_active_user_id),
     interactor: UserInteractor = Depends(get_user_interactor),
 ):
     """Update authenticated user`s info. User need to be authorized"""
@@ -1,11 +1,24 @@
-from fastapi import Depends
+from collections.abc import Awaitable, Callable
+from math import ceil
+
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
 
 from app.conf.settings import settings
+from app.core.rate_limit import TokenBucketLimiter, ip_limiter, user_limiter
+from app.core.security import get_current_user_id
+from app.core.timing import span
 from app.db.base import Database
+from app.interactors.auth_token import TokenInteractor
+from app.interactors.idempotency import IdempotencyInteractor
 from app.interactors.receipt import ReceiptInteractor
 from app.interactors.user import UserInteractor
-from app.repositories.receipt import ReceiptRepository
-from app.repositories.user import UserRepository
+from app.schemas.receipt import ReceiptCreateDTO
+from app.repositories.interfaces import AbstractUserRepository
+
+# Repositories and interactors are stateless between requests, so they are created once
+# with the app in app.main.init_dependencies and shared by all requests
 
 
 def get_db() -> Database:
@@ -13,21 +26,124 @@ def get_db() -> Database:
     return Database(settings.sqlalchemy_database_uri)
 
 
-def get_user_repo(db: Database = Depends(get_db)) -> UserRepository:
+def get_user_repo(request: Request) -> AbstractUserRepository:
     """Return user repo"""
-    return UserRepository(db)
+    return request.app.state.user_repo
 
 
-def get_user_interactor(repo: UserRepository = Depends(get_user_repo)) -> UserInteractor:
+def get_user_interactor(request: Request) -> UserInteractor:
     """Return user interactor"""
-    return UserInteractor(repo)
+    return request.app.state.user_interactor
 
 
-def get_receipt_repo(db: Database = Depends(get_db)) -> ReceiptRepository:
-    """Return receipt repo"""
-    return ReceiptRepository(db)
+def get_token_interactor(request: Request) -> TokenInteractor:
+    """Return token interactor"""
+    return request.app.state.token_interactor
 
 
-def get_receipt_interactor(repo: ReceiptRepository = Depends(get_receipt_repo)) -> ReceiptInteractor:
+def get_receipt_interactor(request: Request) -> ReceiptInteractor:
     """Return receipt interactor"""
-    return ReceiptInteractor(repo)
+    return request.app.state.receipt_interactor
+
+
+def get_idempotency_interactor(request: Request) -> IdempotencyInteractor:
+    """Return idempotency interactor"""
+    return request.app.state.idempotency_interactor
+
+
+async def get_current_active_user_id(
+    user_id: int = Depends(get_current_user_id),
+    interactor: UserInteractor = Depends(get_user_interactor),
+) -> int:
+    """Get user by token and check that user still exists and is active"""
+    with span("auth.user"):
+        user = await interactor.get_user(user_id)
+    if not user or user.is_active is False:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Inactive user",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user_id
+
+
+def check_rate_limit(limiter: TokenBucketLimiter, key: int | str, route: str) -> None:
+    """Take route cost from key`s bucket, raise 429 with Retry-After if it is empty"""
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+
+    retry_after = limiter.acquire(key, settings.RATE_LIMIT_COSTS.get(route, 1))
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers={"Retry-After": str(ceil(retry_after))},
+        )
+
+
+def user_rate_limit(route: str) -> Callable[..., Awaitable[None]]:
+    """Dependency limiting requests of authorized user to route"""
+
+    async def check(user_id: int = Depends(get_current_user_id)) -> None:
+        check_rate_limit(user_limiter, user_id, route)
+
+    return check
+
+
+def ip_rate_limit(route: str) -> Callable[..., Awaitable[None]]:
+    """Dependency limiting requests to public route by client ip"""
+
+    async def check(request: Request) -> None:
+        check_rate_limit(ip_limiter, request.client.host if request.client else "", route)
+
+    return check
+
+
+async def read_body(request: Request, max_bytes: int) -> bytearray:
+    """Read request body by chunks, raise 413 as soon as it exceeds max_bytes"""
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Request body is larger than {max_bytes} bytes",
+    )
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_bytes:
+        raise too_large
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise too_large
+    return body
+
+
+async def receipt_create_body(request: Request) -> ReceiptCreateDTO:
+    """
+    Receipt creation body read up to RECEIPT_MAX_BODY_BYTES and validated from raw JSON by pydantic-core
+    in one pass, without intermediate dicts FastAPI builds for body parameters
+    """
+    body = await read_body(request, settings.RECEIPT_MAX_BODY_BYTES)
+    with span("parse"):
+        try:
+            return ReceiptCreateDTO.model_validate_json(body)
+        except ValidationError as e:
+            raise RequestValidationError(
+                [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)],
+            ) from None
+
+
+def json_body_schema(model: type[BaseModel]) -> dict:
+    """OpenAPI request body of model parsed by dependency. Nested models are inlined"""
+    schema = model.model_json_schema()
+    definitions = schema.pop("$defs", {})
+
+    def inline(value):
+        if isinstance(value, dict):
+            if "$ref" in value:
+                return inline(definitions[value["$ref"].rsplit("/", 1)[-1]])
+            return {key: inline(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [inline(item) for item in value]
+        return value
+
+    return {"requestBody": {"required": True, "content": {"application/json": {"schema": inline(schema)}}}}
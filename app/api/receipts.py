@@ -1,36 +1,102 @@
 from datetime import date
 from decimal import Decimal
+from functools import partial
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
 from fastapi.responses import PlainTextResponse
 
-from app.api.dependencies import get_receipt_interactor
-from app.core.security import get_current_user_id
+from app.api.dependencies import (get_current_active_user_id,
+                                  get_idempotency_interactor,
+                                  get_receipt_interactor, ip_rate_limit,
+                                  json_body_schema, receipt_create_body,
+                                  user_rate_limit)
+from app.core.responses import PydanticJSONResponse, negotiated_response
+from app.interactors.idempotency import (IdempotencyInteractor,
+                                         request_fingerprint)
 from app.interactors.receipt import ReceiptInteractor
-from app.schemas.receipt import (PaymentType, ReceiptCreateDTO, ReceiptFilter,
+from app.schemas.receipt import (PaymentType, ReceiptAcceptedResponse,
+                                 ReceiptCreateDTO, ReceiptFilter,
+                                 ReceiptListItem, ReceiptListResponse,
                                  ReceiptResponse)
 
 router = APIRouter(tags=["receipts"])
 
 
-@router.post("/", response_model=ReceiptResponse)
+def select_fields(fields: str | None, *, include_products: bool) -> list[str]:
+    """Return receipt fields requested by client. Products are returned only if requested explicitly"""
+    if not fields:
+        selected = [field for field in ReceiptListItem.model_fields if field != "products"]
+    else:
+        selected = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+        unknown = [field for field in selected if field not in ReceiptListItem.model_fields]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(unknown)}",
+            )
+
+    if include_products and "products" not in selected:
+        selected.append("products")
+    return selected
+
+
+@router.post(
+    "/",
+    response_model=ReceiptResponse,
+    response_class=PydanticJSONResponse,
+    responses={status.HTTP_202_ACCEPTED: {"model": ReceiptAcceptedResponse}},
+    dependencies=[Depends(user_rate_limit("receipts.create"))],
+    openapi_extra=json_body_schema(ReceiptCreateDTO),
+)
 async def create_receipt(
-    receipt_data: ReceiptCreateDTO,
-    current_user_id: int = Depends(get_current_user_id),
+    receipt_data: ReceiptCreateDTO = Depends(receipt_create_body),
+    idempotency_key: str | None = Header(default=None, max_length=255),
+    prefer: str | None = Header(default=None),
+    current_user_id: int = Depends(get_current_active_user_id),
     interactor: ReceiptInteractor = Depends(get_receipt_interactor),
+    idempotency: IdempotencyInteractor = Depends(get_idempotency_interactor),
 ):
     """
     Creating receipt in db for current authorized user. Need to be authorized.
     Payment type can be CASH or CASHLESS.
+    Retries with the same Idempotency-Key header return the first created receipt instead of creating new one.
+    Retry with the same key in another mode, e.g. without "Prefer: respond-async", is rejected with 422 status.
+    With "Prefer: respond-async" header receipt is accepted with 202 status and written to db in background
+    if asynchronous creation is enabled. Such receipt has no id yet, but it is available by public_id.
+    Body larger than RECEIPT_MAX_BODY_BYTES is rejected with 413 status.
     """
+    if interactor.write_behind is not None and "respond-async" in (prefer or ""):
+        operation = partial(interactor.accept_receipt, current_user_id, receipt_data)
+        response_model, status_code = ReceiptAcceptedResponse, status.HTTP_202_ACCEPTED
+        mode = "respond-async"
+    else:
+        operation = partial(interactor.create_receipt, current_user_id, receipt_data)
+        response_model, status_code = ReceiptResponse, status.HTTP_200_OK
+        mode = ""
+
     try:
-        return await interactor.create_receipt(current_user_id, receipt_data)
+        if idempotency_key is None:
+            receipt = await operation()
+        else:
+            receipt = await idempotency.run(
+                user_id=current_user_id,
+                key=idempotency_key,
+                request_hash=request_fingerprint(receipt_data, mode),
+                operation=operation,
+                response_model=response_model,
+            )
+        return PydanticJSONResponse(receipt, status_code=status_code)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{e!r}")
 
 
-@router.get("/", response_model=dict)
-async def get_receipts(
+@router.get(
+    "/",
+    response_model=ReceiptListResponse,
+    response_class=PydanticJSONResponse,
+    dependencies=[Depends(user_rate_limit("receipts.list"))],
+)
+async def get_receipts(  # noqa: PLR0913
     date_from: date | None = None,
     date_to: date | None = None,
     min_amount: Decimal | None = Query(default=0, ge=0),
@@ -38,7 +104,13 @@ async def get_receipts(
     payment_type: PaymentType | None = None,
     limit: int = Query(default=10, ge=1, le=100),
     offset: int = Query(default=0, ge=0),
-    current_user_id: int = Depends(get_current_user_id),
+    fields: str | None = Query(
+        default=None,
+        description="Comma separated receipt fields, e.g. id,total_amount,created",
+    ),
+    include_products: bool = False,  # noqa: FBT001, FBT002
+    accept: str | None = Header(default=None),
+    current_user_id: int = Depends(get_current_active_user_id),
     interactor: ReceiptInteractor = Depends(get_receipt_interactor),
 ):
     """
@@ -47,6 +119,9 @@ async def get_receipts(
     Limit from 1 to 100.
     Payment type can be 'cash' or 'cashless'.
     Date formatted as "YYYY-MM-DD HH-MM-SS"
+    Only fields listed in `fields` are returned. Products are returned only with include_products=true
+    or if they are listed in `fields`.
+    With "Accept: application/msgpack" header page is returned in MessagePack.
     """
     filters = ReceiptFilter(
         date_from=date_from,
@@ -61,30 +136,42 @@ async def get_receipts(
         filters=filters,
         limit=limit,
         offset=offset,
+        fields=select_fields(fields, include_products=include_products),
     )
 
-    return {
-        "items": receipts,
-        "total": total,
-        "limit": limit,
-        "offset": offset,
-    }
+    # Items are validated already, so page is serialized once without FastAPI`s response_model revalidation
+    return negotiated_response(
+        ReceiptListResponse.model_construct(items=receipts, total=total, limit=limit, offset=offset),
+        accept,
+        exclude_unset=True,
+    )
 
 
-@router.get("/{receipt_id}", response_model=ReceiptResponse)
+@router.get(
+    "/{receipt_id}",
+    response_model=ReceiptResponse,
+    response_class=PydanticJSONResponse,
+    dependencies=[Depends(user_rate_limit("receipts.get"))],
+)
 async def get_receipt(
     receipt_id: int,
-    current_user_id: int = Depends(get_current_user_id),
+    accept: str | None = Header(default=None),
+    current_user_id: int = Depends(get_current_active_user_id),
     interactor: ReceiptInteractor = Depends(get_receipt_interactor),
 ):
     """
     Return receipt data by its id from db for current user.
     Need to be authorized.
+    With "Accept: application/msgpack" header receipt is returned in MessagePack.
     """
-    return await interactor.get_receipt(receipt_id, current_user_id)
+    return negotiated_response(await interactor.get_receipt(receipt_id, current_user_id), accept)
 
 
-@router.get("/public/{public_id}", response_class=PlainTextResponse)
+@router.get(
+    "/public/{public_id}",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(ip_rate_limit("receipts.public_text"))],
+)
 async def get_receipt_text(
     public_id: str,
     line_width: int = Query(default=32, ge=20, le=100),
@@ -0,0 +1,70 @@
+import os
+from secrets import compare_digest
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+
+from app.conf.settings import settings
+from app.core.shared_cache import caches_stats
+from app.interactors.receipt import receipt_list_cache, receipt_single_flight
+from app.repositories.receipt import archive_cache
+from app.core.worker_stats import max_rss_mb, read_workers_stats
+
+
+
+def check_status_token(x_status_token: str | None = Header(default=None)) -> None:
+    """Status is available only with token from settings, otherwise it pretends not to exist"""
+    if (
+        settings.STATUS_TOKEN is None
+        or x_status_token is None
+        or not compare_digest(x_status_token.encode(), settings.STATUS_TOKEN.encode())
+    ):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+
+router = APIRouter(tags=["status"], dependencies=[Depends(check_status_token)])
+
+
+@router.get("/", response_model=dict)
+async def get_status():
+    """
+    Return stats of all server workers and their totals.
+    Worker stats are updated once per second, single process server returns only its own memory
+    """
+    if settings.WORKER_STATS_DIR is None:
+        workers = [
+            {
+                "pid": os.getpid(),
+                "rss_mb": round(max_rss_mb(), 1),
+                "single_flight": receipt_single_flight.stats(),
+                "caches": caches_stats(),
+                "receipt_list_cache": receipt_list_cache.stats(),
+                "receipt_archive_cache": archive_cache.stats(),
+            },
+        ]
+    else:
+        workers = read_workers_stats(settings.WORKER_STATS_DIR)
+
+    return {
+        "workers": workers,
+        "total": {
+            "workers": len(workers),
+            "requests": sum(worker.get("requests", 0) for worker in workers),
+            "connections": sum(worker.get("connections", 0) for worker in workers),
+            "rss_mb": round(sum(worker["rss_mb"] for worker in workers), 1),
+            # Db requests avoided by joining identical in-flight reads
+            "single_flight_saved": sum(worker.get("single_flight", {}).get("saved", 0) for worker in workers),
+            "cache_hit_rates": cache_hit_rates(workers),
+        },
+    }
+
+
+def cache_hit_rates(workers: list[dict]) -> dict[str, float]:
+    """Hit rate of every cache namespace over all workers"""
+    hits: dict[str, int] = {}
+    lookups: dict[str, int] = {}
+    for worker in workers:
+        for namespace, stats in worker.get("caches", {}).items():
+            served = stats["l1_hits"] + stats["l2_hits"]
+            hits[namespace] = hits.get(namespace, 0) + served
+            lookups[namespace] = lookups.get(namespace, 0) + served + stats["misses"]
+    return {namespace: hits[namespace] / lookups[namespace] if lookups[namespace] else 0.0 for namespace in hits}
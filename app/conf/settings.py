@@ -13,23 +13,139 @@ class Env(str, Enum):
     TEST = "TEST"
 
 
+class StorageBackend(str, Enum):
+    """Where repositories keep data"""
+
+    POSTGRES = "postgres"
+    # Data of one process without persistence, for tests and benchmarks of non-db overhead
+    MEMORY = "memory"
+
+
 class Settings(BaseSettings):
     """Base settings for all environments"""
 
     SECRET_KEY: str = "some-secret-key"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
     JWT_ENCODE_ALGORITHM: str = "HS256"
+    # Amount of verified tokens kept in memory. 0 disables cache
+    JWT_CACHE_SIZE: int = 10000
+
+    # Shared cache tier, e.g. redis://localhost:6379/0. Without it caches are per process only
+    CACHE_REDIS_URL: str | None = None
+    # Other workers can`t invalidate in-process tier, so they see changes after this ttl at most
+    CACHE_L1_TTL_SECONDS: float = 5
+    # Early refresh aggressiveness, more than 1 refreshes earlier
+    CACHE_XFETCH_BETA: float = 1.0
+
+    # Cache of user profiles, invalidated on user`s changes. Sizes are of in-process tier
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: int = 300
+    # Receipts are never changed, so they are cached by id and public_id for long time
+    RECEIPT_CACHE_SIZE: int = 10000
+    RECEIPT_CACHE_TTL_SECONDS: int = 3600
+    # Pages of receipts lists cached in process per user until user creates receipt.
+    # Memory is bounded by total cached receipts, every user keeps limited amount of pages
+    RECEIPT_LIST_CACHE_MAX_ROWS: int = 100000
+    RECEIPT_LIST_CACHE_MAX_KEYS_PER_USER: int = 32
+    RECEIPT_LIST_CACHE_TTL_SECONDS: int = 600
+
+    IDEMPOTENCY_KEY_TTL_HOURS: int = 24
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
+    # How long duplicate request waits for the first one processed by another worker
+    IDEMPOTENCY_WAIT_TIMEOUT_SECONDS: float = 10
+    IDEMPOTENCY_POLL_INTERVAL_SECONDS: float = 0.05
+    IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS: int = 600
+
+    # Receipt creation body is read up to this size and rejected with 413 after it,
+    # wholesale receipts with 50000 products take about 4MB
+    RECEIPT_MAX_BODY_BYTES: int = 8 * 1024 * 1024
+
+    # Group commit: concurrent receipts inserts within window are written with one INSERT and one commit
+    RECEIPT_GROUP_COMMIT_ENABLED: bool = True
+    RECEIPT_BATCH_WINDOW_MS: float = 2
+    RECEIPT_BATCH_MAX_SIZE: int = 100
+
+    # Asynchronous receipts creation with "Prefer: respond-async" header
+    RECEIPT_WRITE_BEHIND_ENABLED: bool = False
+    RECEIPT_JOURNAL_PATH: Path = BASE_DIR.parent / "data" / "receipts.journal"
+    RECEIPT_WRITE_BEHIND_MAX_SIZE: int = 10000
+    RECEIPT_WRITE_BEHIND_BATCH_SIZE: int = 500
+    RECEIPT_WRITE_BEHIND_FLUSH_INTERVAL_SECONDS: float = 0.05
+
+    # Receipts older than this are moved to compressed archive by app.tools.archive_receipts job.
+    # Lists read archive only when page goes past recent receipts or dates filter reaches archived ones
+    RECEIPT_ARCHIVE_AFTER_DAYS: int = 365
+    RECEIPT_ARCHIVE_BATCH_SIZE: int = 1000
+    RECEIPT_ARCHIVE_COMPRESSION_LEVEL: int = 6
+    # Archived receipts never change, decompressed ones are kept in process without expiration
+    RECEIPT_ARCHIVE_CACHE_SIZE: int = 10000
+
+    # Token bucket per user (per ip for public routes): burst of tokens refilled with rate per second.
+    # Routes take cost tokens, heavy ones cost more
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_PER_SECOND: float = 20
+    RATE_LIMIT_BURST: float = 100
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    RATE_LIMIT_COSTS: dict[str, float] = {
+        "receipts.list": 5,
+        "receipts.create": 2,
+        "receipts.get": 1,
+        "receipts.public_text": 1,
+    }
 
     ENV: Env = Env.TEST
     DEBUG: bool = False
     PORT: int = 8080
 
+    # Multi-process server (python -m app.server). 0 workers means one per cpu, workers get resolved amount
+    WORKERS: int = 0
+    # Db connections of all workers together, every worker gets equal part as its pool size
+    DB_POOL_BUDGET: int = 500
+    # Worker is replaced after this amount of requests or peak memory to contain leaks. 0 disables limit
+    WORKER_MAX_REQUESTS: int = 100000
+    WORKER_MAX_MEMORY_MB: int = 1024
+    # Crashed worker is restarted after delay doubling with every crash of its slot up to max.
+    # Master exits with error when slot crashes this many times in a row within window, e.g. db is unreachable
+    WORKER_RESTART_DELAY_SECONDS: float = 0.5
+    WORKER_RESTART_MAX_DELAY_SECONDS: float = 30
+    WORKER_CRASH_LIMIT: int = 5
+    WORKER_CRASH_WINDOW_SECONDS: float = 60
+    # /api/status exposes pids, memory, db pool and caches internals. It answers 404 unless token is set
+    # and requests send it in X-Status-Token header
+    STATUS_TOKEN: str | None = None
+    # Workers write their stats here for /api/status. Master creates temporary dir if it is not set
+    WORKER_STATS_DIR: Path | None = None
+    # Set by master for every worker, replacement of exited worker gets the same slot.
+    # Worker writes write-behind journal of its slot, so workers don`t replay each other`s receipts
+    WORKER_SLOT: int | None = None
+
+    # Send timings of request parts in Server-Timing header. Exposes internals, so keep it off in production
+    SERVER_TIMING_ENABLED: bool = False
+    ACCESS_LOG_ENABLED: bool = True
+
+    # gzip or br (if brotli is installed) by Accept-Encoding. Smaller responses are not worth compressing
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    # Low quality is much faster and still smaller than gzip for dynamic responses
+    COMPRESSION_BROTLI_QUALITY: int = 4
+
+    STORAGE_BACKEND: StorageBackend = StorageBackend.POSTGRES
+
     POSTGRES_USER: str = "postgres"
     POSTGRES_PASSWORD: str = "postgres"
     POSTGRES_DB: str = "postgres"
     POSTGRES_HOST: str = "postgres"
     POSTGRES_PORT: int = 5432
 
+    DB_POOL_SIZE: int = 400
+    DB_MAX_OVERFLOW: int = 100
+    # Connections opened on startup, so first requests after deploy don`t pay for connection setup
+    DB_POOL_WARMUP_CONNECTIONS: int = 20
+    # Extra round trip on every checkout. Stale connections are mostly handled by pool recycle
+    DB_POOL_PRE_PING: bool = False
+
     DB_DRIVER: str = "postgresql+asyncpg"
     DB_DRIVER_SYNC: str = "postgresql+psycopg2"
 
@@ -0,0 +1,149 @@
+import zlib
+from collections.abc import Callable
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.timing import span
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def parse_qvalues(header: str) -> dict[str, float]:
+    """Parse Accept-like header to values with their quality, e.g. "gzip;q=0.5, br" to {"gzip": 0.5, "br": 1.0}"""
+    values = {}
+    for item in header.split(","):
+        value, *params = item.strip().split(";")
+        quality = 1.0
+        for param in params:
+            name, _, number = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        if value:
+            values[value.strip().lower()] = quality
+    return values
+
+
+class GzipEncoder:
+    """Incremental gzip compression"""
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes, *, final: bool) -> bytes:
+        """Compress chunk. Not final chunks are flushed, so client can decode them right away"""
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class BrotliEncoder:
+    """Incremental brotli compression"""
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, *, final: bool) -> bytes:
+        """Compress chunk. Not final chunks are flushed, so client can decode them right away"""
+        compressed = self._compressor.process(data)
+        return compressed + (self._compressor.finish() if final else self._compressor.flush())
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with br or gzip chosen by Accept-Encoding header.
+    Responses smaller than minimum_size are sent as is. Streaming responses are compressed chunk by chunk.
+    br is used only if brotli package is installed.
+    """
+
+    def __init__(self, app: ASGIApp, *, minimum_size: int, gzip_level: int, brotli_quality: int):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def choose_encoding(self, accept_encoding: str) -> str | None:
+        """Return most preferred supported encoding. br wins ties as it is more compact"""
+        qvalues = parse_qvalues(accept_encoding)
+        wildcard = qvalues.get("*", 0.0)
+        supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+
+        encoding = max(supported, key=lambda name: qvalues.get(name, wildcard))
+        return encoding if qvalues.get(encoding, wildcard) > 0 else None
+
+    def make_encoder(self, encoding: str) -> GzipEncoder | BrotliEncoder:
+        """Return compressor for encoding"""
+        if encoding == "br":
+            return BrotliEncoder(self.brotli_quality)
+        return GzipEncoder(self.gzip_level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:  # noqa: D102
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self.choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressionResponder(send, encoding, self.make_encoder, self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder:
+    """Compresses messages of one response"""
+
+    def __init__(
+        self,
+        send: Send,
+        encoding: str,
+        make_encoder: Callable[[str], GzipEncoder | BrotliEncoder],
+        minimum_size: int,
+    ):
+        self._send = send
+        self.encoding = encoding
+        self.make_encoder = make_encoder
+        self.minimum_size = minimum_size
+        self.start_message: Message | None = None
+        self.encoder: GzipEncoder | BrotliEncoder | None = None
+
+    async def send(self, message: Message) -> None:
+        """Hold response start until first body chunk, when it is known whether to compress"""
+        if message["type"] == "http.response.start":
+            self.start_message = message
+        elif message["type"] == "http.response.body" and self.start_message is not None:
+            await self.send_first_chunk(message)
+        elif message["type"] == "http.response.body" and self.encoder is not None:
+            more_body = message.get("more_body", False)
+            await self._send({**message, "body": self.encoder.compress(message.get("body", b""), final=not more_body)})
+        else:
+            if self.start_message is not None:
+                await self._send(self.start_message)
+                self.start_message = None
+            await self._send(message)
+
+    async def send_first_chunk(self, message: Message) -> None:
+        """Send headers with first body chunk compressed if response is streamed or big enough"""
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        headers = MutableHeaders(scope=self.start_message)
+        headers.add_vary_header("Accept-Encoding")
+
+        if "content-encoding" not in headers and (more_body or len(body) >= self.minimum_size):
+            self.encoder = self.make_encoder(self.encoding)
+            with span("compress"):
+                body = self.encoder.compress(body, final=not more_body)
+            headers["Content-Encoding"] = self.encoding
+            del headers["Content-Length"]
+            if not more_body:
+                headers["Content-Length"] = str(len(body))
+            message = {**message, "body": body}
+
+        await self._send(self.start_message)
+        self.start_message = None
+        await self._send(message)
@@ -33,6 +33,7 @@ async def http_error_handler(request: Request, exc: HTTPException):  # noqa: ARG
     return JSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail},
+        headers=exc.headers,
     )
 
 
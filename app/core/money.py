@@ -0,0 +1,79 @@
+"""
+Money is kept as integer amount of cents everywhere inside the app, in db it is stored in BIGINT columns.
+Decimal is used only at API edge: amounts are parsed from decimal numbers or strings exactly
+and returned as decimal strings with two digits after point.
+"""
+import re
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Annotated, Any
+
+from pydantic import BeforeValidator, Field, PlainSerializer, WithJsonSchema
+
+CENT = Decimal(1)
+# Amounts must fit into BIGINT columns
+MAX_CENTS = 2**63 - 1
+# Amounts with at most two decimal digits are parsed without Decimal, which is slow for large receipts
+PLAIN_AMOUNT = re.compile(r"(-?)(\d{1,16})(?:\.(\d{1,2}))?", re.ASCII)
+
+
+def to_cents(amount: Any) -> int:
+    """
+    Convert amount in currency units to cents. Floats are converted through their shortest repr,
+    so 10.1 is exactly 1010 cents. Fractions of cent are rounded half up like in db numeric columns
+    """
+    try:
+        if isinstance(amount, int) and not isinstance(amount, bool):
+            cents = Decimal(amount * 100)
+        elif isinstance(amount, str | float) and (match := PLAIN_AMOUNT.fullmatch(str(amount))):
+            sign, units, fraction = match.groups()
+            cents = int(units) * 100 + int((fraction or "").ljust(2, "0"))
+            return -cents if sign else cents
+        else:
+            value = amount if isinstance(amount, Decimal) else Decimal(str(amount))
+            cents = value.scaleb(2).quantize(CENT, rounding=ROUND_HALF_UP)
+    except (ArithmeticError, ValueError, TypeError):
+        raise ValueError(f"Invalid amount {amount!r}") from None
+    if not cents.is_finite() or abs(cents) > MAX_CENTS:
+        raise ValueError(f"Invalid amount {amount!r}")
+    return int(cents)
+
+
+def from_cents(cents: int) -> Decimal:
+    """Exact decimal amount of cents"""
+    return Decimal(cents).scaleb(-2)
+
+
+def format_cents(cents: int) -> str:
+    """Format cents as decimal string, e.g. 1050 as 10.50"""
+    units, rest = divmod(abs(cents), 100)
+    return f"{'-' if cents < 0 else ''}{units}.{rest:02d}"
+
+
+def _parse_cents(value: Any) -> int:
+    """Integers are already cents, decimals and strings are amounts in currency units"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    return to_cents(value)
+
+
+_decimal_json = PlainSerializer(format_cents, return_type=str, when_used="json")
+
+_input_metadata = (
+    BeforeValidator(to_cents),
+    _decimal_json,
+    WithJsonSchema({"anyOf": [{"type": "number"}, {"type": "string"}], "examples": ["10.50"]}),
+)
+
+# Amount from request in currency units, e.g. 10.5 or "10.50"
+MoneyInput = Annotated[int, *_input_metadata]
+
+# Amount from request greater than 0. Constraint is checked in pydantic-core after conversion to cents
+PositiveMoneyInput = Annotated[int, Field(gt=0), *_input_metadata]
+
+# Amount in cents inside the app, e.g. from db. It is returned in JSON as decimal string
+Money = Annotated[
+    int,
+    BeforeValidator(_parse_cents),
+    _decimal_json,
+    WithJsonSchema({"type": "string", "format": "decimal", "examples": ["10.50"]}),
+]
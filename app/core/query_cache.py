@@ -0,0 +1,190 @@
+from collections import OrderedDict
+from collections.abc import Hashable, Iterable
+from time import monotonic
+from typing import Any
+
+from app.core.resp import RespClient, RespError
+from app.logger import BaseLogger
+
+
+class VersionedQueryCache:
+    """
+    In-process cache of query results per user, invalidated in O(1) by bumping user`s version.
+    Results are cached with version they were loaded at, and reads with newer version drop them,
+    so stale results are never served. With client versions are kept in shared store and bump in one
+    worker invalidates results in all of them, otherwise versions are local to process. Local versions
+    can`t be bumped by other processes, so cache must be disabled if they write too.
+
+    Memory is bounded by total rows of cached results and every user keeps at most max_keys_per_user
+    results, so one user can`t evict everyone else. If shared store is unavailable results are not cached.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        *,
+        max_rows: int,
+        max_keys_per_user: int,
+        ttl: float,
+        client: RespClient | None = None,
+        enabled: bool = True,
+    ):
+        self.namespace = namespace
+        self.enabled = enabled
+        self.max_rows = max_rows
+        self.max_keys_per_user = max_keys_per_user
+        self.ttl = ttl
+        self.client = client
+        self.rows = 0
+
+        # (user_id, key) to result, its rows and monotonic expiration time in LRU order
+        self._entries: OrderedDict[tuple[int, Hashable], tuple[Any, int, float]] = OrderedDict()
+        # Keys of every user in LRU order and version their results were loaded at
+        self._user_keys: dict[int, OrderedDict[Hashable, None]] = {}
+        self._cached_versions: dict[int, int] = {}
+        # Versions of users if there is no shared store
+        self._local_versions: dict[int, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.version_errors = 0
+
+    def _version_key(self, user_id: int) -> str:
+        return f"{self.namespace}:version:{user_id}"
+
+    async def version(self, user_id: int) -> int | None:
+        """
+        Current version of user`s results. None if it is unknown because shared store is unavailable
+        or cache is disabled, then results are neither served nor cached
+        """
+        if not self.enabled:
+            return None
+        if self.client is None:
+            return self._local_versions.get(user_id, 0)
+
+        try:
+            version = await self.client.get(self._version_key(user_id))
+        except (OSError, TimeoutError, RespError) as e:
+            self._version_failed("get", e)
+            return None
+        try:
+            return int(version) if version is not None else 0
+        except ValueError as e:
+            self._version_failed("get", e)
+            return None
+
+    async def bump(self, user_id: int) -> None:
+        """Invalidate all cached results of user. Must be called after change is committed"""
+        if not self.enabled:
+            return
+        if self.client is None:
+            version = self._local_versions.get(user_id, 0) + 1
+            self._local_versions[user_id] = version
+        else:
+            try:
+                version = await self.client.incr(self._version_key(user_id))
+            except (OSError, TimeoutError, RespError) as e:
+                # Other workers can serve stale results until their ttl
+                self._version_failed("bump", e)
+                self._drop_user(user_id)
+                return
+
+        self._sync_version(user_id, version)
+
+    async def bump_many(self, user_ids: Iterable[int]) -> None:
+        """Invalidate cached results of users"""
+        for user_id in user_ids:
+            await self.bump(user_id)
+
+    def get(self, user_id: int, version: int | None, key: Hashable) -> Any:
+        """Return result cached at version or None"""
+        if version is None or not self._sync_version(user_id, version):
+            self.misses += 1
+            return None
+
+        entry = self._entries.get((user_id, key))
+        if entry is None or entry[2] <= monotonic():
+            if entry is not None:
+                self._remove((user_id, key))
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end((user_id, key))
+        self._user_keys[user_id].move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, user_id: int, version: int | None, key: Hashable, value: Any, rows: int) -> None:
+        """Cache result loaded at version. Results of outdated versions are skipped"""
+        if version is None or rows > self.max_rows or not self._sync_version(user_id, version):
+            return
+
+        if (user_id, key) in self._entries:
+            self._remove((user_id, key))
+
+        self._entries[(user_id, key)] = (value, rows, monotonic() + self.ttl)
+        self._user_keys.setdefault(user_id, OrderedDict())[key] = None
+        self._cached_versions[user_id] = version
+        self.rows += rows
+
+        user_keys = self._user_keys[user_id]
+        while len(user_keys) > self.max_keys_per_user:
+            self._remove((user_id, next(iter(user_keys))))
+        while self.rows > self.max_rows:
+            self._remove(next(iter(self._entries)))
+
+    def _sync_version(self, user_id: int, version: int) -> bool:
+        """Drop results of older versions. Returns False if version itself is outdated"""
+        cached = self._cached_versions.get(user_id)
+        if cached is not None and version < cached:
+            return False
+        if cached is not None and version > cached:
+            self._drop_user(user_id)
+            self.invalidations += 1
+        return True
+
+    def _remove(self, entry_key: tuple[int, Hashable]) -> None:
+        """Remove one result"""
+        _, rows, _ = self._entries.pop(entry_key)
+        self.rows -= rows
+
+        user_id, key = entry_key
+        user_keys = self._user_keys[user_id]
+        del user_keys[key]
+        if not user_keys:
+            del self._user_keys[user_id]
+            # Version is read on every lookup, so it is not needed without results
+            self._cached_versions.pop(user_id, None)
+
+    def _drop_user(self, user_id: int) -> None:
+        """Remove all results of user"""
+        for key in list(self._user_keys.get(user_id, ())):
+            self._remove((user_id, key))
+
+    def _version_failed(self, operation: str, error: Exception) -> None:
+        self.version_errors += 1
+        BaseLogger.log(
+            {"text": f"Query cache version {operation} failed", "namespace": self.namespace, "error": repr(error)},
+            level="error",
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of lookups served from cache"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        """Cache metrics"""
+        return {
+            "enabled": self.enabled,
+            "keys": len(self._entries),
+            "users": len(self._user_keys),
+            "rows": self.rows,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "version_errors": self.version_errors,
+            "hit_rate": self.hit_rate,
+        }
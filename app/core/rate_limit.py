@@ -0,0 +1,70 @@
+from collections import OrderedDict
+from collections.abc import Hashable
+from time import monotonic
+
+from app.conf.settings import settings
+
+
+class TokenBucketLimiter:
+    """
+    In-process token bucket rate limiter. Every key has bucket of capacity tokens refilled with rate
+    tokens per second, request takes cost tokens. Limits are per process, so with several workers
+    client gets up to workers times more.
+    Bucket idle long enough to be refilled completely is the same as missing one, so such buckets
+    are evicted. If there are too many keys, least recently used bucket is evicted anyway.
+    """
+
+    def __init__(self, rate: float, capacity: float, max_keys: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self.full_after = capacity / rate
+        self.rejected = 0
+        # Key to tokens left and time of last update. Ordered by update time, oldest first
+        self._buckets: OrderedDict[Hashable, tuple[float, float]] = OrderedDict()
+
+    def __len__(self) -> int:  # noqa: D105
+        return len(self._buckets)
+
+    def acquire(self, key: Hashable, cost: float = 1) -> float:
+        """Take cost tokens from key`s bucket. Returns 0 if allowed, otherwise seconds to wait"""
+        now = monotonic()
+        self._evict(now)
+
+        tokens, updated = self._buckets.pop(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+        # Request more expensive than whole bucket would never pass otherwise
+        cost = min(cost, self.capacity)
+
+        if tokens >= cost:
+            self._buckets[key] = (tokens - cost, now)
+            return 0.0
+
+        self._buckets[key] = (tokens, now)
+        self.rejected += 1
+        return (cost - tokens) / self.rate
+
+    def _evict(self, now: float) -> None:
+        """Remove refilled buckets and least recently used ones over max_keys"""
+        while self._buckets:
+            _, updated = next(iter(self._buckets.values()))
+            if now - updated < self.full_after and len(self._buckets) < self.max_keys:
+                return
+            self._buckets.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Limiter metrics"""
+        return {"keys": len(self._buckets), "max_keys": self.max_keys, "rejected": self.rejected}
+
+
+# Authorized requests are limited by user id, public ones by client ip
+user_limiter = TokenBucketLimiter(
+    rate=settings.RATE_LIMIT_PER_SECOND,
+    capacity=settings.RATE_LIMIT_BURST,
+    max_keys=settings.RATE_LIMIT_MAX_KEYS,
+)
+ip_limiter = TokenBucketLimiter(
+    rate=settings.RATE_LIMIT_PER_SECOND,
+    capacity=settings.RATE_LIMIT_BURST,
+    max_keys=settings.RATE_LIMIT_MAX_KEYS,
+)
@@ -0,0 +1,250 @@
+"""
+Minimal client of Redis protocol (RESP2) for shared cache and in-memory stand-in server
+implementing the same commands, so tests, benchmarks and local runs don`t need Redis.
+
+Stand-in server usage:
+    python -m app.core.resp [--port 6379]
+"""
+import argparse
+import asyncio
+import contextlib
+from time import monotonic
+from urllib.parse import urlparse
+
+Reply = bytes | str | int | list | None
+
+
+class RespError(Exception):
+    """Error reply of server"""
+
+
+def encode_command(*args: bytes | str | int) -> bytes:
+    """Encode command as RESP array of bulk strings"""
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+def parse_int(data: bytes) -> int:
+    """Integer of reply line. Malformed one means connection is out of sync"""
+    try:
+        return int(data)
+    except ValueError as e:
+        raise ConnectionError(f"Malformed reply {data!r}") from e
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Reply:
+    """
+    Read one reply. Error replies are returned as RespError instances.
+    Connection closed in the middle of reply or malformed reply raise ConnectionError
+    """
+    line = await reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("Connection closed")
+
+    kind, data = line[:1], line[1:-2]
+    if kind == b"+":
+        return data.decode()
+    if kind == b"-":
+        return RespError(data.decode())
+    if kind == b":":
+        return parse_int(data)
+    if kind == b"$":
+        length = parse_int(data)
+        if length == -1:
+            return None
+        try:
+            return (await reader.readexactly(length + 2))[:-2]
+        except asyncio.IncompleteReadError as e:
+            raise ConnectionError("Connection closed") from e
+    if kind == b"*":
+        length = parse_int(data)
+        return None if length == -1 else [await read_reply(reader) for _ in range(length)]
+    raise RespError(f"Unknown reply type {kind!r}")
+
+
+class RespClient:
+    """Async client with small pool of connections. Every command takes connection for its round trip"""
+
+    def __init__(self, host: str, port: int, db: int = 0, pool_size: int = 10, timeout: float = 1.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.timeout = timeout
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots = asyncio.Semaphore(pool_size)
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RespClient":
+        """Create client from url like redis://host:port/db"""
+        parsed = urlparse(url)
+        db = int(parsed.path.lstrip("/") or 0)
+        return cls(parsed.hostname or "localhost", parsed.port or 6379, db=db, **kwargs)
+
+    async def _connect(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """Open new connection and select db"""
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        if self.db:
+            writer.write(encode_command("SELECT", self.db))
+            reply = await read_reply(reader)
+            if isinstance(reply, RespError):
+                writer.close()
+                raise reply
+        return reader, writer
+
+    async def execute(self, *args: bytes | str | int) -> Reply:
+        """Send command and return its reply. Raises RespError on error reply"""
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else None
+            try:
+                async with asyncio.timeout(self.timeout):
+                    reader, writer = connection or await self._connect()
+                    connection = reader, writer
+                    writer.write(encode_command(*args))
+                    reply = await read_reply(reader)
+            except BaseException:
+                # Connection state is unknown after failure, so it is not reused
+                if connection is not None:
+                    connection[1].close()
+                raise
+
+            self._idle.append(connection)
+
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+
+    async def get(self, key: str) -> bytes | None:
+        """Return value of key"""
+        return await self.execute("GET", key)
+
+    async def set(self, key: str, value: bytes, ttl_ms: int | None = None) -> None:
+        """Set value of key with optional ttl in milliseconds"""
+        if ttl_ms is None:
+            await self.execute("SET", key, value)
+        else:
+            await self.execute("SET", key, value, "PX", ttl_ms)
+
+    async def delete(self, *keys: str) -> int:
+        """Delete keys. Returns amount of deleted keys"""
+        return await self.execute("DEL", *keys)
+
+    async def incr(self, key: str) -> int:
+        """Increment integer value of key and return new value"""
+        return await self.execute("INCR", key)
+
+    async def ping(self) -> bool:
+        """Check connection"""
+        return await self.execute("PING") == "PONG"
+
+    async def close(self) -> None:
+        """Close idle connections"""
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+            with contextlib.suppress(OSError):
+                await writer.wait_closed()
+
+
+class RespServer:
+    """In-memory stand-in of Redis supporting PING, SELECT, GET, SET with EX/PX, INCR, DEL, DBSIZE and FLUSHALL"""
+
+    def __init__(self):
+        # Key to value and monotonic expiration time or None
+        self.data: dict[bytes, tuple[bytes, float | None]] = {}
+        self.server: asyncio.Server | None = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Start serving. Returns bound port"""
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        """Stop serving"""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve commands of one connection"""
+        try:
+            while True:
+                command = await read_reply(reader)
+                writer.write(self.run(command))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def run(self, command: Reply) -> bytes:  # noqa: PLR0911
+        """Run command and return encoded reply"""
+        if not isinstance(command, list) or not command:
+            return b"-ERR protocol error\r\n"
+
+        name, *args = command
+        name = name.upper()
+        if name == b"PING":
+            return b"+PONG\r\n"
+        if name in (b"SELECT", b"FLUSHALL"):
+            if name == b"FLUSHALL":
+                self.data.clear()
+            return b"+OK\r\n"
+        if name == b"GET":
+            value = self.get(args[0])
+            return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+        if name == b"SET":
+            return self.set(args)
+        if name == b"INCR":
+            return self.incr(args[0])
+        if name == b"DEL":
+            return b":%d\r\n" % sum(self.data.pop(key, None) is not None for key in args)
+        if name == b"DBSIZE":
+            return b":%d\r\n" % len(self.data)
+        return b"-ERR unknown command '%s'\r\n" % name
+
+    def get(self, key: bytes) -> bytes | None:
+        """Return value if it is not expired"""
+        item = self.data.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires <= monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    def incr(self, key: bytes) -> bytes:
+        """Increment integer value, keeping its expiration"""
+        value, expires = (self.get(key) and self.data[key]) or (b"0", None)
+        if not value.lstrip(b"-").isdigit():
+            return b"-ERR value is not an integer or out of range\r\n"
+        value = b"%d" % (int(value) + 1)
+        self.data[key] = (value, expires)
+        return b":%s\r\n" % value
+
+    def set(self, args: list[bytes]) -> bytes:
+        """SET key value [EX seconds | PX milliseconds]"""
+        key, value, *options = args
+        expires = None
+        if options:
+            unit, amount = options[0].upper(), int(options[1])
+            expires = monotonic() + (amount if unit == b"EX" else amount / 1000)
+        self.data[key] = (value, expires)
+        return b"+OK\r\n"
+
+
+async def serve(port: int) -> None:
+    """Run stand-in server forever"""
+    server = RespServer()
+    await server.start(port=port)
+    print(f"Stand-in Redis server is listening on 127.0.0.1:{port}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=6379)
+    asyncio.run(serve(parser.parse_args().port))
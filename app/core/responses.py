@@ -0,0 +1,82 @@
+from typing import Any
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from pydantic_core import to_json, to_jsonable_python
+
+from app.core.compression import parse_qvalues
+from app.core.timing import span
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+class PydanticJSONResponse(JSONResponse):
+    """
+    JSON response serialized by pydantic-core in a single pass.
+    Models are expected to be validated already, so they are dumped as is without revalidation.
+    Decimals and datetimes are encoded the same way as in FastAPI`s default response.
+    With exclude_unset models are dumped without fields that were not set, e.g. not selected columns.
+    """
+
+    # Explicit status_code default is read by FastAPI for OpenAPI schema
+    def __init__(self, content: Any, status_code: int = 200, *args, exclude_unset: bool = False, **kwargs):
+        self.exclude_unset = exclude_unset
+        super().__init__(content, status_code, *args, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        """Serialize content to JSON bytes"""
+        with span("serialize"):
+            if isinstance(content, BaseModel):
+                return content.__pydantic_serializer__.to_json(content, exclude_unset=self.exclude_unset)
+            return to_json(content)
+
+
+class MsgPackResponse(Response):
+    """
+    MessagePack response. Values are converted the same way as in PydanticJSONResponse,
+    so decimals and datetimes are strings and clients decode both encodings identically.
+    """
+
+    media_type = "application/msgpack"
+
+    # Explicit status_code default is read by FastAPI for OpenAPI schema
+    def __init__(self, content: Any, status_code: int = 200, *args, exclude_unset: bool = False, **kwargs):
+        self.exclude_unset = exclude_unset
+        super().__init__(content, status_code, *args, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        """Serialize content to MessagePack bytes"""
+        with span("serialize"):
+            if isinstance(content, BaseModel):
+                content = content.model_dump(mode="json", exclude_unset=self.exclude_unset)
+            else:
+                content = to_jsonable_python(content)
+            return msgpack.packb(content)
+
+
+def accepts_msgpack(accept: str | None) -> bool:
+    """Check if client prefers MessagePack to JSON. Always False if msgpack package is not installed"""
+    if msgpack is None or not accept:
+        return False
+
+    qvalues = parse_qvalues(accept)
+    msgpack_quality = max(qvalues.get(media_type, 0.0) for media_type in MSGPACK_MEDIA_TYPES)
+    json_quality = max(qvalues.get("application/json", 0.0), qvalues.get("*/*", 0.0))
+    return msgpack_quality > 0 and msgpack_quality >= json_quality
+
+
+def negotiated_response(
+    content: Any,
+    accept: str | None,
+    *,
+    exclude_unset: bool = False,
+    **kwargs,
+) -> PydanticJSONResponse | MsgPackResponse:
+    """Return MessagePack response if client accepts it, otherwise JSON response"""
+    response_class = MsgPackResponse if accepts_msgpack(accept) else PydanticJSONResponse
+    return response_class(content, exclude_unset=exclude_unset, **kwargs)
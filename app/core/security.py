@@ -1,4 +1,7 @@
+import hashlib
+import secrets
 from datetime import UTC, datetime, timedelta
+from time import time
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
@@ -6,9 +9,12 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from app.conf.settings import settings
+from app.core.cache import LRUCache
+from app.core.timing import span
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/users/login")
+token_cache = LRUCache(maxsize=settings.JWT_CACHE_SIZE)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -29,18 +35,59 @@ def create_access_token(data: dict) -> tuple[str, datetime]:
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.JWT_ENCODE_ALGORITHM), expire
 
 
+def create_refresh_token() -> tuple[str, str, datetime]:
+    """Create random refresh token. Return token, its digest for storing in db and expiration time"""
+    token = secrets.token_urlsafe(48)
+    expire = datetime.now(UTC) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    return token, hash_refresh_token(token), expire
+
+
+def hash_refresh_token(token: str) -> str:
+    """
+    Return refresh token digest.
+    Token is random with high entropy, so fast sha256 is enough instead of bcrypt
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def decode_access_token(token: str) -> int | None:
+    """
+    Return user id from access token or None if token is invalid.
+    Verified tokens are cached by digest until their expiration, so repeated calls skip jwt.decode
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    cached = token_cache.get(key)
+    if cached is not None:
+        user_id, expire = cached
+        if expire > time():
+            return user_id
+        token_cache.pop(key)
+
+    try:
+        # Token without expiration would be valid forever, so it is rejected
+        payload = jwt.decode(
+            token,
+            settings.SECRET_KEY,
+            algorithms=[settings.JWT_ENCODE_ALGORITHM],
+            options={"require_exp": True},
+        )
+        user_id = int(payload["sub"])
+        expire = float(payload["exp"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        return None
+
+    token_cache.set(key, (user_id, expire))
+    return user_id
+
+
 async def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
     """Get user by token"""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.JWT_ENCODE_ALGORITHM])
-        user_id: int = int(payload.get("sub"))
-        if user_id is None:
-            raise credentials_exception
-        return user_id  # noqa: TRY300
-    except JWTError:
-        raise credentials_exception
+    with span("auth"):
+        user_id = decode_access_token(token)
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user_id
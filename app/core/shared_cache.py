@@ -0,0 +1,283 @@
+import math
+import random
+import struct
+import zlib
+from collections.abc import Awaitable, Callable, Hashable
+from itertools import count
+from time import perf_counter, time
+from typing import Any
+
+from pydantic import TypeAdapter
+
+from app.conf.settings import settings
+from app.core.cache import LRUCache, TTLCache
+from app.core.query_cache import VersionedQueryCache
+from app.core.resp import RespClient, RespError
+from app.core.single_flight import SingleFlight
+from app.logger import BaseLogger
+
+# Expiration time, load time and flags before serialized value
+HEADER = struct.Struct("!ddB")
+COMPRESSED = 1
+COMPRESS_MIN_SIZE = 512
+
+# Caches of process created by make_cache by namespace, for stats
+caches: dict[str, "TwoTierCache"] = {}
+
+
+class TwoTierCache:
+    """
+    Cache with in-process L1 and optional L2 shared by all workers through Redis protocol.
+    L1 ttl is short, since other workers can`t invalidate it, L2 keeps values for full ttl.
+    Values are stored as JSON of value_type, compressed if they are big.
+
+    get_or_load protects from stampede in two ways: concurrent loads of one key in process are
+    coalesced, and values are refreshed early with probability growing towards expiration (XFetch),
+    so usually one request reloads hot key before it expires for everyone.
+    L2 errors are logged and cache works as L1 only until shared store is back.
+
+    delete bumps invalidation generation of key, in process and in L2 for other workers. Load stores its
+    value only if generation didn`t change while loader ran, so value read before change is not cached
+    after invalidation.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        value_type: Any,
+        *,
+        ttl: float,
+        l1_size: int,
+        l1_ttl: float,
+        client: RespClient | None = None,
+        beta: float = 1.0,
+    ):
+        self.namespace = namespace
+        self.adapter = TypeAdapter(value_type)
+        self.ttl = ttl
+        self.l1 = TTLCache(maxsize=l1_size, ttl=min(l1_ttl, ttl))
+        self.client = client
+        self.beta = beta
+        self.single_flight = SingleFlight()
+        # Generation of key is set from global counter on every delete. Evicted key has no generation,
+        # which only makes running loads skip caching, so memory is bounded safely
+        self._generations = LRUCache(maxsize=l1_size)
+        self._generation_counter = count(1)
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+        self.early_refreshes = 0
+        self.l2_errors = 0
+        self.stale_loads = 0
+
+    def encode(self, value: Any, expires: float, delta: float) -> bytes:
+        """Serialize value with its expiration and load time"""
+        data = self.adapter.dump_json(value)
+        flags = 0
+        if len(data) >= COMPRESS_MIN_SIZE:
+            data = zlib.compress(data, 1)
+            flags |= COMPRESSED
+        return HEADER.pack(expires, delta, flags) + data
+
+    def decode(self, payload: bytes) -> tuple[Any, float, float]:
+        """Return value, its expiration and load time"""
+        expires, delta, flags = HEADER.unpack_from(payload)
+        data = payload[HEADER.size:]
+        if flags & COMPRESSED:
+            data = zlib.decompress(data)
+        return self.adapter.validate_json(data), expires, delta
+
+    def _key(self, key: Hashable) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _generation_key(self, key: Hashable) -> str:
+        return f"{self.namespace}:generation:{key}"
+
+    async def _generation(self, key: Hashable) -> tuple[int, int | None]:
+        """Invalidation generation of key in process and in L2. L2 one is None if it is unknown"""
+        local = self._generations.get(key, 0)
+        if self.client is None:
+            return local, 0
+        try:
+            shared = await self.client.get(self._generation_key(key))
+            return local, int(shared or 0)
+        except (OSError, TimeoutError, RespError, ValueError) as e:
+            self._l2_failed("generation", e)
+            return local, None
+
+    async def _get_entry(self, key: Hashable) -> tuple[Any, float, float] | None:
+        """Return value with expiration and load time from L1 or L2"""
+        entry = self.l1.get(key)
+        if entry is not None:
+            self.l1_hits += 1
+            return entry
+
+        if self.client is not None:
+            try:
+                payload = await self.client.get(self._key(key))
+            except (OSError, TimeoutError, RespError) as e:
+                self._l2_failed("get", e)
+                payload = None
+            if payload is not None:
+                try:
+                    entry = self.decode(payload)
+                except (struct.error, zlib.error, ValueError) as e:
+                    # Corrupted or written by incompatible version, it is overwritten by the next load
+                    self._l2_failed("decode", e)
+                    entry = None
+                if entry is not None and entry[1] > time():
+                    self.l2_hits += 1
+                    self.l1.set(key, entry)
+                    return entry
+
+        self.misses += 1
+        return None
+
+    async def get(self, key: Hashable) -> Any:
+        """Return cached value or None"""
+        entry = await self._get_entry(key)
+        return entry[0] if entry is not None and entry[1] > time() else None
+
+    async def set(self, key: Hashable, value: Any, delta: float = 0.0) -> None:
+        """Store value in both tiers"""
+        expires = time() + self.ttl
+        self.l1.set(key, (value, expires, delta))
+        if self.client is not None:
+            try:
+                await self.client.set(self._key(key), self.encode(value, expires, delta), int(self.ttl * 1000))
+            except (OSError, TimeoutError, RespError) as e:
+                self._l2_failed("set", e)
+
+    async def delete(self, key: Hashable) -> None:
+        """
+        Invalidate value. Loads running now don`t cache their results and new calls don`t join them.
+        Other workers may still serve it from their L1 until its short ttl
+        """
+        self._generations.set(key, next(self._generation_counter))
+        self.single_flight.forget(key)
+        self.l1.pop(key)
+        if self.client is not None:
+            try:
+                await self.client.incr(self._generation_key(key))
+                await self.client.delete(self._key(key))
+            except (OSError, TimeoutError, RespError) as e:
+                self._l2_failed("delete", e)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return cached value or load and cache it. None values are not cached"""
+        entry = await self._get_entry(key)
+        if entry is not None:
+            value, expires, delta = entry
+            # XFetch: -log(random) is exponentially distributed, so refresh happens earlier for slow loads
+            if time() - delta * self.beta * math.log(1.0 - random.random()) < expires:  # noqa: S311
+                return value
+            self.early_refreshes += 1
+
+        return await self.single_flight.do(key, lambda: self._load(key, loader))
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Load value and store it with its load time unless key was invalidated meanwhile"""
+        generation = await self._generation(key)
+        start = perf_counter()
+        value = await loader()
+        if value is None:
+            return value
+
+        if generation[1] is None:
+            # Shared store is unavailable, so invalidations of other workers are unknown and value is kept
+            # only in short-lived L1
+            if self._generations.get(key, 0) == generation[0]:
+                self.l1.set(key, (value, time() + self.ttl, perf_counter() - start))
+            else:
+                self.stale_loads += 1
+            return value
+
+        if await self._generation(key) != generation:
+            self.stale_loads += 1
+            return value
+        await self.set(key, value, perf_counter() - start)
+        # Invalidation could run while value was stored and its delete could reach L2 before the set
+        if await self._generation(key) != generation:
+            self.stale_loads += 1
+            self.l1.pop(key)
+            if self.client is not None:
+                try:
+                    await self.client.delete(self._key(key))
+                except (OSError, TimeoutError, RespError) as e:
+                    self._l2_failed("delete", e)
+        return value
+
+    def _l2_failed(self, operation: str, error: Exception) -> None:
+        self.l2_errors += 1
+        BaseLogger.log(
+            {"text": f"Shared cache {operation} failed", "namespace": self.namespace, "error": repr(error)},
+            level="error",
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of lookups served from any tier"""
+        lookups = self.l1_hits + self.l2_hits + self.misses
+        return (self.l1_hits + self.l2_hits) / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        """Cache metrics"""
+        return {
+            "l1_size": len(self.l1),
+            "l1_hits": self.l1_hits,
+            "l2_hits": self.l2_hits,
+            "misses": self.misses,
+            "early_refreshes": self.early_refreshes,
+            "l2_errors": self.l2_errors,
+            "stale_loads": self.stale_loads,
+            "hit_rate": self.hit_rate,
+        }
+
+
+# Shared tier is used only if it is configured. Connections are opened on first use
+shared_cache_client = RespClient.from_url(settings.CACHE_REDIS_URL) if settings.CACHE_REDIS_URL else None
+
+
+def make_cache(namespace: str, value_type: Any, *, ttl: float, l1_size: int) -> TwoTierCache:
+    """Create cache with shared tier and early refresh configured in settings and register it for stats"""
+    caches[namespace] = TwoTierCache(
+        namespace,
+        value_type,
+        ttl=ttl,
+        l1_size=l1_size,
+        l1_ttl=settings.CACHE_L1_TTL_SECONDS,
+        client=shared_cache_client,
+        beta=settings.CACHE_XFETCH_BETA,
+    )
+    return caches[namespace]
+
+
+def query_cache_enabled() -> bool:
+    """
+    Versions of query caches are shared by workers only through shared tier. Without it bump in one worker
+    doesn`t reach others and they would serve stale results, so query caches work only in single process
+    """
+    return shared_cache_client is not None or settings.WORKER_SLOT is None or settings.WORKERS == 1
+
+
+def make_query_cache(namespace: str, *, max_rows: int, max_keys_per_user: int, ttl: float) -> VersionedQueryCache:
+    """Create query cache with versions in shared tier if it is configured, disabled if versions can`t be shared"""
+    return VersionedQueryCache(
+        namespace,
+        max_rows=max_rows,
+        max_keys_per_user=max_keys_per_user,
+        ttl=ttl,
+        client=shared_cache_client,
+        enabled=query_cache_enabled(),
+    )
+
+
+def caches_stats() -> dict[str, dict]:
+    """Stats of all caches of process by namespace"""
+    return {namespace: cache.stats() for namespace, cache in caches.items()}
+
+
+async def close_shared_cache() -> None:
+    """Close connections to shared tier"""
+    if shared_cache_client is not None:
+        await shared_cache_client.close()
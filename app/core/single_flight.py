@@ -0,0 +1,46 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import TypeVar
+
+Result = TypeVar("Result")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: while call with some key is in flight, other calls with
+    the same key wait for it and get its result or exception instead of running again.
+    Call runs in its own task, so cancellation of the first caller doesn`t cancel the others.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.saved = 0
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Result]]) -> Result:
+        """Run func or join in-flight call with the same key"""
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.calls += 1
+        else:
+            self.saved += 1
+        return await asyncio.shield(task)
+
+    def forget(self, key: Hashable) -> None:
+        """Let next calls with key run again instead of joining in-flight call, e.g. its result is outdated"""
+        self._tasks.pop(key, None)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        """Remove finished call, so next calls run again"""
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # All callers may be cancelled already, so mark exception as retrieved
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        """Amount of calls run and calls served by other in-flight calls"""
+        return {"in_flight": len(self._tasks), "calls": self.calls, "saved": self.saved}
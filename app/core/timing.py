@@ -0,0 +1,90 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.logger import BaseLogger
+
+# Spans of current request as (name, duration in ms). None outside of request
+_spans: ContextVar[list[tuple[str, float]] | None] = ContextVar("server_timing_spans", default=None)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Measure duration of code block and record it in current request timings"""
+    spans = _spans.get()
+    if spans is None:
+        yield
+        return
+
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((name, (perf_counter() - start) * 1000))
+
+
+def format_server_timing(spans: list[tuple[str, float]], total: float) -> str:
+    """Format spans as Server-Timing header value. Spans with the same name are summed up"""
+    durations: dict[str, list[float]] = {}
+    for name, duration in spans:
+        durations.setdefault(name, []).append(duration)
+
+    metrics = []
+    for name, values in durations.items():
+        metric = f"{name};dur={sum(values):.2f}"
+        if len(values) > 1:
+            metric += f';desc="{len(values)} calls"'
+        metrics.append(metric)
+    metrics.append(f"total;dur={total:.2f}")
+    return ", ".join(metrics)
+
+
+class ServerTimingMiddleware:
+    """
+    Collect timings of request parts: auth, db operations, interactors logic and serialization.
+    Timings are sent in Server-Timing header if enabled and written to access log.
+    """
+
+    def __init__(self, app: ASGIApp, logger: BaseLogger, *, emit_header: bool, access_log: bool):
+        self.app = app
+        self.logger = logger
+        self.emit_header = emit_header
+        self.access_log = access_log
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:  # noqa: D102
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        spans: list[tuple[str, float]] = []
+        token = _spans.set(spans)
+        start = perf_counter()
+        status_code = 500
+        server_timing = ""
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code, server_timing
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                server_timing = format_server_timing(spans, (perf_counter() - start) * 1000)
+                if self.emit_header:
+                    MutableHeaders(scope=message).append("Server-Timing", server_timing)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _spans.reset(token)
+            if self.access_log:
+                self.logger.log(
+                    {
+                        "text": f"{scope['method']} {scope['path']} {status_code}",
+                        "time": perf_counter() - start,
+                        "server_timing": server_timing,
+                    },
+                    level="info",
+                )
@@ -0,0 +1,25 @@
+"""Stats of server processes shared by workers of app.server and /api/status"""
+import resource
+import sys
+from pathlib import Path
+
+import ujson
+
+
+def max_rss_mb() -> float:
+    """Peak resident memory of current process in megabytes"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def read_workers_stats(stats_dir: Path) -> list[dict]:
+    """Return last stats written by every alive worker"""
+    stats = []
+    for path in sorted(stats_dir.glob("worker-*.json")):
+        try:
+            stats.append(ujson.loads(path.read_text()))
+        except (OSError, ValueError):
+            # Worker is writing or removing file right now
+            continue
+    return stats
@@ -1,16 +1,38 @@
+import asyncio
+from collections.abc import Awaitable, Callable
 from contextlib import asynccontextmanager
 from time import time
 from typing import Any, ClassVar, TypeVar
 
-from sqlalchemy import BinaryExpression, select
+from sqlalchemy import BinaryExpression, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DataError, DBAPIError, IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
+from app.core.timing import span
 from app.logger import BaseLogger
 from app.models.base import Base
 
 Model = TypeVar("Model", bound=Base) # type: ignore
 
+# SQLSTATE classes of errors caused by data: data exception (value out of range, too long string)
+# and integrity constraint violation. Retrying the same statement fails the same way
+PERMANENT_SQLSTATE_CLASSES = ("22", "23")
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """
+    Whether statement failed because of its data and can`t succeed on retry.
+    asyncpg errors are wrapped into generic DBAPIError, so SQLSTATE of original error is checked too
+    """
+    if isinstance(error, DataError | IntegrityError):
+        return True
+    if isinstance(error, DBAPIError):
+        sqlstate = getattr(error.orig, "sqlstate", None) or getattr(error.orig, "pgcode", None)
+        return bool(sqlstate) and sqlstate.startswith(PERMANENT_SQLSTATE_CLASSES)
+    return False
+
 
 class Singleton(type):
     """Singleton metaclass"""
@@ -28,16 +50,23 @@ class Database(metaclass=Singleton):
 
     __engine_created = False
 
-    def __init__(self, logger: BaseLogger, connection_string: str):
+    def __init__(
+        self,
+        logger: BaseLogger,
+        connection_string: str,
+        pool_size: int = 400,
+        max_overflow: int = 100,
+        pool_pre_ping: bool = True,  # noqa: FBT001, FBT002
+    ):
         self.logger = logger
 
         if not Database.__engine_created:
             self.engine = create_async_engine(
                 connection_string,
                 pool_recycle=3600,
-                pool_size=400,
-                max_overflow=100,
-                pool_pre_ping=True,
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_pre_ping=pool_pre_ping,
                 echo=False,
             )
 
@@ -51,6 +80,36 @@ class Database(metaclass=Singleton):
 
             Database.__engine_created = True
 
+    async def warm_up(self, connections: int) -> None:
+        """
+        Open connections to pool in advance, so first requests don`t pay for connection setup.
+        Connections are opened concurrently and held at once, otherwise pool would reuse the first one
+        """
+        start_time = time()
+        opened = [self.engine.connect() for _ in range(min(connections, self.engine.pool.size()))]
+        try:
+            await asyncio.gather(*[connection.start() for connection in opened])
+        finally:
+            await asyncio.gather(*[c.close() for c in opened if c.sync_connection is not None])
+
+        self.logger.log(
+            {"text": "Pool warm-up", "connections": connections, "time": time() - start_time},
+            level="info",
+        )
+
+    async def check(self) -> None:
+        """Readiness check. Raises if db is not available"""
+        async with self.engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    async def dispose(self) -> None:
+        """Close all pool connections"""
+        await self.engine.dispose()
+
+    def transaction(self, table_name: str, operation: str):
+        """Session for running several statements in one transaction. Committed on exit"""
+        return self._async_session_scope(table_name, operation)
+
     @asynccontextmanager
     async def _async_session_scope(self, table_name: str, operation: str):
         """Context manager for handling database sessions"""
@@ -58,30 +117,31 @@ class Database(metaclass=Singleton):
         async_session = self.session()
         start_time = time()
 
-        try:
-            yield async_session
-            await async_session.commit()
-        except Exception as e:
-            await async_session.rollback()
-            self.logger.log(
-                {
-                    "text": f"Error in {operation}",
-                    "error": str(e),
-                    "object": table_name,
-                },
-                level="error",
-            )
-            raise
-        finally:
-            await async_session.close()
-            self.logger.log(
-                {
-                    "text": operation,
-                    "time": time() - start_time,
-                    "object": table_name,
-                },
-                level="info",
-            )
+        with span(f"db.{operation}"):
+            try:
+                yield async_session
+                await async_session.commit()
+            except Exception as e:
+                await async_session.rollback()
+                self.logger.log(
+                    {
+                        "text": f"Error in {operation}",
+                        "error": str(e),
+                        "object": table_name,
+                    },
+                    level="error",
+                )
+                raise
+            finally:
+                await async_session.close()
+                self.logger.log(
+                    {
+                        "text": operation,
+                        "time": time() - start_time,
+                        "object": table_name,
+                    },
+                    level="info",
+                )
 
     async def update(
         self,
@@ -115,6 +175,32 @@ class Database(metaclass=Singleton):
             await session.refresh(obj)
         return obj
 
+    async def insert_many(
+        self,
+        table: type[Model],
+        rows: list[dict],
+        conflict_columns: list[str] | None = None,
+        returning: list[str] | None = None,
+        after_insert: Callable[[AsyncSession, list], Awaitable[None]] | None = None,
+    ) -> list:
+        """
+        Insert rows with one multi-row INSERT and one commit.
+        Rows conflicting by conflict_columns are skipped. Returns inserted rows with returning columns.
+        after_insert is called with inserted rows in the same transaction, e.g. to update aggregates
+        """
+
+        async with self._async_session_scope(table.__tablename__, "async_insert_many") as session:
+            query = insert(table).values(rows)
+            if conflict_columns:
+                query = query.on_conflict_do_nothing(index_elements=conflict_columns)
+            if returning:
+                query = query.returning(*[getattr(table, column) for column in returning])
+            result = await session.execute(query)
+            inserted = result.all() if returning else []
+            if after_insert is not None:
+                await after_insert(session, inserted)
+        return inserted
+
     async def get_or_create(
         self,
         table: type[Model],
@@ -172,3 +258,10 @@ class Database(metaclass=Singleton):
         async with self._async_session_scope(table.__tablename__, "execute_query") as s:
             result = await s.execute(query)
         return result.scalars().all()
+
+    async def fetch_all(self, table: Model, query) -> list:
+        """Execute custom query and return rows. Used for selecting separate columns"""
+
+        async with self._async_session_scope(table.__tablename__, "fetch_all") as s:
+            result = await s.execute(query)
+        return result.all()
@@ -0,0 +1,95 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.base import Database, Model
+
+
+class BatchInserter:
+    """
+    Group commit for inserts into one table.
+    Concurrent inserts arriving within batch window are coalesced into one multi-row
+    INSERT ... RETURNING and one commit. Every caller gets its own inserted row back.
+    after_insert is run in the insert transaction with inserted rows.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        table: type[Model],
+        key_column: str,
+        returning: list[str],
+        window: float,
+        max_size: int,
+        after_insert: Callable[[AsyncSession, list], Awaitable[None]] | None = None,
+    ):
+        self.db = db
+        self.table = table
+        self.key_column = key_column
+        self.returning = list(dict.fromkeys([key_column, *returning]))
+        self.window = window
+        self.max_size = max_size
+        self.after_insert = after_insert
+
+        self._pending: list[tuple[dict, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def insert(self, row: dict):
+        """Insert row with the next batch and return its returning columns. Row must have key column set"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((row, future))
+
+        if len(self._pending) >= self.max_size:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._start_flush)
+
+        return await future
+
+    def _start_flush(self) -> None:
+        """Take pending rows and insert them in background task"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._flush(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        """Insert batch and resolve callers futures. Every caller gets result or exception, even on cancellation"""
+        try:
+            try:
+                rows = await self.db.insert_many(
+                    self.table,
+                    [row for row, _ in batch],
+                    returning=self.returning,
+                    after_insert=self.after_insert,
+                )
+            except Exception as e:
+                if len(batch) == 1:
+                    _, future = batch[0]
+                    if not future.done():
+                        future.set_exception(e)
+                    return
+
+                # One bad row must not fail the whole batch, so retry rows one by one
+                await asyncio.gather(*[self._flush([item]) for item in batch])
+                return
+
+            inserted: dict[Hashable, object] = {getattr(row, self.key_column): row for row in rows}
+            for row, future in batch:
+                if not future.done() and row[self.key_column] in inserted:
+                    future.set_result(inserted[row[self.key_column]])
+        finally:
+            # Rows skipped by insert or batch interrupted by cancellation
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError(f"{self.table.__tablename__} row was not inserted"))
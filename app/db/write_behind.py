@@ -0,0 +1,338 @@
+import asyncio
+import os
+from collections.abc import Awaitable, Callable
+from contextlib import suppress
+from datetime import datetime
+from pathlib import Path
+
+import ujson
+from fastapi import status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.exceptions import AppErrorException
+from app.core.money import to_cents
+from app.db.base import Database, is_permanent_error
+from app.logger import BaseLogger
+from app.models.receipt import Receipt
+from app.schemas.receipt import PaymentType
+
+MONEY_FIELDS = ("total_amount", "payment_amount", "rest_amount")
+
+
+def encode_record(receipt_data: dict) -> dict:
+    """Convert receipt data to JSON compatible journal record"""
+    return {
+        **receipt_data,
+        "payment_type": PaymentType(receipt_data["payment_type"]).value,
+        "created": receipt_data["created"].isoformat(),
+    }
+
+
+def decode_record(record: dict) -> dict:
+    """Convert journal record back to receipt data"""
+    if isinstance(record["total_amount"], str):
+        # Journals written before amounts were kept in cents have decimal amounts
+        record = {
+            **record,
+            **{field: to_cents(record[field]) for field in MONEY_FIELDS},
+            "products": [
+                {**p, "price": to_cents(p["price"]), "total": to_cents(p["total"])} for p in record["products"]
+            ],
+        }
+    return {
+        **record,
+        "payment_type": PaymentType(record["payment_type"]),
+        "created": datetime.fromisoformat(record["created"]),
+    }
+
+
+def slot_journal_path(path: Path, slot: int) -> Path:
+    """Journal of worker slot. Every worker of multi-process server appends only to its own journal"""
+    return path.with_name(f"{path.stem}-{slot}{path.suffix}")
+
+
+def slot_journals(path: Path) -> dict[int, Path]:
+    """Existing journals of worker slots by slot"""
+    journals = {}
+    for slot_path in path.parent.glob(f"{path.stem}-*{path.suffix}"):
+        slot = slot_path.name[len(path.stem) + 1:len(slot_path.name) - len(path.suffix)]
+        if slot.isdigit():
+            journals[int(slot)] = slot_path
+    return journals
+
+
+def assign_journals(path: Path, workers: int) -> None:
+    """
+    Hand journals which no worker would replay to running slots. Called by master before workers start:
+    journals of slots left by previous run with more workers and journal of single-process run
+    are moved to slot with the same remainder
+    """
+    orphans = [(slot, slot_path) for slot, slot_path in slot_journals(path).items() if slot >= workers]
+    if path.exists():
+        orphans.append((0, path))
+    for slot, orphan in orphans:
+        ReceiptJournal(slot_journal_path(path, slot % workers)).adopt(orphan)
+
+
+class ReceiptJournal:
+    """
+    Append-only journal file with receipts accepted but not written to db yet.
+    Every line is either receipt record or marker with public ids of receipts written to db.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        # Receipts which db refused to write, kept for manual investigation
+        self.dead_letter_path = path.with_name(f"{path.name}.dead")
+
+    def append(self, records: list[dict]) -> None:
+        """Append receipts to journal and wait until they are on disk"""
+        self._write("".join(ujson.dumps({"receipt": encode_record(record)}) + "\n" for record in records))
+
+    def mark_flushed(self, public_ids: list[str]) -> None:
+        """Append marker with receipts written to db"""
+        self._write(ujson.dumps({"flushed": public_ids}) + "\n")
+
+    def dead_letter(self, record: dict, error: str) -> None:
+        """Save receipt which can`t be written to db with the error"""
+        self._write(ujson.dumps({"receipt": encode_record(record), "error": error}) + "\n", self.dead_letter_path)
+
+    def truncate(self) -> None:
+        """Drop journal when all its receipts are written to db"""
+        with self.path.open("w") as f:
+            os.fsync(f.fileno())
+
+    def adopt(self, path: Path) -> None:
+        """
+        Move records of journal which no process writes anymore to the end of this one.
+        If process dies before the old journal is removed, receipts are replayed twice and duplicates are
+        skipped by db
+        """
+        data = path.read_text()
+        # Last line can be written partially if process was killed
+        data = data[:data.rfind("\n") + 1]
+        if data:
+            self._write(data)
+        path.unlink()
+
+    def replay(self) -> list[dict]:
+        """Return receipts from journal which were not written to db"""
+        if not self.path.exists():
+            return []
+
+        receipts: dict[str, dict] = {}
+        with self.path.open() as f:
+            for line in f:
+                try:
+                    entry = ujson.loads(line)
+                except ValueError:
+                    # Last line can be written partially if process was killed
+                    continue
+
+                if "receipt" in entry:
+                    record = decode_record(entry["receipt"])
+                    receipts[record["public_id"]] = record
+                else:
+                    for public_id in entry["flushed"]:
+                        receipts.pop(public_id, None)
+
+        return list(receipts.values())
+
+    def _write(self, data: str, path: Path | None = None) -> None:
+        """Append data to journal or another file and fsync it"""
+        path = path or self.path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class ReceiptWriteBehind:
+    """
+    Write-behind queue for receipts.
+    Accepted receipts are written to journal and kept in memory until background flusher
+    writes them to db with multi-row inserts. Journal is replayed on start, so accepted receipts
+    are not lost on restart. after_insert is run in the insert transaction with inserted rows,
+    on_flushed is called with every batch written to db.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        journal: ReceiptJournal,
+        logger: BaseLogger,
+        max_size: int,
+        batch_size: int,
+        flush_interval: float,
+        on_flushed: Callable[[list[dict]], Awaitable[None]] | None = None,
+        after_insert: Callable[[AsyncSession, list], Awaitable[None]] | None = None,
+    ):
+        self.db = db
+        self.journal = journal
+        self.logger = logger
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_flushed = on_flushed
+        self.after_insert = after_insert
+
+        # Receipts in journal which are not written to db yet, by public_id
+        self._pending: dict[str, dict] = {}
+        self._queue: asyncio.Queue[dict] = asyncio.Queue()
+
+        # Receipts waiting for journal write. They are written together with one fsync
+        self._journal_waiters: list[tuple[dict, asyncio.Future]] = []
+        self._journal_writer: asyncio.Task | None = None
+        self._journal_lock = asyncio.Lock()
+
+        self._flusher: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        """Replay journal and start background flusher"""
+        for record in await asyncio.to_thread(self.journal.replay):
+            self._pending[record["public_id"]] = record
+            self._queue.put_nowait(record)
+
+        if self._pending:
+            self.logger.log({"text": "Replayed receipts journal", "receipts": len(self._pending)}, level="info")
+
+        self._flusher = asyncio.create_task(self._flush_forever())
+
+    async def stop(self) -> None:
+        """Write all accepted receipts to db and stop flusher"""
+        if self._journal_writer is not None:
+            await self._journal_writer
+
+        if self._flusher is not None:
+            self._flusher.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._flusher
+
+        # Flusher could be cancelled in the middle of batch, so flush everything not written yet
+        records = list(self._pending.values())
+        for i in range(0, len(records), self.batch_size):
+            await self._write_batch(records[i:i + self.batch_size])
+
+    async def put(self, receipt_data: dict) -> None:
+        """Accept receipt. Returns when receipt is written to journal"""
+        if len(self._pending) + len(self._journal_waiters) >= self.max_size:
+            raise AppErrorException(
+                message="Too many receipts waiting for processing, try later",
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        self._journal_waiters.append((receipt_data, future))
+        if self._journal_writer is None or self._journal_writer.done():
+            self._journal_writer = asyncio.create_task(self._write_journal())
+
+        await future
+
+    def get_pending(self, public_id: str) -> dict | None:
+        """Return receipt accepted but not written to db yet"""
+        return self._pending.get(public_id)
+
+    @property
+    def pending_count(self) -> int:
+        """Amount of receipts not written to db yet"""
+        return len(self._pending)
+
+    async def _write_journal(self) -> None:
+        """Write all waiting receipts to journal and make them visible for flusher and reads"""
+        while self._journal_waiters:
+            waiters, self._journal_waiters = self._journal_waiters, []
+
+            async with self._journal_lock:
+                try:
+                    await asyncio.to_thread(self.journal.append, [record for record, _ in waiters])
+                except Exception as e:
+                    for _, future in waiters:
+                        future.set_exception(e)
+                    continue
+
+                for record, future in waiters:
+                    self._pending[record["public_id"]] = record
+                    self._queue.put_nowait(record)
+                    future.set_result(None)
+
+    def _take_batch(self, limit: int) -> list[dict]:
+        """Take queued receipts up to limit"""
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _flush_forever(self) -> None:
+        """Background loop writing queued receipts to db"""
+        while True:
+            batch = [await self._queue.get()]
+            # Give concurrent requests a moment to fill the batch
+            await asyncio.sleep(self.flush_interval)
+            batch.extend(self._take_batch(self.batch_size - 1))
+
+            while batch:
+                try:
+                    await self._write_batch(batch)
+                    break
+                except Exception:
+                    # Db is unavailable or write failed transiently, error is logged by db layer.
+                    # Receipts stay in journal, so retry later
+                    await asyncio.sleep(self.flush_interval * 10)
+                    batch = [record for record in batch if record["public_id"] in self._pending]
+
+    async def _write_batch(self, batch: list[dict]) -> None:
+        """
+        Write batch to db. If it fails because of data, some receipt can`t be written ever,
+        e.g. its amount doesn`t fit column. Then receipts are written one by one like in BatchInserter
+        and failing ones are moved to dead-letter file, so they don`t block the queue.
+        Raises on errors which can pass on retry: db is unavailable, serialization failure, deadlock, timeout
+        """
+        try:
+            await self._flush(batch)
+        except Exception as e:
+            if not is_permanent_error(e):
+                raise
+        else:
+            return
+
+        for record in batch:
+            try:
+                await self._flush([record])
+            except Exception as e:
+                if not is_permanent_error(e):
+                    raise
+                self.logger.log(
+                    {"text": "Receipt moved to dead-letter file", "public_id": record["public_id"], "error": str(e)},
+                    level="error",
+                )
+                await asyncio.to_thread(self.journal.dead_letter, record, str(e))
+                await self._mark_flushed([record["public_id"]])
+
+    async def _flush(self, batch: list[dict]) -> None:
+        """Insert batch of receipts into db and mark them as flushed in journal"""
+        if not batch:
+            return
+
+        # Receipts replayed after crash can be in db already, they are skipped and not returned
+        await self.db.insert_many(
+            Receipt,
+            batch,
+            conflict_columns=["public_id"],
+            returning=["user_id", "total_amount"],
+            after_insert=self.after_insert,
+        )
+        if self.on_flushed is not None:
+            await self.on_flushed(batch)
+        await self._mark_flushed([record["public_id"] for record in batch])
+
+    async def _mark_flushed(self, public_ids: list[str]) -> None:
+        """Forget receipts which are not pending anymore and mark them in journal"""
+        async with self._journal_lock:
+            for public_id in public_ids:
+                self._pending.pop(public_id, None)
+
+            if self._pending:
+                await asyncio.to_thread(self.journal.mark_flushed, public_ids)
+            else:
+                await asyncio.to_thread(self.journal.truncate)
@@ -0,0 +1,102 @@
+from datetime import UTC, datetime
+from uuid import uuid4
+
+from fastapi import status
+
+from app.core.exceptions import AppErrorException
+from app.core.security import (create_access_token, create_refresh_token,
+                               hash_refresh_token)
+from app.repositories.interfaces import (AbstractRefreshTokenRepository,
+                                         AbstractUserRepository)
+
+
+class TokenInteractor:
+    """Interactor for issuing and rotating auth tokens"""
+
+    def __init__(self, refresh_token_repo: AbstractRefreshTokenRepository, user_repo: AbstractUserRepository):
+        self.refresh_token_repo = refresh_token_repo
+        self.user_repo = user_repo
+
+    async def issue_tokens(self, user_id: int) -> dict:
+        """
+        Create access token and refresh token of new family for user
+
+        Args:
+            user_id (int): user`s id
+
+        Returns:
+            dict: access and refresh tokens with their expiration time
+        """
+        access_token, expiration_time = create_access_token(data={"sub": str(user_id)})
+        refresh_token, token_hash, refresh_expiration_time = create_refresh_token()
+
+        await self.refresh_token_repo.create(
+            user_id=user_id,
+            token_hash=token_hash,
+            family_id=str(uuid4()),
+            expires_at=refresh_expiration_time,
+        )
+
+        return {
+            "access_token": access_token,
+            "expiration_time": expiration_time,
+            "refresh_token": refresh_token,
+            "refresh_expiration_time": refresh_expiration_time,
+            "token_type": "bearer",
+        }
+
+    async def refresh(self, refresh_token: str) -> dict:
+        """
+        Rotate refresh token: revoke presented one and issue new pair of tokens.
+        Presenting already rotated token revokes the whole family, because token was probably stolen.
+        Tokens of inactive user are revoked instead of rotated.
+
+        Args:
+            refresh_token (str): refresh token from client
+
+        Returns:
+            dict: new access and refresh tokens with their expiration time
+        """
+        token_hash = hash_refresh_token(refresh_token)
+        token = await self.refresh_token_repo.get_by_hash(token_hash)
+        if not token:
+            raise self._invalid_token()
+        if token.revoked:
+            await self.refresh_token_repo.revoke_family(token.family_id)
+            raise self._invalid_token()
+
+        if token.expires_at <= datetime.now(UTC):
+            raise AppErrorException(
+                message="Refresh token expired",
+                status_code=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        user = await self.user_repo.get_by_id(token.user_id)
+        if not user or not user.is_active:
+            await self.refresh_token_repo.revoke_family(token.family_id)
+            raise AppErrorException(
+                message="Inactive user",
+                status_code=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        new_refresh_token, new_token_hash, refresh_expiration_time = create_refresh_token()
+        if not await self.refresh_token_repo.rotate(token_hash, new_token_hash, refresh_expiration_time):
+            # Token was rotated by concurrent request after it was read
+            await self.refresh_token_repo.revoke_family(token.family_id)
+            raise self._invalid_token()
+
+        access_token, expiration_time = create_access_token(data={"sub": str(token.user_id)})
+        return {
+            "access_token": access_token,
+            "expiration_time": expiration_time,
+            "refresh_token": new_refresh_token,
+            "refresh_expiration_time": refresh_expiration_time,
+            "token_type": "bearer",
+        }
+
+    @staticmethod
+    def _invalid_token() -> AppErrorException:
+        return AppErrorException(
+            message="Invalid refresh token",
+            status_code=status.HTTP_401_UNAUTHORIZED,
+        )
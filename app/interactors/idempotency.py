@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+from collections.abc import Awaitable, Callable, Hashable
+from datetime import UTC, datetime, timedelta
+from time import monotonic
+from typing import ClassVar, TypeVar
+
+from fastapi import status
+from pydantic import BaseModel
+
+from app.conf.settings import settings
+from app.core.cache import TTLCache
+from app.core.exceptions import AppErrorException
+from app.repositories.interfaces import AbstractIdempotencyKeyRepository
+
+ResponseModel = TypeVar("ResponseModel", bound=BaseModel)
+
+idempotency_cache = TTLCache(
+    maxsize=settings.IDEMPOTENCY_CACHE_SIZE,
+    ttl=settings.IDEMPOTENCY_KEY_TTL_HOURS * 3600,
+)
+
+
+def request_fingerprint(data: BaseModel, mode: str = "") -> str:
+    """
+    Return digest of request body and processing mode. Requests processed differently, e.g. synchronously
+    and with "Prefer: respond-async", have different responses and status codes, so retry in another mode
+    must not replay stored response. Empty mode keeps digests of plain requests stable
+    """
+    return hashlib.sha256(f"{mode}{data.model_dump_json()}".encode()).hexdigest()
+
+
+class IdempotencyInteractor:
+    """
+    Interactor for processing requests with idempotency key only once.
+    Completed responses are kept in in-process cache in front of db table.
+    Concurrent duplicates in one process wait for the first request, duplicates from other
+    processes wait until the first request stores its response in db.
+    """
+
+    # Requests in progress in current process
+    _in_flight: ClassVar[dict[Hashable, asyncio.Future]] = {}
+    _last_cleanup: ClassVar[float] = 0.0
+
+    def __init__(self, idempotency_repo: AbstractIdempotencyKeyRepository, cache: TTLCache | None = None):
+        self.idempotency_repo = idempotency_repo
+        self.cache = cache if cache is not None else idempotency_cache
+
+    async def run(
+        self,
+        user_id: int,
+        key: str,
+        request_hash: str,
+        operation: Callable[[], Awaitable[ResponseModel]],
+        response_model: type[ResponseModel],
+    ) -> ResponseModel:
+        """
+        Run operation once per user`s idempotency key and return its response for all retries
+
+        Args:
+            user_id (int): user`s id
+            key (str): idempotency key from request
+            request_hash (str): digest of request body
+            operation (Callable): coroutine function processing request
+            response_model (type[BaseModel]): model of operation response
+
+        Returns:
+            BaseModel: response of the first request with this key
+        """
+        cache_key = (user_id, key)
+
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return self._check_hash(cached, request_hash)
+
+        in_flight = self._in_flight.get(cache_key)
+        if in_flight is not None:
+            try:
+                return self._check_hash(await asyncio.shield(in_flight), request_hash)
+            except asyncio.CancelledError:
+                # The first request was cancelled, e.g. its client disconnected, and released the key,
+                # so this duplicate processes request itself unless it is cancelled too
+                if not in_flight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+            return await self.run(user_id, key, request_hash, operation, response_model)
+
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may wait for the future, so mark its exception as retrieved
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._in_flight[cache_key] = future
+
+        try:
+            response = await self._process(user_id, key, request_hash, operation, response_model)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._in_flight.pop(cache_key, None)
+
+        self.cache.set(cache_key, (request_hash, response))
+        future.set_result((request_hash, response))
+        return response
+
+    async def _process(
+        self,
+        user_id: int,
+        key: str,
+        request_hash: str,
+        operation: Callable[[], Awaitable[ResponseModel]],
+        response_model: type[ResponseModel],
+    ) -> ResponseModel:
+        """Claim key in db and run operation or wait for response of request which claimed it"""
+        await self._cleanup_expired()
+        deadline = monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT_SECONDS
+
+        while True:
+            expires_at = datetime.now(UTC) + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+            if await self.idempotency_repo.claim(user_id, key, request_hash, expires_at):
+                # Key is released and response is saved even if request is cancelled meanwhile,
+                # otherwise retries would get 409 until the key expires
+                try:
+                    response = await operation()
+                except BaseException:
+                    await asyncio.shield(self.idempotency_repo.release(user_id, key))
+                    raise
+
+                await asyncio.shield(
+                    self.idempotency_repo.save_response(user_id, key, response.model_dump(mode="json")),
+                )
+                return response
+
+            record = await self.idempotency_repo.get(user_id, key)
+            if record is not None and record.expires_at <= datetime.now(UTC):
+                await self.idempotency_repo.delete_expired(datetime.now(UTC))
+                continue
+
+            if record is not None:
+                if record.response is not None:
+                    return self._check_hash((record.request_hash, response_model.model_validate(record.response)),
+                                            request_hash)
+                self._check_hash((record.request_hash, None), request_hash)
+
+            if monotonic() > deadline:
+                raise AppErrorException(
+                    message="Request with this idempotency key is still in progress",
+                    status_code=status.HTTP_409_CONFLICT,
+                )
+            await asyncio.sleep(settings.IDEMPOTENCY_POLL_INTERVAL_SECONDS)
+
+    async def _cleanup_expired(self) -> None:
+        """Delete expired keys from db not more often than cleanup interval"""
+        if monotonic() - IdempotencyInteractor._last_cleanup < settings.IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS:
+            return
+
+        IdempotencyInteractor._last_cleanup = monotonic()
+        await self.idempotency_repo.delete_expired(datetime.now(UTC))
+
+    @staticmethod
+    def _check_hash(stored: tuple[str, ResponseModel | None], request_hash: str) -> ResponseModel | None:
+        """Return stored response if it was made for the same request body"""
+        stored_hash, response = stored
+        if stored_hash != request_hash:
+            raise AppErrorException(
+                message="Idempotency key was already used with another request",
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        return response
@@ -1,79 +1,176 @@
-from decimal import Decimal
+from datetime import UTC, datetime
+from functools import partial
 from textwrap import wrap
+from uuid import uuid4
 
-import ujson
 from fastapi import HTTPException, status
-
+from pydantic import TypeAdapter
+
+from app.conf.settings import settings
+from app.core.money import MAX_CENTS, format_cents
+from app.core.query_cache import VersionedQueryCache
+from app.core.shared_cache import TwoTierCache, make_cache, make_query_cache
+from app.core.single_flight import SingleFlight
+from app.core.timing import span
+from app.db.write_behind import ReceiptWriteBehind
 from app.models.receipt import Receipt
-from app.repositories.receipt import ReceiptRepository
-from app.schemas.receipt import (PaymentType, ProductData, ReceiptCreateDTO,
-                                 ReceiptFilter, ReceiptResponse)
+from app.repositories.interfaces import AbstractReceiptRepository
+from app.schemas.receipt import (PaymentType, ProductData,
+                                 ReceiptAcceptedResponse, ReceiptCreateDTO,
+                                 ReceiptFilter, ReceiptListItem,
+                                 ReceiptResponse)
+
+# Validates whole page of db rows in one call without intermediate dicts
+receipts_adapter = TypeAdapter(list[ReceiptListItem])
+
+# Concurrent identical reads, e.g. of popular public receipt, share one db request
+receipt_single_flight = SingleFlight()
+
+# Receipts are immutable, so they are cached without invalidation. By id owner is cached with receipt
+receipt_cache = make_cache(
+    "receipt",
+    tuple[int, ReceiptResponse],
+    ttl=settings.RECEIPT_CACHE_TTL_SECONDS,
+    l1_size=settings.RECEIPT_CACHE_SIZE,
+)
+public_receipt_cache = make_cache(
+    "receipt_public",
+    ReceiptResponse,
+    ttl=settings.RECEIPT_CACHE_TTL_SECONDS,
+    l1_size=settings.RECEIPT_CACHE_SIZE,
+)
+
+# Receipts lists pages, invalidated by every receipt of user written to db
+receipt_list_cache = make_query_cache(
+    "receipt_list",
+    max_rows=settings.RECEIPT_LIST_CACHE_MAX_ROWS,
+    max_keys_per_user=settings.RECEIPT_LIST_CACHE_MAX_KEYS_PER_USER,
+    ttl=settings.RECEIPT_LIST_CACHE_TTL_SECONDS,
+)
 
 
 class ReceiptInteractor:
     """Interactor for business logic for receipts"""
 
-    def __init__(self, receipt_repo: ReceiptRepository):
+    def __init__(
+        self,
+        receipt_repo: AbstractReceiptRepository,
+        write_behind: ReceiptWriteBehind | None = None,
+        single_flight: SingleFlight | None = None,
+        cache: TwoTierCache | None = None,
+        public_cache: TwoTierCache | None = None,
+        list_cache: VersionedQueryCache | None = None,
+    ):
         self.receipt_repo = receipt_repo
+        self.write_behind = write_behind
+        self.single_flight = single_flight if single_flight is not None else receipt_single_flight
+        self.cache = cache if cache is not None else receipt_cache
+        self.public_cache = public_cache if public_cache is not None else public_receipt_cache
+        self.list_cache = list_cache if list_cache is not None else receipt_list_cache
 
     async def create_receipt(self, user_id: int, data: ReceiptCreateDTO) -> ReceiptResponse:
         """Creating receipt in db based on data from request"""
 
-        products_with_total = []
-        total_amount = Decimal("0")
+        with span("totals"):
+            receipt_data = self.build_receipt_data(user_id, data)
+        receipt = await self.receipt_repo.create(receipt_data)
+        await self.list_cache.bump(user_id)
+
+        return ReceiptResponse(
+            id=receipt.id,
+            public_id=receipt.public_id,
+            # Products are built from validated request, so they are not validated again
+            products=[ProductData.model_construct(**p) for p in receipt.products],
+            payment_type=data.payment.payment_type,
+            payment_amount=data.payment.amount,
+            total_amount=receipt.total_amount,
+            rest_amount=receipt.rest_amount,
+            created=receipt.created,
+        )
+
+    async def accept_receipt(self, user_id: int, data: ReceiptCreateDTO) -> ReceiptAcceptedResponse:
+        """
+        Accept receipt for asynchronous creation. Receipt is written to db later by write-behind queue,
+        but it is available by public_id right away
+        """
+        if self.write_behind is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Asynchronous receipts creation is disabled",
+            )
+
+        with span("totals"):
+            receipt_data = {
+                **self.build_receipt_data(user_id, data),
+                "public_id": str(uuid4()),
+                "created": datetime.now(UTC),
+            }
+        await self.write_behind.put(receipt_data)
+
+        return ReceiptAcceptedResponse(
+            public_id=receipt_data["public_id"],
+            products=receipt_data["products"],
+            payment_type=receipt_data["payment_type"],
+            payment_amount=receipt_data["payment_amount"],
+            total_amount=receipt_data["total_amount"],
+            rest_amount=receipt_data["rest_amount"],
+            created=receipt_data["created"],
+        )
+
+    @staticmethod
+    def build_receipt_data(user_id: int, data: ReceiptCreateDTO) -> dict:
+        """
+        Calculate receipt totals and return data for storing receipt. All amounts are in cents.
+        Products are converted in the same pass, they are stored in JSON column as is.
+        Raises ValueError if total doesn`t fit db column, every product total is not bigger than it
+        """
+
+        products = []
+        total_amount = 0
 
         for product in data.products:
             product_total = product.price * product.quantity
             total_amount += product_total
-
-            products_with_total.append({
+            products.append({
                 "name": product.name,
                 "price": product.price,
                 "quantity": product.quantity,
                 "total": product_total,
             })
+        if total_amount > MAX_CENTS:
+            raise ValueError("Receipt total is too large")
 
-        rest_amount = data.payment.amount - total_amount if data.payment.amount > total_amount else Decimal("0")
-
-        receipt_data = {
+        return {
             "user_id": user_id,
             "total_amount": total_amount,
             "payment_type": data.payment.payment_type,
             "payment_amount": data.payment.amount,
-            "rest_amount": rest_amount,
-            "products": ujson.loads(ujson.dumps(products_with_total)),
+            "rest_amount": max(data.payment.amount - total_amount, 0),
+            "products": products,
         }
 
-        receipt = await self.receipt_repo.create(receipt_data)
+    async def get_receipt(self, receipt_id: int, current_user_id: int) -> ReceiptResponse:
+        """Get receipt data by id. Concurrent requests of the same receipt share one call"""
 
-        return ReceiptResponse(
-            id=receipt.id,
-            public_id=receipt.public_id,
-            products=[ProductData(**p) for p in receipt.products],
-            payment_type=data.payment.payment_type,
-            payment_amount=data.payment.amount,
-            total_amount=receipt.total_amount,
-            rest_amount=receipt.rest_amount,
-            created=receipt.created,
+        return await self.single_flight.do(
+            ("receipt", receipt_id, current_user_id),
+            partial(self._get_receipt, receipt_id, current_user_id),
         )
 
-    async def get_receipt(self, receipt_id: int, current_user_id: int) -> ReceiptResponse:
-        """Get receipt data by id"""
+    async def _get_receipt(self, receipt_id: int, current_user_id: int) -> ReceiptResponse:
+        """Get receipt data by id from cache or db"""
 
-        receipt = await self.receipt_repo.get_by_id(receipt_id=receipt_id)
+        cached = await self.cache.get_or_load(receipt_id, partial(self._load_receipt, receipt_id))
 
-        if not receipt or receipt.user_id != current_user_id:
+        if cached is None or cached[0] != current_user_id:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Receipt not found")
 
-        return ReceiptResponse(id=receipt_id,
-                               products=receipt.products,
-                               public_id=receipt.public_id,
-                               payment_type=receipt.payment_type,
-                               payment_amount=receipt.payment_amount,
-                               total_amount=receipt.total_amount,
-                               rest_amount=receipt.rest_amount,
-                               created=receipt.created,
-                            )
+        return cached[1]
+
+    async def _load_receipt(self, receipt_id: int) -> tuple[int, ReceiptResponse] | None:
+        """Get receipt owner and data from db"""
+        receipt = await self.receipt_repo.get_by_id(receipt_id=receipt_id)
+        return (receipt.user_id, ReceiptResponse.model_validate(receipt)) if receipt else None
 
     async def get_filtered_receipts(
         self,
@@ -81,39 +178,79 @@ class ReceiptInteractor:
         filters: ReceiptFilter,
         limit: int,
         offset: int,
-    ) -> tuple[list[ReceiptResponse], int]:
-        """Return receipts with fiters described in filters variable."""
+        fields: list[str] | None = None,
+    ) -> tuple[list[ReceiptListItem], int]:
+        """
+        Return receipts with fiters described in filters variable.
+        If fields are set only these receipt fields are loaded and returned.
+        Pages are cached until user`s receipts change, concurrent requests with the same arguments share one call.
+        """
+        query = (filters.model_dump_json(), limit, offset, tuple(fields) if fields else None)
+        version = await self.list_cache.version(user_id)
+        page = self.list_cache.get(user_id, version, query)
+        if page is not None:
+            return page
+
+        # Version is a part of key, so requests after receipt creation don`t join earlier read
+        page = await self.single_flight.do(
+            ("list", user_id, version, *query),
+            partial(self._get_filtered_receipts, user_id, filters, limit, offset, fields),
+        )
+        self.list_cache.set(user_id, version, query, page, rows=len(page[0]) + 1)
+        return page
+
+    async def _get_filtered_receipts(
+        self,
+        user_id: int,
+        filters: ReceiptFilter,
+        limit: int,
+        offset: int,
+        fields: list[str] | None,
+    ) -> tuple[list[ReceiptListItem], int]:
+        """Return filtered receipts"""
         receipts, total = await self.receipt_repo.get_filtered(
             user_id=user_id,
             filters=filters,
             limit=limit,
             offset=offset,
+            fields=fields,
         )
 
-        return [
-            ReceiptResponse(
-                id=receipt.id,
-                products=receipt.products,
-                public_id=receipt.public_id,
-                payment_type=receipt.payment_type,
-                payment_amount=receipt.payment_amount,
-                total_amount=receipt.total_amount,
-                rest_amount=receipt.rest_amount,
-                created=receipt.created,
-            ) for receipt in receipts
-        ], total
+        with span("validate"):
+            return receipts_adapter.validate_python(receipts, from_attributes=True), total
 
     async def get_receipt_text(self, public_id: str, line_width: int) -> str:
-        """Get receipt by public_id and format it as text"""
-        receipt = await self.receipt_repo.get_by_public_id(public_id)
+        """
+        Get receipt by public_id and format it as text.
+        Concurrent requests of the same receipt share one db request and formatting
+        """
+        pending = self.write_behind.get_pending(public_id) if self.write_behind is not None else None
+        if pending is None:
+            return await self.single_flight.do(
+                ("text", public_id, line_width),
+                partial(self._get_receipt_text, public_id, line_width),
+            )
+
+        with span("format"):
+            return await self.format_receipt_text(Receipt(**pending), line_width)
 
-        if not receipt:
+    async def _get_receipt_text(self, public_id: str, line_width: int) -> str:
+        """Get receipt from cache or db by public_id and format it as text"""
+        response = await self.public_cache.get_or_load(public_id, partial(self._load_public_receipt, public_id))
+
+        if not response:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Receipt not found",
             )
 
-        return await self.format_receipt_text(receipt, line_width)
+        with span("format"):
+            return await self.format_receipt_text(Receipt(**response.model_dump()), line_width)
+
+    async def _load_public_receipt(self, public_id: str) -> ReceiptResponse | None:
+        """Get receipt data from db by public_id"""
+        receipt = await self.receipt_repo.get_by_public_id(public_id)
+        return ReceiptResponse.model_validate(receipt) if receipt else None
 
     async def format_receipt_text(self, receipt: Receipt, line_width: int) -> str:
         """Format receipt data as text with specified line width"""
@@ -132,15 +269,12 @@ class ReceiptInteractor:
             name_lines = wrap(product["name"], line_width - 20)
 
             # Format price line
-            price_line = f"{product['quantity']:.2f} x {product['price']:.2f}"
-            total = f"{product['total']:.2f}".rjust(line_width - len(price_line))
+            price_line = f"{product['quantity']:.2f} x {format_cents(product['price'])}"
+            total = format_cents(product["total"]).rjust(line_width - len(price_line))
             text.append(f"{price_line}{total}")
 
             # Add wrapped product name
-            for line in name_lines[:-1]:
-                text.extend(line.copy())
-            if name_lines:
-                text.append(name_lines[-1])
+            text.extend(name_lines)
 
             text.append(small_separator)
 
@@ -148,9 +282,9 @@ class ReceiptInteractor:
 
         text.extend([
             separator,
-            f"{'СУМА':<{line_width-10}}{receipt.total_amount:>10.2f}",
-            f"{payment_title:<{line_width-10}}{receipt.payment_amount:>10.2f}",
-            f"{'Решта':<{line_width-10}}{receipt.rest_amount:>10.2f}",
+            f"{'СУМА':<{line_width-10}}{format_cents(receipt.total_amount):>10}",
+            f"{payment_title:<{line_width-10}}{format_cents(receipt.payment_amount):>10}",
+            f"{'Решта':<{line_width-10}}{format_cents(receipt.rest_amount):>10}",
             separator,
             receipt.created.strftime("%d.%m.%Y %H:%M").center(line_width),
             "Дякуємо за покупку!".center(line_width),
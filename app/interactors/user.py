@@ -2,17 +2,39 @@ import sqlalchemy
 from fastapi import status
 from psycopg2 import IntegrityError
 
+from app.conf.settings import settings
 from app.core.exceptions import AppErrorException
 from app.core.security import get_password_hash, verify_password
-from app.repositories.user import UserRepository
-from app.schemas.user import UserCreateDTO, UserUpdateDTO
+from app.core.shared_cache import TwoTierCache, make_cache
+from app.repositories.interfaces import AbstractUserRepository
+from app.schemas.user import UserCreateDTO, UserResponse, UserUpdateDTO
+
+user_cache = make_cache("user", UserResponse, ttl=settings.USER_CACHE_TTL_SECONDS, l1_size=settings.USER_CACHE_SIZE)
 
 
 class UserInteractor:
     """Interactor for users` business logic"""
 
-    def __init__(self, user_repo: UserRepository):
+    def __init__(self, user_repo: AbstractUserRepository, cache: TwoTierCache | None = None):
         self.user_repo = user_repo
+        self.cache = cache if cache is not None else user_cache
+
+    async def get_user(self, user_id: int) -> UserResponse | None:
+        """
+        Get user`s profile by id. Profiles are cached and invalidated on user`s changes
+
+        Args:
+            user_id (int): user`s id
+
+        Returns:
+            UserResponse | None: user`s profile
+        """
+        return await self.cache.get_or_load(user_id, lambda: self._load_user(user_id))
+
+    async def _load_user(self, user_id: int) -> UserResponse | None:
+        """Get user`s profile from db"""
+        user = await self.user_repo.get_by_id(user_id)
+        return UserResponse.model_validate(user) if user else None
 
     async def create_user(self, user_data: UserCreateDTO) -> dict:
         """
@@ -82,7 +104,8 @@ class UserInteractor:
             user = await self.user_repo.update(user_id, user_data.model_dump(exclude_unset=True))
         except sqlalchemy.exc.IntegrityError:
             raise ValueError("Email already used")
-            
+
+        await self.cache.delete(user_id)
         if not user:
             raise ValueError("User not found")
         return {
@@ -114,4 +137,5 @@ class UserInteractor:
             return False
 
         await self.user_repo.update_password(user_id, get_password_hash(new_password))
+        await self.cache.delete(user_id)
         return True
@@ -1,15 +1,38 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI, HTTPException
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api import auth, receipts
-from app.conf.settings import settings
+from app.api import auth, receipts, status
+from app.conf.settings import StorageBackend, settings
+from app.core.compression import CompressionMiddleware
+from app.core.shared_cache import close_shared_cache
+from app.core.timing import ServerTimingMiddleware
 from app.core.exceptions import (AppErrorException, app_error_handler,
                                  http_error_handler, validation_error_handler,
                                  value_error_handler)
 from app.db.base import Database
+from app.db.batch import BatchInserter
+from app.db.write_behind import (ReceiptJournal, ReceiptWriteBehind,
+                                 slot_journal_path, slot_journals)
+from app.interactors.auth_token import TokenInteractor
+from app.interactors.idempotency import IdempotencyInteractor
+from app.interactors.receipt import ReceiptInteractor, receipt_list_cache
+from app.interactors.user import UserInteractor
 from app.logger import BaseLogger
+from app.models.receipt import Receipt
+from app.repositories.idempotency_key import IdempotencyKeyRepository
+from app.repositories.memory import (MemoryIdempotencyKeyRepository,
+                                     MemoryReceiptRepository,
+                                     MemoryRefreshTokenRepository,
+                                     MemoryStorage, MemoryUserRepository)
+from app.repositories.receipt import (INSERT_RETURNING, ReceiptRepository,
+                                     update_user_counters)
+from app.repositories.refresh_token import RefreshTokenRepository
+from app.repositories.user import UserRepository
 
 
 def init_middlewares(app_api: FastAPI) -> None:
@@ -21,12 +44,27 @@ def init_middlewares(app_api: FastAPI) -> None:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    if settings.COMPRESSION_ENABLED:
+        # Added before timing middleware, so compression time is included in Server-Timing
+        app_api.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+            gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+            brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+        )
+    app_api.add_middleware(
+        ServerTimingMiddleware,
+        logger=BaseLogger(),
+        emit_header=settings.SERVER_TIMING_ENABLED,
+        access_log=settings.ACCESS_LOG_ENABLED,
+    )
 
 
 def init_routes(app_api: FastAPI) -> None:
     """Initialize all service routes."""
     app_api.include_router(auth.router, prefix="/api/users")
     app_api.include_router(receipts.router, prefix="/api/receipts")
+    app_api.include_router(status.router, prefix="/api/status")
 
 
 def init_exception_handlers(app_api: FastAPI) -> None:
@@ -37,21 +75,118 @@ def init_exception_handlers(app_api: FastAPI) -> None:
     app_api.add_exception_handler(AppErrorException, app_error_handler)
 
 
+def init_storage(app_api: FastAPI) -> None:
+    """Initialize in-memory storage if it is chosen as storage backend"""
+    app_api.state.memory_storage = MemoryStorage() if settings.STORAGE_BACKEND == StorageBackend.MEMORY else None
+
+
+def init_group_commit(app_api: FastAPI, db: Database) -> None:
+    """Initialize group commit of receipts inserts if it is enabled"""
+    app_api.state.receipt_batch_inserter = BatchInserter(
+        db=db,
+        table=Receipt,
+        key_column="public_id",
+        returning=INSERT_RETURNING,
+        window=settings.RECEIPT_BATCH_WINDOW_MS / 1000,
+        max_size=settings.RECEIPT_BATCH_MAX_SIZE,
+        after_insert=update_user_counters,
+    ) if settings.RECEIPT_GROUP_COMMIT_ENABLED and app_api.state.memory_storage is None else None
+
+
+def init_write_behind(app_api: FastAPI, db: Database) -> None:
+    """Initialize write-behind queue for asynchronous receipts creation if it is enabled"""
+    if not settings.RECEIPT_WRITE_BEHIND_ENABLED or app_api.state.memory_storage is not None:
+        app_api.state.receipt_write_behind = None
+        return
+
+    if settings.WORKER_SLOT is not None:
+        journal = ReceiptJournal(slot_journal_path(settings.RECEIPT_JOURNAL_PATH, settings.WORKER_SLOT))
+    else:
+        # Single process replays journals left by workers of multi-process server too
+        journal = ReceiptJournal(settings.RECEIPT_JOURNAL_PATH)
+        for slot_path in slot_journals(settings.RECEIPT_JOURNAL_PATH).values():
+            journal.adopt(slot_path)
+
+    write_behind = ReceiptWriteBehind(
+        db=db,
+        journal=journal,
+        logger=db.logger,
+        max_size=settings.RECEIPT_WRITE_BEHIND_MAX_SIZE,
+        batch_size=settings.RECEIPT_WRITE_BEHIND_BATCH_SIZE,
+        flush_interval=settings.RECEIPT_WRITE_BEHIND_FLUSH_INTERVAL_SECONDS,
+        on_flushed=lambda batch: receipt_list_cache.bump_many({record["user_id"] for record in batch}),
+        after_insert=update_user_counters,
+    )
+    app_api.state.receipt_write_behind = write_behind
+
+
+def init_dependencies(app_api: FastAPI, db: Database) -> None:
+    """Create repositories and interactors shared by all requests"""
+    storage = app_api.state.memory_storage
+    if storage is not None:
+        user_repo = MemoryUserRepository(storage)
+        receipt_repo = MemoryReceiptRepository(storage)
+        refresh_token_repo = MemoryRefreshTokenRepository(storage)
+        idempotency_repo = MemoryIdempotencyKeyRepository(storage)
+    else:
+        user_repo = UserRepository(db)
+        receipt_repo = ReceiptRepository(db, app_api.state.receipt_batch_inserter)
+        refresh_token_repo = RefreshTokenRepository(db)
+        idempotency_repo = IdempotencyKeyRepository(db)
+
+    app_api.state.user_repo = user_repo
+    app_api.state.user_interactor = UserInteractor(user_repo)
+    app_api.state.token_interactor = TokenInteractor(refresh_token_repo, user_repo)
+    app_api.state.receipt_interactor = ReceiptInteractor(receipt_repo, app_api.state.receipt_write_behind)
+    app_api.state.idempotency_interactor = IdempotencyInteractor(idempotency_repo)
+
+
+@asynccontextmanager
+async def lifespan(app_api: FastAPI) -> AsyncIterator[None]:
+    """Warm up db pool and check db on startup, flush queues and close db and shared cache connections on shutdown"""
+    db = app_api.state.db if app_api.state.memory_storage is None else None
+    write_behind = app_api.state.receipt_write_behind
+
+    if db is not None:
+        await db.warm_up(settings.DB_POOL_WARMUP_CONNECTIONS)
+        await db.check()
+    if write_behind is not None:
+        await write_behind.start()
+
+    yield
+
+    if write_behind is not None:
+        await write_behind.stop()
+    await close_shared_cache()
+    if db is not None:
+        await db.dispose()
+
+
 def create_app() -> "FastAPI":
     """Create app with including configurations."""
     # Init db
-    Database(logger=BaseLogger(), connection_string=settings.sqlalchemy_database_uri)
+    db = Database(
+        logger=BaseLogger(),
+        connection_string=settings.sqlalchemy_database_uri,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
 
-    app_api = FastAPI(title="Receipts Viewer", debug=settings.DEBUG)
+    app_api = FastAPI(title="Receipts Viewer", debug=settings.DEBUG, lifespan=lifespan)
+    app_api.state.db = db
     init_middlewares(app_api)
     init_routes(app_api)
     init_exception_handlers(app_api)
+    init_storage(app_api)
+    init_group_commit(app_api, db)
+    init_write_behind(app_api, db)
+    init_dependencies(app_api, db)
 
     return app_api
 
 
-app = create_app()
-
-
+# App is created only by its runner, e.g. uvicorn --factory app.main:create_app, so importing this module
+# doesn`t create db engine, caches and write-behind queue
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=settings.PORT, loop="uvloop")  # noqa: S104
+    uvicorn.run(create_app(), host="0.0.0.0", port=settings.PORT, loop="uvloop")  # noqa: S104
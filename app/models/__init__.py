@@ -1,2 +1,5 @@
+from .archived_receipt import *  # noqa: F403
+from .idempotency_key import *  # noqa: F403
 from .receipt import *  # noqa: F403
+from .refresh_token import *  # noqa: F403
 from .user import *  # noqa: F403
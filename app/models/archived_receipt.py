@@ -0,0 +1,29 @@
+from sqlalchemy import (BigInteger, Column, Enum, ForeignKey, Index, Integer,
+                        LargeBinary, String, func)
+from sqlalchemy.dialects import postgresql
+
+from app.models.base import Base
+from app.schemas.receipt import PaymentType
+
+
+class ArchivedReceipt(Base):
+    """
+    Receipt moved from receipts table after RECEIPT_ARCHIVE_AFTER_DAYS. Columns used for filtering
+    are kept as is, the rest of receipt is stored in compressed payload
+    """
+
+    __tablename__ = "archived_receipts"
+    __table_args__ = (Index("ix_archived_receipts_user_id_created", "user_id", "created"),)
+
+    # Id of receipt in receipts table, so it is found by the same id after archiving
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    public_id = Column(String(36), unique=True, nullable=False)
+    payment_type = Column(Enum(PaymentType), nullable=False)
+    # Amount is in cents
+    total_amount = Column(BigInteger, nullable=False)
+    created = Column(postgresql.TIMESTAMP(timezone=True), nullable=False)
+    archived = Column(postgresql.TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+
+    # zlib compressed JSON with products, payment and rest amounts and update time
+    payload = Column(LargeBinary, nullable=False)
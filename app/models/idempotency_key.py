@@ -0,0 +1,21 @@
+from sqlalchemy import JSON, Column, ForeignKey, Integer, String, UniqueConstraint
+from sqlalchemy.dialects import postgresql
+
+from app.models.base import BaseModel
+
+
+class IdempotencyKey(BaseModel):
+    """Model with idempotency keys of processed requests and their responses"""
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_id_key"),)
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    key = Column(String(255), nullable=False)
+
+    # Digest of request body. Same key with another body is rejected
+    request_hash = Column(String(64), nullable=False)
+
+    # Empty until request is processed
+    response = Column(JSON, nullable=True)
+    expires_at = Column(postgresql.TIMESTAMP(timezone=True), nullable=False, index=True)
@@ -1,7 +1,7 @@
 
 from uuid import uuid4
 
-from sqlalchemy import DECIMAL, JSON, Column, Enum, ForeignKey, Integer, String
+from sqlalchemy import JSON, BigInteger, Column, Enum, ForeignKey, Integer, String
 from sqlalchemy.orm import relationship
 
 from app.models.base import BaseModel
@@ -14,14 +14,16 @@ class Receipt(BaseModel):
     __tablename__ = "receipts"
 
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    total_amount = Column(DECIMAL(10, 2), nullable=False)
+    # Amounts are in cents
+    total_amount = Column(BigInteger, nullable=False)
     payment_type = Column(Enum(PaymentType), nullable=False, default=PaymentType.CASH.value)
-    payment_amount = Column(DECIMAL(10, 2), nullable=False)
-    rest_amount = Column(DECIMAL(10, 2), nullable=False)
+    payment_amount = Column(BigInteger, nullable=False)
+    rest_amount = Column(BigInteger, nullable=False)
 
     # Used as unique identifier for receipts. In real cases some fiscal data can be used instead of uuid64
     public_id = Column(String(36), unique=True, default=lambda: str(uuid4()))
 
+    # List of products with name, quantity and price and total in cents
     products = Column(JSON, nullable=False)
 
     user = relationship("User", back_populates="receipts")
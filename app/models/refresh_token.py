@@ -0,0 +1,18 @@
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String
+from sqlalchemy.dialects import postgresql
+
+from app.models.base import BaseModel
+
+
+class RefreshToken(BaseModel):
+    """Model with issued refresh tokens. Only token digest is stored"""
+
+    __tablename__ = "refresh_tokens"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)
+
+    # All tokens rotated from the same login share one family. Family is revoked on token reuse
+    family_id = Column(String(36), nullable=False, index=True)
+    expires_at = Column(postgresql.TIMESTAMP(timezone=True), nullable=False)
+    revoked = Column(Boolean, nullable=False, default=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, String
+from sqlalchemy import BigInteger, Boolean, Column, Integer, String
 from sqlalchemy.orm import relationship
 
 from app.models.base import BaseModel
@@ -16,4 +16,8 @@ class User(BaseModel):
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False)
 
+    # Denormalized aggregates of user`s receipts, updated in receipt inserting transaction. Amount is in cents
+    receipt_count = Column(Integer, nullable=False, default=0, server_default="0")
+    receipt_total_amount = Column(BigInteger, nullable=False, default=0, server_default="0")
+
     receipts = relationship("Receipt", back_populates="user", cascade="all, delete-orphan")
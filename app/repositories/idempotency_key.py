@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.db.base import Database
+from app.models.idempotency_key import IdempotencyKey
+from app.repositories.interfaces import AbstractIdempotencyKeyRepository
+
+
+class IdempotencyKeyRepository(AbstractIdempotencyKeyRepository):
+    """Repository with db requests for idempotency keys"""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def claim(self, user_id: int, key: str, request_hash: str, expires_at: datetime) -> bool:
+        """
+        Insert key if it doesn`t exist yet.
+        Returns True only for the request that inserted the key, so only it processes the request.
+        """
+
+        query = (
+            insert(IdempotencyKey)
+            .values(user_id=user_id, key=key, request_hash=request_hash, expires_at=expires_at)
+            .on_conflict_do_nothing(constraint="uq_idempotency_keys_user_id_key")
+            .returning(IdempotencyKey.id)
+        )
+        return bool(await self.db.execute_query(IdempotencyKey, query))
+
+    async def get(self, user_id: int, key: str) -> IdempotencyKey | None:
+        """Get idempotency key of user"""
+
+        return await self.db.get(IdempotencyKey, IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+
+    async def save_response(self, user_id: int, key: str, response: dict) -> list[int]:
+        """Store response of processed request"""
+
+        query = (
+            update(IdempotencyKey)
+            .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            .values(response=response)
+            .returning(IdempotencyKey.id)
+        )
+        return await self.db.execute_query(IdempotencyKey, query)
+
+    async def release(self, user_id: int, key: str) -> list[int]:
+        """Delete key of failed request, so it can be retried"""
+
+        query = (
+            delete(IdempotencyKey)
+            .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key, IdempotencyKey.response.is_(None))
+            .returning(IdempotencyKey.id)
+        )
+        return await self.db.execute_query(IdempotencyKey, query)
+
+    async def delete_expired(self, now: datetime) -> list[int]:
+        """Delete keys with expired ttl"""
+
+        query = (
+            delete(IdempotencyKey)
+            .where(IdempotencyKey.expires_at <= now)
+            .returning(IdempotencyKey.id)
+        )
+        return await self.db.execute_query(IdempotencyKey, query)
@@ -0,0 +1,121 @@
+"""
+Interfaces of repositories. Postgres and in-memory backends implement them, interactors and dependencies
+depend only on them. Backend missing a method can`t be instantiated, signatures are checked in tests.
+"""
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import Row
+
+from app.models.idempotency_key import IdempotencyKey
+from app.models.receipt import Receipt
+from app.models.refresh_token import RefreshToken
+from app.models.user import User
+from app.schemas.receipt import ReceiptFilter
+
+
+class AbstractUserRepository(ABC):
+    """Storage of users"""
+
+    @abstractmethod
+    async def create(self, email: str, password: str, **kwargs) -> User:
+        """Create user or return existing one with the same email"""
+
+    @abstractmethod
+    async def get_by_email(self, email: str) -> User | None:
+        """Get user by email"""
+
+    @abstractmethod
+    async def get_by_id(self, user_id: int) -> User | None:
+        """Get user by user_id"""
+
+    @abstractmethod
+    async def update_password(self, user_id: int, new_password: str) -> User | None:
+        """Update user`s password"""
+
+    @abstractmethod
+    async def update(self, user_id: int, data: dict) -> User | None:
+        """Update user`s data"""
+
+
+class AbstractReceiptRepository(ABC):
+    """Storage of receipts"""
+
+    @abstractmethod
+    async def create(self, receipt_data: dict) -> Receipt:
+        """Create receipt and add it to user`s counters"""
+
+    @abstractmethod
+    async def get_by_id(self, receipt_id: int) -> Receipt | None:
+        """Get receipt by id"""
+
+    @abstractmethod
+    async def get_user_receipts(self, user_id: int) -> list[Receipt]:
+        """Return all user receipts"""
+
+    @abstractmethod
+    async def get_filtered(
+        self,
+        user_id: int,
+        filters: ReceiptFilter,
+        limit: int,
+        offset: int,
+        fields: Sequence[str] | None = None,
+    ) -> tuple[list[Receipt] | list[Row] | list[SimpleNamespace], int]:
+        """
+        Return page of filtered receipts ordered by created desc and amount of all filtered receipts.
+        If fields are set only these attributes are returned
+        """
+
+    @abstractmethod
+    async def get_by_public_id(self, public_id: str) -> Receipt | None:
+        """Get receipt by public_id"""
+
+
+class AbstractRefreshTokenRepository(ABC):
+    """Storage of refresh tokens"""
+
+    @abstractmethod
+    async def create(self, user_id: int, token_hash: str, family_id: str, expires_at: datetime) -> RefreshToken:
+        """Store refresh token digest"""
+
+    @abstractmethod
+    async def rotate(self, token_hash: str, new_token_hash: str, expires_at: datetime) -> RefreshToken | None:
+        """
+        Mark active token as used and store new token of the same user and family atomically.
+        Returns new token, None if presented one is unknown or already used
+        """
+
+    @abstractmethod
+    async def get_by_hash(self, token_hash: str) -> RefreshToken | None:
+        """Get token by digest"""
+
+    @abstractmethod
+    async def revoke_family(self, family_id: str) -> list[int]:
+        """Revoke all tokens of family"""
+
+
+class AbstractIdempotencyKeyRepository(ABC):
+    """Storage of idempotency keys with responses"""
+
+    @abstractmethod
+    async def claim(self, user_id: int, key: str, request_hash: str, expires_at: datetime) -> bool:
+        """Claim key for processing request, False if it is already claimed"""
+
+    @abstractmethod
+    async def get(self, user_id: int, key: str) -> IdempotencyKey | None:
+        """Get key with stored response"""
+
+    @abstractmethod
+    async def save_response(self, user_id: int, key: str, response: dict) -> list[int]:
+        """Store response of processed request"""
+
+    @abstractmethod
+    async def release(self, user_id: int, key: str) -> list[int]:
+        """Delete claimed key without response, so request can be retried"""
+
+    @abstractmethod
+    async def delete_expired(self, now: datetime) -> list[int]:
+        """Delete expired keys"""
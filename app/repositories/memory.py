@@ -0,0 +1,285 @@
+"""
+In-memory storage backend. Repositories here have the same interface as postgres ones and keep data
+in indexed dicts of one process, so full API can run without database in tests and benchmarks.
+Methods never await, so each of them is atomic for the event loop like one db statement.
+"""
+from collections import defaultdict
+from collections.abc import Iterator, Sequence
+from datetime import UTC, date, datetime, time
+from itertools import count
+from types import SimpleNamespace
+from uuid import uuid4
+
+from sqlalchemy.exc import IntegrityError
+
+from app.models.idempotency_key import IdempotencyKey
+from app.models.receipt import Receipt
+from app.models.refresh_token import RefreshToken
+from app.models.user import User
+from app.repositories.interfaces import (AbstractIdempotencyKeyRepository, AbstractReceiptRepository,
+                                         AbstractRefreshTokenRepository, AbstractUserRepository)
+from app.schemas.receipt import ReceiptFilter
+
+
+class MemoryStorage:
+    """Tables and indexes of in-memory backend shared by repositories"""
+
+    def __init__(self):
+        self.ids = defaultdict(lambda: count(1))
+
+        self.users: dict[int, User] = {}
+        self.users_by_email: dict[str, User] = {}
+
+        self.receipts: dict[int, Receipt] = {}
+        self.receipts_by_public_id: dict[str, Receipt] = {}
+        # Receipts of user in creation order, so reversed list is ordered by created desc
+        self.receipts_by_user: dict[int, list[Receipt]] = defaultdict(list)
+
+        self.refresh_tokens: dict[str, RefreshToken] = {}
+        self.refresh_tokens_by_family: dict[str, list[RefreshToken]] = defaultdict(list)
+
+        self.idempotency_keys: dict[tuple[int, str], IdempotencyKey] = {}
+
+    def next_id(self, table: str) -> int:
+        """Return next autoincrement id of table"""
+        return next(self.ids[table])
+
+
+def _start_of_day(value: date) -> datetime:
+    """Date as timestamp of its midnight, the same way postgres compares dates with timestamps"""
+    return value if isinstance(value, datetime) else datetime.combine(value, time.min, tzinfo=UTC)
+
+
+class MemoryUserRepository(AbstractUserRepository):
+    """User repository storing users in memory"""
+
+    def __init__(self, storage: MemoryStorage):
+        self.storage = storage
+
+    async def create(self, email: str, password: str, **kwargs) -> User:
+        """Creating user or return existing one with the same email"""
+        user = self.storage.users_by_email.get(email)
+        if user is not None:
+            return user
+
+        now = datetime.now(UTC)
+        user = User(
+            id=self.storage.next_id("users"),
+            email=email,
+            password=password,
+            is_active=True,
+            is_superuser=False,
+            receipt_count=0,
+            receipt_total_amount=0,
+            created=now,
+            updated=now,
+            **kwargs,
+        )
+        self.storage.users[user.id] = user
+        self.storage.users_by_email[email] = user
+        return user
+
+    async def get_by_email(self, email: str) -> User | None:
+        """Get user by email"""
+        return self.storage.users_by_email.get(email)
+
+    async def get_by_id(self, user_id: int) -> User | None:
+        """Get user by user_id"""
+        return self.storage.users.get(user_id)
+
+    async def update_password(self, user_id: int, new_password: str) -> User | None:
+        """Update user`s password"""
+        return await self.update(user_id, {"password": new_password})
+
+    async def update(self, user_id: int, data: dict) -> User | None:
+        """Update user`s data"""
+        user = self.storage.users.get(user_id)
+        if user is None:
+            return None
+
+        email = data.get("email")
+        if email is not None and email != user.email:
+            if email in self.storage.users_by_email:
+                raise IntegrityError("UPDATE users", data, ValueError("Email already used"))
+            del self.storage.users_by_email[user.email]
+            self.storage.users_by_email[email] = user
+
+        for key, value in data.items():
+            setattr(user, key, value)
+        user.updated = datetime.now(UTC)
+        return user
+
+
+class MemoryReceiptRepository(AbstractReceiptRepository):
+    """Receipt repository storing receipts in memory"""
+
+    def __init__(self, storage: MemoryStorage):
+        self.storage = storage
+
+    async def create(self, receipt_data: dict) -> Receipt:
+        """Create receipt"""
+        now = datetime.now(UTC)
+        receipt = Receipt(
+            **{
+                "public_id": str(uuid4()),
+                "created": now,
+                **receipt_data,
+                "id": self.storage.next_id("receipts"),
+                "updated": now,
+            },
+        )
+        self.storage.receipts[receipt.id] = receipt
+        self.storage.receipts_by_public_id[receipt.public_id] = receipt
+        self.storage.receipts_by_user[receipt.user_id].append(receipt)
+
+        user = self.storage.users.get(receipt.user_id)
+        if user is not None:
+            user.receipt_count += 1
+            user.receipt_total_amount += receipt.total_amount
+        return receipt
+
+    async def get_by_id(self, receipt_id: int) -> Receipt | None:
+        """Get receipt by id"""
+        return self.storage.receipts.get(receipt_id)
+
+    async def get_user_receipts(self, user_id: int) -> list[Receipt]:
+        """Return all user receipts"""
+        return list(self.storage.receipts_by_user.get(user_id, []))
+
+    async def get_filtered(
+        self,
+        user_id: int,
+        filters: ReceiptFilter,
+        limit: int,
+        offset: int,
+        fields: Sequence[str] | None = None,
+    ) -> tuple[list[Receipt] | list[SimpleNamespace], int]:
+        """
+        Return page of filtered receipts ordered by created desc and amount of all filtered receipts.
+        If fields are set only these attributes are returned like columns selected from db.
+        """
+        if user_id is not None:
+            receipts = reversed(self.storage.receipts_by_user.get(user_id, []))
+        else:
+            receipts = iter(sorted(self.storage.receipts.values(), key=lambda r: r.created, reverse=True))
+
+        matched = list(self._filter(receipts, filters))
+        page = matched[offset:offset + limit]
+        user = self.storage.users.get(user_id)
+        total = user.receipt_count if user is not None and filters.is_empty else len(matched)
+
+        if fields:
+            page = [SimpleNamespace(**{field: getattr(receipt, field) for field in fields}) for receipt in page]
+        return page, total
+
+    @staticmethod
+    def _filter(receipts: Iterator[Receipt], filters: ReceiptFilter) -> Iterator[Receipt]:
+        """Yield receipts matching filters with the same semantics as db query"""
+        date_from = _start_of_day(filters.date_from) if filters.date_from is not None else None
+        date_to = _start_of_day(filters.date_to) if filters.date_to is not None else None
+
+        for receipt in receipts:
+            if filters.min_amount and receipt.total_amount < filters.min_amount:
+                continue
+            if filters.max_amount and receipt.total_amount > filters.max_amount:
+                continue
+            if date_from is not None and receipt.created < date_from:
+                continue
+            if date_to is not None and receipt.created > date_to:
+                continue
+            if filters.payment_type and receipt.payment_type != filters.payment_type:
+                continue
+            yield receipt
+
+    async def get_by_public_id(self, public_id: str) -> Receipt | None:
+        """Get receipt by public_id"""
+        return self.storage.receipts_by_public_id.get(public_id)
+
+
+class MemoryRefreshTokenRepository(AbstractRefreshTokenRepository):
+    """Refresh token repository storing tokens in memory"""
+
+    def __init__(self, storage: MemoryStorage):
+        self.storage = storage
+
+    async def create(self, user_id: int, token_hash: str, family_id: str, expires_at: datetime) -> RefreshToken:
+        """Store refresh token digest"""
+        token = RefreshToken(
+            id=self.storage.next_id("refresh_tokens"),
+            user_id=user_id,
+            token_hash=token_hash,
+            family_id=family_id,
+            expires_at=expires_at,
+            revoked=False,
+            created=datetime.now(UTC),
+        )
+        self.storage.refresh_tokens[token_hash] = token
+        self.storage.refresh_tokens_by_family[family_id].append(token)
+        return token
+
+    async def rotate(self, token_hash: str, new_token_hash: str, expires_at: datetime) -> RefreshToken | None:
+        """Revoke active token and store new one of its family"""
+        token = self.storage.refresh_tokens.get(token_hash)
+        if token is None or token.revoked:
+            return None
+        token.revoked = True
+        return await self.create(token.user_id, new_token_hash, token.family_id, expires_at)
+
+    async def get_by_hash(self, token_hash: str) -> RefreshToken | None:
+        """Get refresh token by its digest"""
+        return self.storage.refresh_tokens.get(token_hash)
+
+    async def revoke_family(self, family_id: str) -> list[int]:
+        """Revoke all tokens issued from one login"""
+        revoked = []
+        for token in self.storage.refresh_tokens_by_family.get(family_id, []):
+            if not token.revoked:
+                token.revoked = True
+                revoked.append(token.id)
+        return revoked
+
+
+class MemoryIdempotencyKeyRepository(AbstractIdempotencyKeyRepository):
+    """Idempotency key repository storing keys in memory"""
+
+    def __init__(self, storage: MemoryStorage):
+        self.storage = storage
+
+    async def claim(self, user_id: int, key: str, request_hash: str, expires_at: datetime) -> bool:
+        """Store key if it doesn`t exist yet. Returns True only for the request that stored the key"""
+        if (user_id, key) in self.storage.idempotency_keys:
+            return False
+
+        self.storage.idempotency_keys[(user_id, key)] = IdempotencyKey(
+            id=self.storage.next_id("idempotency_keys"),
+            user_id=user_id,
+            key=key,
+            request_hash=request_hash,
+            expires_at=expires_at,
+        )
+        return True
+
+    async def get(self, user_id: int, key: str) -> IdempotencyKey | None:
+        """Get idempotency key of user"""
+        return self.storage.idempotency_keys.get((user_id, key))
+
+    async def save_response(self, user_id: int, key: str, response: dict) -> list[int]:
+        """Store response of processed request"""
+        record = self.storage.idempotency_keys.get((user_id, key))
+        if record is None:
+            return []
+        record.response = response
+        return [record.id]
+
+    async def release(self, user_id: int, key: str) -> list[int]:
+        """Delete key of failed request, so it can be retried"""
+        record = self.storage.idempotency_keys.get((user_id, key))
+        if record is None or record.response is not None:
+            return []
+        del self.storage.idempotency_keys[(user_id, key)]
+        return [record.id]
+
+    async def delete_expired(self, now: datetime) -> list[int]:
+        """Delete keys with expired ttl"""
+        expired = [k for k, record in self.storage.idempotency_keys.items() if record.expires_at <= now]
+        return [self.storage.idempotency_keys.pop(k).id for k in expired]
@@ -1,26 +1,340 @@
-from sqlalchemy import func, select
+import zlib
+from collections.abc import Sequence
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+from uuid import uuid4
 
+import ujson
+from sqlalchemy import (BigInteger, DateTime, Integer, Row, Select, String,
+                        bindparam, cast, column, delete, exists, func, insert,
+                        select, table, text, update)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.conf.settings import settings
+from app.core.cache import LRUCache
 from app.db.base import Database
+from app.db.batch import BatchInserter
+from app.models.archived_receipt import ArchivedReceipt
 from app.models.receipt import Receipt
-from app.schemas.receipt import ReceiptFilter, ReceiptResponse
+from app.models.user import User
+from app.repositories.interfaces import AbstractReceiptRepository
+from app.schemas.receipt import ReceiptFilter
+
+# Columns returned by receipts insert. user_id and total_amount are needed for users counters
+INSERT_RETURNING = ["id", "created", "updated", "user_id", "total_amount"]
+
+users_table = User.__table__
+update_counters_query = (
+    update(users_table)
+    .where(users_table.c.id == bindparam("counter_user_id"))
+    .values(
+        receipt_count=users_table.c.receipt_count + bindparam("counter_count"),
+        receipt_total_amount=users_table.c.receipt_total_amount + bindparam("counter_amount"),
+    )
+)
+
+
+async def update_user_counters(session: AsyncSession, rows: list[Row]) -> None:
+    """Add inserted receipts to their owners counters in the inserting transaction"""
+    counters: dict[int, tuple[int, int]] = {}
+    for row in rows:
+        count, amount = counters.get(row.user_id, (0, 0))
+        counters[row.user_id] = (count + 1, amount + row.total_amount)
+    if not counters:
+        return
+
+    user_ids = sorted(counters)
+    if len(user_ids) > 1:
+        # Concurrent batches lock users in the same order, so they don`t deadlock
+        await session.execute(select(User.id).where(User.id.in_(user_ids)).order_by(User.id).with_for_update())
+    await session.execute(
+        update_counters_query,
+        [
+            {"counter_user_id": user_id, "counter_count": counters[user_id][0], "counter_amount": counters[user_id][1]}
+            for user_id in user_ids
+        ],
+    )
+
+
+def apply_filters(query: Select, table: type[Receipt | ArchivedReceipt], user_id: int | None,
+                  filters: ReceiptFilter) -> Select:
+    """Add filters conditions to query of receipts or archived receipts"""
+    if user_id is not None:
+        query = query.where(table.user_id == user_id)
+    if filters.min_amount:
+        query = query.where(table.total_amount >= filters.min_amount)
+    if filters.max_amount:
+        query = query.where(table.total_amount <= filters.max_amount)
+    if filters.date_from is not None:
+        query = query.where(table.created >= filters.date_from)
+    if filters.date_to is not None:
+        query = query.where(table.created <= filters.date_to)
+    if filters.payment_type:
+        query = query.where(table.payment_type == filters.payment_type)
+    return query
+
+
+def list_query(user_id: int | None, filters: ReceiptFilter, fields: Sequence[str] | None = None) -> Select:
+    """Query of receipts list without pagination, newest first. Only fields columns are selected if they are set"""
+    columns = [getattr(Receipt, field) for field in fields] if fields else [Receipt]
+    return apply_filters(select(*columns), Receipt, user_id, filters).order_by(Receipt.created.desc())
+
+
+def count_query(query: Select) -> Select:
+    """Query of amount of rows of query"""
+    return select(func.count()).select_from(query.subquery())
+
 
+# Receipt fields stored in compressed payload of archived receipt, the rest are archive columns
+PAYLOAD_FIELDS = ("products", "payment_amount", "rest_amount", "updated")
+
+# Decompressed archived receipts by id and by public_id
+archive_cache = LRUCache(maxsize=settings.RECEIPT_ARCHIVE_CACHE_SIZE)
+
+
+def archive_horizon() -> datetime:
+    """Receipts created after this moment are not archived yet"""
+    return datetime.now(UTC) - timedelta(days=settings.RECEIPT_ARCHIVE_AFTER_DAYS)
+
+
+def reaches_archive(filters: ReceiptFilter) -> bool:
+    """Whether archived receipts can match filters. Day of margin covers db session time zone"""
+    return filters.date_from is None or filters.date_from <= archive_horizon().date() + timedelta(days=1)
+
+
+def pack_receipt(receipt: Receipt) -> dict:
+    """Row of archive for receipt"""
+    payload = {
+        "products": receipt.products,
+        "payment_amount": receipt.payment_amount,
+        "rest_amount": receipt.rest_amount,
+        "updated": receipt.updated.isoformat(),
+    }
+    return {
+        "id": receipt.id,
+        "user_id": receipt.user_id,
+        "public_id": receipt.public_id,
+        "payment_type": receipt.payment_type,
+        "total_amount": receipt.total_amount,
+        "created": receipt.created,
+        # zlib is in standard library, so archive is readable wherever app runs
+        "payload": zlib.compress(ujson.dumps(payload).encode(), settings.RECEIPT_ARCHIVE_COMPRESSION_LEVEL),
+    }
+
+
+def unpack_receipt(archived: ArchivedReceipt) -> Receipt:
+    """Transient receipt model restored from archive row"""
+    payload = ujson.loads(zlib.decompress(archived.payload))
+    return Receipt(
+        id=archived.id,
+        user_id=archived.user_id,
+        public_id=archived.public_id,
+        payment_type=archived.payment_type,
+        total_amount=archived.total_amount,
+        payment_amount=payload["payment_amount"],
+        rest_amount=payload["rest_amount"],
+        products=payload["products"],
+        created=archived.created,
+        updated=datetime.fromisoformat(payload["updated"]),
+    )
+
+
+# Columns of bulk imported receipts in order of import records
+IMPORT_COLUMNS = (
+    "user_id", "public_id", "payment_type", "total_amount", "payment_amount", "rest_amount", "products", "created",
+)
+
+# Staging table is created in import transaction and dropped on commit. It has no constraints,
+# so COPY only writes rows, all checks are done by INSERT ... SELECT in one statement
+create_import_staging = text(
+    "CREATE TEMPORARY TABLE receipts_import (user_id integer, public_id varchar(36), payment_type text, "
+    "total_amount bigint, payment_amount bigint, rest_amount bigint, products json, created timestamptz) "
+    "ON COMMIT DROP",
+)
+import_staging = table(
+    "receipts_import",
+    column("user_id", Integer),
+    column("public_id", String),
+    column("payment_type", String),
+    column("total_amount", BigInteger),
+    column("payment_amount", BigInteger),
+    column("rest_amount", BigInteger),
+    column("products"),
+    column("created", DateTime(timezone=True)),
+)
+# Receipts of unknown users and already imported ones, also moved to archive since then, are skipped
+import_query = (
+    pg_insert(Receipt.__table__)
+    .from_select(
+        IMPORT_COLUMNS,
+        select(
+            import_staging.c.user_id,
+            import_staging.c.public_id,
+            cast(import_staging.c.payment_type, Receipt.payment_type.type),
+            import_staging.c.total_amount,
+            import_staging.c.payment_amount,
+            import_staging.c.rest_amount,
+            import_staging.c.products,
+            func.coalesce(import_staging.c.created, func.now()),
+        )
+        .where(exists().where(User.id == import_staging.c.user_id))
+        .where(~exists().where(ArchivedReceipt.public_id == import_staging.c.public_id)),
+    )
+    .on_conflict_do_nothing(index_elements=["public_id"])
+    .returning(Receipt.user_id, Receipt.total_amount)
+)
 
-class ReceiptRepository:
+
+class ArchivedReceiptRepository:
+    """
+    Repository of receipts moved to archive table. Archived receipts never change,
+    so decompressed ones are cached in process without invalidation
+    """
+
+    def __init__(self, db: Database, cache: LRUCache | None = None):
+        self.db = db
+        self.cache = cache if cache is not None else archive_cache
+
+    async def archive(self, created_before: datetime, batch_size: int) -> int:
+        """
+        Move batch of the oldest receipts created before created_before to archive in one transaction.
+        Receipts locked by other transactions are skipped. Returns amount of moved receipts.
+        Users counters are not changed, they count archived receipts too
+        """
+        async with self.db.transaction(ArchivedReceipt.__tablename__, "archive_receipts") as session:
+            receipts = (
+                await session.execute(
+                    select(Receipt)
+                    .where(Receipt.created < created_before)
+                    .order_by(Receipt.created)
+                    .limit(batch_size)
+                    .with_for_update(skip_locked=True),
+                )
+            ).scalars().all()
+            if receipts:
+                await session.execute(insert(ArchivedReceipt), [pack_receipt(receipt) for receipt in receipts])
+                await session.execute(
+                    delete(Receipt.__table__).where(Receipt.id.in_([receipt.id for receipt in receipts])),
+                )
+        return len(receipts)
+
+    async def get_by_id(self, receipt_id: int) -> Receipt | None:
+        """Get archived receipt by id"""
+        receipt = self.cache.get(receipt_id)
+        if receipt is None:
+            archived = await self.db.get(ArchivedReceipt, ArchivedReceipt.id == receipt_id)
+            receipt = self._unpack(archived) if archived is not None else None
+        return receipt
+
+    async def get_by_public_id(self, public_id: str) -> Receipt | None:
+        """Get archived receipt by public_id"""
+        receipt = self.cache.get(public_id)
+        if receipt is None:
+            archived = await self.db.get(ArchivedReceipt, ArchivedReceipt.public_id == public_id)
+            receipt = self._unpack(archived) if archived is not None else None
+        return receipt
+
+    async def count(self, user_id: int | None, filters: ReceiptFilter) -> int:
+        """Count archived receipts matching filters"""
+        query = apply_filters(select(func.count()).select_from(ArchivedReceipt), ArchivedReceipt, user_id, filters)
+        return (await self.db.execute_query(ArchivedReceipt, query))[0]
+
+    async def get_filtered(
+        self,
+        user_id: int | None,
+        filters: ReceiptFilter,
+        limit: int,
+        offset: int,
+        fields: Sequence[str] | None = None,
+    ) -> list[Receipt] | list[Row] | list[SimpleNamespace]:
+        """
+        Return archived receipts matching filters, newest first.
+        Payload is read and decompressed only if requested fields are in it
+        """
+        plain = bool(fields) and not set(fields) & set(PAYLOAD_FIELDS)
+        columns = [getattr(ArchivedReceipt, field) for field in fields] if plain else [ArchivedReceipt]
+        query = (
+            apply_filters(select(*columns), ArchivedReceipt, user_id, filters)
+            .order_by(ArchivedReceipt.created.desc())
+            .limit(limit)
+            .offset(offset)
+        )
+        if plain:
+            return list(await self.db.fetch_all(ArchivedReceipt, query))
+
+        receipts = [
+            self.cache.get(archived.id) or self._unpack(archived)
+            for archived in await self.db.execute_query(ArchivedReceipt, query)
+        ]
+        if fields:
+            return [SimpleNamespace(**{field: getattr(receipt, field) for field in fields}) for receipt in receipts]
+        return receipts
+
+    def _unpack(self, archived: ArchivedReceipt) -> Receipt:
+        """Decompress archived receipt and cache it"""
+        receipt = unpack_receipt(archived)
+        self.cache.set(receipt.id, receipt)
+        self.cache.set(receipt.public_id, receipt)
+        return receipt
+
+
+class ReceiptRepository(AbstractReceiptRepository):
     """Repository with db requests for receipts"""
 
-    def __init__(self, db: Database):
+    def __init__(
+        self,
+        db: Database,
+        batch_inserter: BatchInserter | None = None,
+        archive: ArchivedReceiptRepository | None = None,
+    ):
         self.db = db
+        self.batch_inserter = batch_inserter
+        self.archive = archive if archive is not None else ArchivedReceiptRepository(db)
 
     async def create(self, receipt_data: dict) -> Receipt:
-        """Create receipt in db"""
+        """
+        Create receipt in db and add it to user`s counters in the same transaction.
+        With batch inserter receipt is inserted together with concurrently created receipts
+        """
+
+        receipt_data = {**receipt_data, "public_id": receipt_data.get("public_id") or str(uuid4())}
+        if self.batch_inserter is None:
+            [row] = await self.db.insert_many(
+                Receipt,
+                [receipt_data],
+                returning=INSERT_RETURNING,
+                after_insert=update_user_counters,
+            )
+        else:
+            row = await self.batch_inserter.insert(receipt_data)
+        return Receipt(**{**receipt_data, "id": row.id, "created": row.created, "updated": row.updated})
 
-        receipt = Receipt(**receipt_data)
-        return await self.db.create(receipt)
+    async def import_batch(self, records: list[tuple]) -> list[Row]:
+        """
+        Load receipts with binary COPY into staging table and move them to receipts with INSERT ... SELECT,
+        users counters are updated in the same transaction. Records are tuples of IMPORT_COLUMNS values,
+        payment_type is enum name and products are JSON string. Returns inserted rows with user_id and total_amount
+        """
+        async with self.db.transaction(Receipt.__tablename__, "import_receipts") as session:
+            await session.execute(create_import_staging)
+            raw_connection = await (await session.connection()).get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                "receipts_import",
+                records=records,
+                columns=IMPORT_COLUMNS,
+            )
+            rows = (await session.execute(import_query)).all()
+            await update_user_counters(session, rows)
+        return rows
 
-    async def get_by_id(self, receipt_id: int) -> ReceiptResponse | None:
-        """Get receipt by id"""
+    async def get_by_id(self, receipt_id: int) -> Receipt | None:
+        """Get receipt by id, from archive if it is not in receipts table"""
 
-        return await self.db.get(Receipt, Receipt.id == receipt_id)
+        receipt = await self.db.get(Receipt, Receipt.id == receipt_id)
+        if receipt is None:
+            receipt = await self.archive.get_by_id(receipt_id)
+        return receipt
 
     async def get_user_receipts(self, user_id: int) -> list[Receipt]:
         """Return all user receipts"""
@@ -36,39 +350,58 @@ class ReceiptRepository:
         filters: ReceiptFilter,
         limit: int,
         offset: int,
-    ) -> tuple[list[Receipt], int]:
-        """Make request to db and return filtered receipts data"""
+        fields: Sequence[str] | None = None,
+    ) -> tuple[list[Receipt] | list[Row], int]:
+        """
+        Make request to db and return filtered receipts data.
+        If fields are set only these columns are selected and rows are returned instead of models,
+        so heavy columns like products are not read at all.
+        Total of unfiltered user`s receipts is read from user`s counter instead of counting them.
+        Archived receipts are older than receipts in table, so they follow them in the list. Archive is read
+        only if page goes past receipts in table and dates filter can match archived receipts.
+        """
 
-        query = (
-            select(Receipt)
-            .order_by(Receipt.created.desc())
-        )
+        query = list_query(user_id, filters, fields)
+        archive_needed = reaches_archive(filters)
 
-        if user_id is not None:
-            query = query.where(Receipt.user_id == user_id)
-        if filters.min_amount:
-            query = query.where(Receipt.total_amount >= filters.min_amount)
-        if filters.max_amount:
-            query = query.where(Receipt.total_amount <= filters.max_amount)
-        if filters.date_from is not None:
-            query = query.where(Receipt.created >= filters.date_from)
-        if filters.date_to is not None:
-            query = query.where(Receipt.created <= filters.date_to)
-        if filters.payment_type:
-            query = query.where(Receipt.payment_type == filters.payment_type)
-
-        # Get total count
-        count_query = select(func.count()).select_from(query.subquery())
-        total = (await self.db.execute_query(Receipt, count_query))
+        # Get total count, counters include archived receipts
+        table_total = None
+        if user_id is not None and filters.is_empty:
+            counter_query = select(User.receipt_count).where(User.id == user_id)
+            total = next(iter(await self.db.execute_query(User, counter_query)), 0)
+        else:
+            table_total = await self._count(query)
+            total = table_total + (await self.archive.count(user_id, filters) if archive_needed else 0)
 
         # Apply pagination
-        query = query.limit(limit).offset(offset)
+        page_query = query.limit(limit).offset(offset)
+
+        if fields:
+            result = list(await self.db.fetch_all(Receipt, page_query))
+        else:
+            result = list(await self.db.execute_query(Receipt, page_query))
+
+        if archive_needed and len(result) < limit and offset + len(result) < total:
+            if table_total is None:
+                table_total = offset + len(result) if result else await self._count(query)
+            result += await self.archive.get_filtered(
+                user_id,
+                filters,
+                limit=limit - len(result),
+                offset=max(offset - table_total, 0),
+                fields=fields,
+            )
 
-        result = await self.db.execute_query(Receipt, query)
+        return result, total
 
-        return list(result), total
+    async def _count(self, query: Select) -> int:
+        """Count rows of query"""
+        return (await self.db.execute_query(Receipt, count_query(query)))[0]
 
-    async def get_by_public_id(self, public_id: str) -> Receipt:
-        """Get receipt by public_id"""
+    async def get_by_public_id(self, public_id: str) -> Receipt | None:
+        """Get receipt by public_id, from archive if it is not in receipts table"""
 
-        return await self.db.get(Receipt, Receipt.public_id == public_id)
+        receipt = await self.db.get(Receipt, Receipt.public_id == public_id)
+        if receipt is None:
+            receipt = await self.archive.get_by_public_id(public_id)
+        return receipt
@@ -0,0 +1,69 @@
+from datetime import datetime
+
+from sqlalchemy import update
+
+from app.db.base import Database
+from app.models.refresh_token import RefreshToken
+from app.repositories.interfaces import AbstractRefreshTokenRepository
+
+
+class RefreshTokenRepository(AbstractRefreshTokenRepository):
+    """Repository with db requests for refresh tokens"""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def create(self, user_id: int, token_hash: str, family_id: str, expires_at: datetime) -> RefreshToken:
+        """Store refresh token digest in db"""
+
+        token = RefreshToken(
+            user_id=user_id,
+            token_hash=token_hash,
+            family_id=family_id,
+            expires_at=expires_at,
+            revoked=False,
+        )
+        return await self.db.create(token)
+
+    async def rotate(self, token_hash: str, new_token_hash: str, expires_at: datetime) -> RefreshToken | None:
+        """
+        Revoke active token and store new one of its family in one transaction, so failed insert doesn`t
+        leave client with consumed token. Concurrent requests with the same token can`t rotate it twice.
+        """
+
+        query = (
+            update(RefreshToken)
+            .where(RefreshToken.token_hash == token_hash, RefreshToken.revoked.is_(False))
+            .values(revoked=True)
+            .returning(RefreshToken.user_id, RefreshToken.family_id)
+        )
+        async with self.db.transaction(RefreshToken.__tablename__, "rotate_refresh_token") as session:
+            consumed = (await session.execute(query)).first()
+            if consumed is None:
+                return None
+            token = RefreshToken(
+                user_id=consumed.user_id,
+                token_hash=new_token_hash,
+                family_id=consumed.family_id,
+                expires_at=expires_at,
+                revoked=False,
+            )
+            session.add(token)
+            await session.flush()
+        return token
+
+    async def get_by_hash(self, token_hash: str) -> RefreshToken | None:
+        """Get refresh token by its digest"""
+
+        return await self.db.get(RefreshToken, RefreshToken.token_hash == token_hash)
+
+    async def revoke_family(self, family_id: str) -> list[int]:
+        """Revoke all tokens issued from one login"""
+
+        query = (
+            update(RefreshToken)
+            .where(RefreshToken.family_id == family_id, RefreshToken.revoked.is_(False))
+            .values(revoked=True)
+            .returning(RefreshToken.id)
+        )
+        return await self.db.execute_query(RefreshToken, query)
@@ -1,10 +1,23 @@
 
+from sqlalchemy import BigInteger, Row, func, select, union_all
+
 from app.db.base import Database
+from app.models.archived_receipt import ArchivedReceipt
+from app.models.receipt import Receipt
 from app.models.user import User
 from app.repositories.base import BaseRepository
+from app.repositories.interfaces import AbstractUserRepository
+
 
+def user_receipts_amounts():
+    """Subquery with user_id and total_amount of receipts and archived receipts, which are counted together"""
+    return union_all(
+        select(Receipt.user_id, Receipt.total_amount),
+        select(ArchivedReceipt.user_id, ArchivedReceipt.total_amount),
+    ).subquery()
 
-class UserRepository(BaseRepository):
+
+class UserRepository(BaseRepository, AbstractUserRepository):
     """User repository for interacting with db"""
 
     def __init__(self, db: Database):
@@ -37,3 +50,52 @@ class UserRepository(BaseRepository):
         return await self.db.update(table=User,
                                     obj_id=user_id,
                                     values=data)
+
+    async def get_receipt_counters_drift(self, limit: int) -> list[Row]:
+        """Return users whose receipt counters differ from their receipts with both values"""
+        receipts = user_receipts_amounts()
+        actual = (
+            select(
+                receipts.c.user_id,
+                func.count().label("receipt_count"),
+                func.sum(receipts.c.total_amount).cast(BigInteger).label("receipt_total_amount"),
+            )
+            .group_by(receipts.c.user_id)
+            .subquery()
+        )
+        actual_count = func.coalesce(actual.c.receipt_count, 0)
+        actual_amount = func.coalesce(actual.c.receipt_total_amount, 0)
+        query = (
+            select(
+                User.id,
+                User.receipt_count,
+                User.receipt_total_amount,
+                actual_count.label("actual_count"),
+                actual_amount.label("actual_total_amount"),
+            )
+            .outerjoin(actual, actual.c.user_id == User.id)
+            .where((User.receipt_count != actual_count) | (User.receipt_total_amount != actual_amount))
+            .order_by(User.id)
+            .limit(limit)
+        )
+        return list(await self.db.fetch_all(User, query))
+
+    async def reconcile_receipt_counters(self, user_id: int) -> None:
+        """
+        Recount user`s receipt counters.
+        User is locked first, so receipts inserted concurrently are either counted here
+        or added to counters by their transaction after this one
+        """
+        async with self.db.transaction(User.__tablename__, "reconcile_receipt_counters") as session:
+            await session.execute(select(User.id).where(User.id == user_id).with_for_update())
+            receipts = user_receipts_amounts()
+            count, amount = (
+                await session.execute(
+                    select(func.count(), func.coalesce(func.sum(receipts.c.total_amount).cast(BigInteger), 0))
+                    .where(receipts.c.user_id == user_id),
+                )
+            ).one()
+            user = await session.get(User, user_id)
+            if user is not None:
+                user.receipt_count = count
+                user.receipt_total_amount = amount
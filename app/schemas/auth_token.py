@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+
+
+class TokenRefreshDTO(BaseModel):
+    """DTO for refreshing access token"""
+    refresh_token: str
@@ -1,8 +1,9 @@
 import enum
 from datetime import date, datetime
-from decimal import Decimal
 
-from pydantic import BaseModel, model_validator
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.core.money import Money, MoneyInput, PositiveMoneyInput
 
 
 class PaymentType(str, enum.Enum):
@@ -11,36 +12,27 @@ class PaymentType(str, enum.Enum):
     CASHLESS = "cashless"
 
 
+# Constraints are declared on fields, so they are checked in pydantic-core without Python validators
+# called for every product of large receipt
 class ProductCreate(BaseModel):
     """Model for receipt's product"""
     name: str
-    price: Decimal
-    quantity: int
-
-    @model_validator(mode='after')
-    def validate(self) -> 'ProductCreate':
-        if self.price <= 0:
-            raise ValueError("Price must be greater than 0")
-        if self.quantity <= 0:
-            raise ValueError("Quantity must be greater than 0")
-        return self
+    price: PositiveMoneyInput
+    quantity: int = Field(gt=0)
 
 
-class ProductData(ProductCreate):
-    """Model with product info"""
-    total: Decimal
+class ProductData(BaseModel):
+    """Model with product info. Amounts are in cents"""
+    name: str
+    price: Money
+    quantity: int
+    total: Money
 
 
 class PaymentCreate(BaseModel):
     """Model with payment info"""
     payment_type: PaymentType
-    amount: Decimal
-
-    @model_validator(mode='after')
-    def validate(self) -> 'PaymentCreate':
-        if self.amount <= 0:
-            raise ValueError("Amount must be greater than 0")
-        return self
+    amount: PositiveMoneyInput
 
 
 class ReceiptCreateDTO(BaseModel):
@@ -49,22 +41,69 @@ class ReceiptCreateDTO(BaseModel):
     payment: PaymentCreate
 
 
+class ReceiptImportDTO(ReceiptCreateDTO):
+    """Receipt from bulk import file. Naive created is treated as UTC, missing one is import time"""
+    user_id: int = Field(gt=0)
+    public_id: str | None = Field(default=None, min_length=1, max_length=36)
+    created: datetime | None = None
+
+
 class ReceiptResponse(BaseModel):
     """Model for selected receipt info response"""
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     public_id: str
     products: list[ProductData]
     payment_type: PaymentType
-    payment_amount: Decimal
-    total_amount: Decimal
-    rest_amount: Decimal
+    payment_amount: Money
+    total_amount: Money
+    rest_amount: Money
     created: datetime
 
 
+class ReceiptAcceptedResponse(BaseModel):
+    """Model for receipt accepted for creation but not written to db yet"""
+    public_id: str
+    products: list[ProductData]
+    payment_type: PaymentType
+    payment_amount: Money
+    total_amount: Money
+    rest_amount: Money
+    created: datetime
+
+
+class ReceiptListItem(BaseModel):
+    """Model for receipt in list response. Only requested fields are set"""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int | None = None
+    public_id: str | None = None
+    products: list[ProductData] | None = None
+    payment_type: PaymentType | None = None
+    payment_amount: Money | None = None
+    total_amount: Money | None = None
+    rest_amount: Money | None = None
+    created: datetime | None = None
+
+
+class ReceiptListResponse(BaseModel):
+    """Model for page of receipts"""
+    items: list[ReceiptListItem]
+    total: int
+    limit: int
+    offset: int
+
+
 class ReceiptFilter(BaseModel):
     """Filters for db request for getting receipts data"""
     date_from: date | None = None
     date_to: date | None = None
-    min_amount: Decimal | None = None
-    max_amount: Decimal | None = None
+    min_amount: MoneyInput | None = None
+    max_amount: MoneyInput | None = None
     payment_type: str | None = None
+
+    @property
+    def is_empty(self) -> bool:
+        """Whether no filter is set. Zero amounts are not filters, the same as in db request"""
+        return not (self.date_from or self.date_to or self.min_amount or self.max_amount or self.payment_type)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr
 
 
 class UserUpdateDTO(BaseModel):
@@ -14,3 +14,14 @@ class UserCreateDTO(BaseModel):
     password: str
     first_name: str | None = None
     last_name: str | None = None
+
+
+class UserResponse(BaseModel):
+    """Public user`s profile"""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    email: str
+    first_name: str | None = None
+    last_name: str | None = None
+    is_active: bool | None = None
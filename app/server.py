@@ -0,0 +1,247 @@
+"""
+Multi-process server. Master binds one socket and spawns workers which accept connections from it.
+Db connections budget is divided between workers. Worker is replaced after serving max requests or
+growing over memory limit, so leaks are contained. Crashed workers are restarted with growing delay,
+master exits with error when worker keeps crashing. Workers write their stats to files in stats dir
+and /api/status aggregates them.
+
+Usage:
+    python -m app.server [--host 0.0.0.0] [--port 8080] [--workers 4]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from multiprocessing.process import BaseProcess
+from pathlib import Path
+
+import ujson
+import uvicorn
+
+from app.conf.settings import settings
+from app.core.worker_stats import max_rss_mb
+from app.db.base import Database, Singleton
+from app.db.write_behind import assign_journals
+from app.logger import BaseLogger
+
+MONITOR_INTERVAL_SECONDS = 0.5
+# uvicorn calls on_tick every 0.1 second
+STATS_EVERY_TICKS = 10
+
+
+def worker_pool_size(workers: int) -> int:
+    """Db pool size of one worker within global connections budget"""
+    return max(1, settings.DB_POOL_BUDGET // workers)
+
+
+class WorkerServer(uvicorn.Server):
+    """uvicorn server which reports its stats and exits when it takes too much memory"""
+
+    def __init__(self, config: uvicorn.Config, stats_dir: Path, max_memory_mb: int):
+        super().__init__(config)
+        self.stats_path = stats_dir / f"worker-{os.getpid()}.json"
+        self.max_memory_mb = max_memory_mb
+        self.started_at = time.time()
+
+    async def on_tick(self, counter: int) -> bool:
+        """Write stats and check memory limit once per second"""
+        if counter % STATS_EVERY_TICKS == 0:
+            rss = max_rss_mb()
+            self.write_stats(rss)
+            if self.max_memory_mb and rss > self.max_memory_mb:
+                BaseLogger.log({"text": "Worker memory limit exceeded", "rss_mb": rss}, level="info")
+                return True
+        return await super().on_tick(counter)
+
+    def write_stats(self, rss: float) -> None:
+        """Atomically replace worker stats file"""
+        # App modules are imported by worker after settings are changed
+        from app.core.shared_cache import caches_stats
+        from app.interactors.receipt import receipt_list_cache, receipt_single_flight
+        from app.repositories.receipt import archive_cache
+
+        db = Singleton._instances.get(Database)
+        stats = {
+            "pid": os.getpid(),
+            "started": self.started_at,
+            "updated": time.time(),
+            "requests": self.server_state.total_requests,
+            "connections": len(self.server_state.connections),
+            "rss_mb": round(rss, 1),
+            "max_requests": self.config.limit_max_requests,
+            "db_pool": db.engine.pool.status() if db is not None else None,
+            "single_flight": receipt_single_flight.stats(),
+            "caches": caches_stats(),
+            "receipt_list_cache": receipt_list_cache.stats(),
+            "receipt_archive_cache": archive_cache.stats(),
+        }
+        tmp_path = self.stats_path.with_suffix(".tmp")
+        tmp_path.write_text(ujson.dumps(stats))
+        tmp_path.replace(self.stats_path)
+
+
+def run_worker(sock: socket.socket, workers: int, slot: int, stats_dir: Path) -> None:
+    """Worker process entrypoint"""
+    # Settings are changed before app modules are imported, because caches are configured on import
+    settings.DB_POOL_SIZE = worker_pool_size(workers)
+    settings.DB_MAX_OVERFLOW = 0
+    settings.DB_POOL_WARMUP_CONNECTIONS = min(settings.DB_POOL_WARMUP_CONNECTIONS, settings.DB_POOL_SIZE)
+    settings.WORKER_STATS_DIR = stats_dir
+    settings.WORKER_SLOT = slot
+    settings.WORKERS = workers
+
+    # Jitter, so workers don`t restart at the same time
+    max_requests = settings.WORKER_MAX_REQUESTS
+    if max_requests:
+        max_requests += random.randint(0, max_requests // 10)  # noqa: S311
+
+    config = uvicorn.Config(
+        "app.main:create_app",
+        factory=True,
+        access_log=False,
+        limit_max_requests=max_requests or None,
+    )
+    server = WorkerServer(config, stats_dir, settings.WORKER_MAX_MEMORY_MB)
+    try:
+        server.run(sockets=[sock])
+    finally:
+        server.stats_path.unlink(missing_ok=True)
+
+
+class Master:
+    """Spawns workers and replaces exited ones until stopped or until some worker keeps crashing"""
+
+    def __init__(self, sock: socket.socket, workers: int, stats_dir: Path):
+        self.sock = sock
+        self.workers = workers
+        self.stats_dir = stats_dir
+        self.processes: list[BaseProcess] = []
+        self.should_exit = False
+        self.exit_code = 0
+        self.context = multiprocessing.get_context("spawn")
+        # Monotonic times of consecutive crashes and scheduled restarts by slot
+        self.crashes: dict[int, list[float]] = {}
+        self.restart_at: dict[int, float] = {}
+
+    def spawn(self, slot: int) -> BaseProcess:
+        """Start worker in slot"""
+        process = self.context.Process(
+            target=run_worker,
+            kwargs={"sock": self.sock, "workers": self.workers, "slot": slot, "stats_dir": self.stats_dir},
+        )
+        process.start()
+        return process
+
+    def handle_exit(self, *args) -> None:  # noqa: ARG002
+        """Stop on SIGINT and SIGTERM"""
+        self.should_exit = True
+
+    def restart_delay(self, slot: int, exitcode: int | None, now: float) -> float:
+        """
+        Record exit of worker and return delay before its restart.
+        Worker exiting by itself, e.g. after max requests, is restarted at once. Crashes within window are
+        consecutive, every one doubles delay. Too many of them stop master with error
+        """
+        if exitcode == 0:
+            self.crashes.pop(slot, None)
+            return 0.0
+
+        crashes = [t for t in self.crashes.get(slot, []) if now - t < settings.WORKER_CRASH_WINDOW_SECONDS]
+        crashes.append(now)
+        self.crashes[slot] = crashes
+        if len(crashes) >= settings.WORKER_CRASH_LIMIT:
+            BaseLogger.log(
+                {"text": "Worker keeps crashing, stopping server", "slot": slot, "crashes": len(crashes)},
+                level="error",
+            )
+            self.should_exit = True
+            self.exit_code = 1
+        return min(
+            settings.WORKER_RESTART_DELAY_SECONDS * 2 ** (len(crashes) - 1),
+            settings.WORKER_RESTART_MAX_DELAY_SECONDS,
+        )
+
+    def supervise(self, now: float) -> None:
+        """Schedule restarts of exited workers and spawn ones which waited enough"""
+        for slot, process in enumerate(self.processes):
+            if process.is_alive() or self.should_exit:
+                continue
+            if slot not in self.restart_at:
+                (self.stats_dir / f"worker-{process.pid}.json").unlink(missing_ok=True)
+                delay = self.restart_delay(slot, process.exitcode, now)
+                if self.should_exit:
+                    return
+                BaseLogger.log(
+                    {"text": "Restarting worker", "pid": process.pid, "code": process.exitcode, "delay": delay},
+                )
+                self.restart_at[slot] = now + delay
+            if now >= self.restart_at[slot]:
+                del self.restart_at[slot]
+                self.processes[slot] = self.spawn(slot)
+
+    def run(self) -> int:
+        """Run workers until signal. Returns exit code of server"""
+        signal.signal(signal.SIGINT, self.handle_exit)
+        signal.signal(signal.SIGTERM, self.handle_exit)
+
+        self.processes = [self.spawn(slot) for slot in range(self.workers)]
+        BaseLogger.log(
+            {"text": "Started workers", "workers": self.workers, "pool_size": worker_pool_size(self.workers)},
+            level="info",
+        )
+
+        while not self.should_exit:
+            self.supervise(time.monotonic())
+            time.sleep(MONITOR_INTERVAL_SECONDS)
+
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        return self.exit_code
+
+
+def main() -> int:
+    """Bind socket and run master. Returns exit code"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")  # noqa: S104
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    parser.add_argument("--workers", type=int, default=settings.WORKERS or os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    if settings.WORKER_STATS_DIR is None:
+        stats_dir = Path(tempfile.mkdtemp(prefix="receipts-viewer-"))
+    else:
+        stats_dir = settings.WORKER_STATS_DIR
+        stats_dir.mkdir(parents=True, exist_ok=True)
+
+    if args.workers > 1 and settings.CACHE_REDIS_URL is None:
+        BaseLogger.log(
+            {"text": "Receipt list cache is disabled, workers can share its versions only through CACHE_REDIS_URL"},
+            level="info",
+        )
+    if settings.RECEIPT_WRITE_BEHIND_ENABLED:
+        assign_journals(settings.RECEIPT_JOURNAL_PATH, args.workers)
+
+    try:
+        return Master(sock, args.workers, stats_dir).run()
+    finally:
+        sock.close()
+        if settings.WORKER_STATS_DIR is None:
+            shutil.rmtree(stats_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""
+Move receipts older than RECEIPT_ARCHIVE_AFTER_DAYS to archived_receipts table with compressed payload.
+Receipts are moved in batches, each one in its own short transaction, so the job can run next to the app.
+Archived receipts stay available by id, public_id and in lists.
+
+Usage:
+    python -m app.tools.archive_receipts [--batch-size 1000] [--max-batches 100]
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+from time import perf_counter
+
+from app.conf.settings import settings
+from app.db.base import Database
+from app.logger import BaseLogger
+from app.repositories.receipt import ArchivedReceiptRepository, archive_horizon
+
+
+async def archive(repo: ArchivedReceiptRepository, *, created_before: datetime, batch_size: int,
+                  max_batches: int | None = None) -> int:
+    """Move receipts to archive until no old ones are left or max_batches is reached. Returns amount of moved"""
+    moved = 0
+    batches = 0
+    start = perf_counter()
+    while max_batches is None or batches < max_batches:
+        count = await repo.archive(created_before, batch_size)
+        moved += count
+        batches += 1
+        BaseLogger.log(
+            {"text": "Receipts archived", "batch": batches, "count": count, "total": moved,
+             "rate": round(moved / (perf_counter() - start), 1)},
+            level="info",
+        )
+        if count < batch_size:
+            break
+    return moved
+
+
+async def main() -> int:
+    """Run archiving with arguments from command line"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=settings.RECEIPT_ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--max-batches", type=int, default=None, help="stop after this amount of batches")
+    args = parser.parse_args()
+
+    db = Database(
+        logger=BaseLogger(),
+        connection_string=settings.sqlalchemy_database_uri,
+        pool_size=1,
+        max_overflow=0,
+    )
+    created_before = archive_horizon()
+    try:
+        moved = await archive(
+            ArchivedReceiptRepository(db),
+            created_before=created_before,
+            batch_size=args.batch_size,
+            max_batches=args.max_batches,
+        )
+    finally:
+        await db.dispose()
+
+    print(f"Archived receipts created before {created_before.isoformat()}: {moved}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
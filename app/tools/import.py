@@ -0,0 +1,11 @@
+"""
+Entry point of `python -m app.tools.import`, see app.tools.import_receipts.
+"import" is a keyword, so the code lives in a module which can be imported
+"""
+import asyncio
+import sys
+
+from app.tools.import_receipts import main
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,276 @@
+"""
+Bulk import of receipts from JSONL or CSV files. Records are validated and totals are calculated
+in worker processes with the same rules as receipts created through API, valid ones are loaded
+with binary COPY into staging table and moved to receipts with INSERT ... SELECT in chunks.
+
+JSONL line is receipt creation request with user_id and optional created and public_id:
+    {"user_id": 1, "products": [{"name": "Milk", "price": "10.50", "quantity": 2}],
+     "payment": {"payment_type": "cash", "amount": "50"}, "created": "2024-01-31T10:00:00+02:00"}
+CSV has header with columns user_id, payment_type, payment_amount, products (JSON list),
+created and public_id, the last two are optional.
+
+Receipts without public_id get one derived from record number with HMAC keyed by SECRET_KEY and random
+salt of the file import. Public ids are public links, so they can`t be guessed, and files with the same
+name don`t share them. Salt is kept in <file>.checkpoint together with progress saved after every chunk,
+so interrupted import continues from it and importing the same file again, even with --restart,
+doesn`t duplicate receipts. Invalid records are written to <file>.errors.jsonl.
+
+Usage:
+    python -m app.tools.import receipts.jsonl [more.csv] [--workers 4] [--chunk-size 5000] [--restart]
+"""
+import argparse
+import asyncio
+import csv
+import hashlib
+import hmac
+import multiprocessing
+import os
+import secrets
+import sys
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import UTC
+from itertools import islice
+from pathlib import Path
+from time import perf_counter
+from uuid import UUID
+
+import ujson
+from pydantic import ValidationError
+
+from app.conf.settings import settings
+from app.core.query_cache import VersionedQueryCache
+from app.db.base import Database
+from app.interactors.receipt import ReceiptInteractor, receipt_list_cache
+from app.logger import BaseLogger
+from app.repositories.receipt import ReceiptRepository
+from app.schemas.receipt import ReceiptImportDTO
+
+
+def read_records(path: Path) -> Iterator[str | dict]:
+    """Raw records of file: lines of JSONL or rows of CSV as dicts"""
+    with path.open(newline="", encoding="utf-8") as file:
+        if path.suffix.lower() == ".csv":
+            yield from csv.DictReader(file)
+        else:
+            yield from file
+
+
+def read_chunks(path: Path, start: int, chunk_size: int) -> Iterator[tuple[int, list[str | dict]]]:
+    """Chunks of records with number of their first record, records before start are skipped"""
+    records = islice(read_records(path), start, None)
+    while chunk := list(islice(records, chunk_size)):
+        yield start, chunk
+        start += len(chunk)
+
+
+def parse_record(record: str | dict) -> ReceiptImportDTO | None:
+    """Validate raw record, None for empty line"""
+    if isinstance(record, str):
+        return ReceiptImportDTO.model_validate_json(record) if record.strip() else None
+    try:
+        products = ujson.loads(record.get("products") or "null")
+    except ValueError:
+        products = record.get("products")
+    return ReceiptImportDTO.model_validate({
+        "user_id": record.get("user_id"),
+        "products": products,
+        "payment": {"payment_type": record.get("payment_type"), "amount": record.get("payment_amount")},
+        "created": record.get("created") or None,
+        "public_id": record.get("public_id") or None,
+    })
+
+
+def public_id_key(salt: str) -> bytes:
+    """Key of public ids generated for receipts of one file import"""
+    return hmac.digest(settings.SECRET_KEY.encode(), salt.encode(), hashlib.sha256)
+
+
+def generate_public_id(key: bytes, number: int) -> str:
+    """Public id of record without one, formatted like ids of receipts created through API"""
+    return str(UUID(bytes=hmac.digest(key, str(number).encode(), hashlib.sha256)[:16], version=4))
+
+
+def validate_chunk(key: bytes, start: int, records: list[str | dict]) -> tuple[list[tuple], list[dict]]:
+    """
+    Validate records and calculate totals. Runs in worker process.
+    Returns records for ReceiptRepository.import_batch and errors of invalid records
+    """
+    rows = []
+    errors = []
+    for number, record in enumerate(records, start):
+        try:
+            receipt = parse_record(record)
+        except ValidationError as e:
+            errors.append({"record": number, "errors": ujson.loads(e.json(include_url=False, include_input=False))})
+            continue
+        if receipt is None:
+            continue
+
+        try:
+            data = ReceiptInteractor.build_receipt_data(receipt.user_id, receipt)
+        except ValueError as e:
+            errors.append({"record": number, "errors": [{"type": "value_error", "loc": [], "msg": str(e)}]})
+            continue
+        created = receipt.created
+        if created is not None and created.tzinfo is None:
+            created = created.replace(tzinfo=UTC)
+        rows.append((
+            receipt.user_id,
+            receipt.public_id or generate_public_id(key, number),
+            data["payment_type"].name,
+            data["total_amount"],
+            data["payment_amount"],
+            data["rest_amount"],
+            ujson.dumps(data["products"], ensure_ascii=False),
+            created,
+        ))
+    return rows, errors
+
+
+class Checkpoint:
+    """Progress of file import and salt of its public ids, saved next to the file after every committed chunk"""
+
+    def __init__(self, path: Path):
+        self.path = path.with_name(f"{path.name}.checkpoint")
+        self.salt = secrets.token_hex(16)
+        self.records = 0
+        self.imported = 0
+        self.skipped = 0
+        self.invalid = 0
+
+    def load(self) -> None:
+        """Restore progress of previous run if it was saved"""
+        if self.path.exists():
+            saved = ujson.loads(self.path.read_text())
+            self.salt = saved.get("salt", self.salt)
+            self.records = saved["records"]
+            self.imported = saved["imported"]
+            self.skipped = saved["skipped"]
+            self.invalid = saved["invalid"]
+
+    def reset(self) -> None:
+        """Start from the beginning. Salt is kept, so receipts imported before are skipped"""
+        self.records = 0
+        self.imported = 0
+        self.skipped = 0
+        self.invalid = 0
+
+    def save(self) -> None:
+        """Write progress atomically, so interrupted write doesn`t lose previous one"""
+        temporary = self.path.with_name(f"{self.path.name}.tmp")
+        temporary.write_text(ujson.dumps({
+            "salt": self.salt,
+            "records": self.records,
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "invalid": self.invalid,
+        }))
+        temporary.replace(self.path)
+
+
+async def import_file(
+    repo: ReceiptRepository,
+    path: Path,
+    *,
+    executor: Executor | None,
+    chunk_size: int,
+    prefetch: int = 2,
+    restart: bool = False,
+    list_cache: VersionedQueryCache | None = None,
+) -> tuple[Checkpoint, float]:
+    """
+    Import file chunk by chunk continuing from checkpoint. Up to prefetch chunks are validated
+    while the previous one is loaded, chunks are committed in file order.
+    Returns final progress and rate of records processed by this run per second
+    """
+    list_cache = list_cache if list_cache is not None else receipt_list_cache
+    checkpoint = Checkpoint(path)
+    checkpoint.load()
+    errors_path = path.with_name(f"{path.name}.errors.jsonl")
+    if restart:
+        checkpoint.reset()
+        errors_path.unlink(missing_ok=True)
+    # Salt must be on disk before the first chunk is committed, otherwise resume would generate other ids
+    checkpoint.save()
+    key = public_id_key(checkpoint.salt)
+
+    loop = asyncio.get_running_loop()
+    pending: deque[tuple[int, asyncio.Future]] = deque()
+    first_record = checkpoint.records
+    start_time = perf_counter()
+
+    async def load_chunk(end: int, validated: asyncio.Future) -> None:
+        rows, errors = await validated
+        inserted = await repo.import_batch(rows) if rows else []
+        await list_cache.bump_many({row.user_id for row in inserted})
+        if errors:
+            with errors_path.open("a", encoding="utf-8") as errors_file:
+                errors_file.writelines(f"{ujson.dumps(error, ensure_ascii=False)}\n" for error in errors)
+
+        checkpoint.records = end
+        checkpoint.imported += len(inserted)
+        checkpoint.skipped += len(rows) - len(inserted)
+        checkpoint.invalid += len(errors)
+        checkpoint.save()
+        BaseLogger.log(
+            {"text": "Receipts imported", "file": str(path), "records": end, "imported": checkpoint.imported,
+             "skipped": checkpoint.skipped, "invalid": checkpoint.invalid,
+             "rate": round((end - first_record) / (perf_counter() - start_time), 1)},
+            level="info",
+        )
+
+    for start, records in read_chunks(path, checkpoint.records, chunk_size):
+        pending.append((
+            start + len(records),
+            loop.run_in_executor(executor, validate_chunk, key, start, records),
+        ))
+        if len(pending) > prefetch:
+            await load_chunk(*pending.popleft())
+    while pending:
+        await load_chunk(*pending.popleft())
+    return checkpoint, (checkpoint.records - first_record) / (perf_counter() - start_time)
+
+
+async def main() -> int:
+    """Run import with arguments from command line"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", type=Path, help="JSONL or CSV files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="validation processes")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="receipts loaded in one transaction")
+    parser.add_argument("--restart", action="store_true", help="ignore progress of saved checkpoints")
+    args = parser.parse_args()
+
+    db = Database(
+        logger=BaseLogger(),
+        connection_string=settings.sqlalchemy_database_uri,
+        pool_size=1,
+        max_overflow=0,
+    )
+    repo = ReceiptRepository(db)
+    failed = False
+    # Workers are spawned, so they don`t inherit db connections and event loop of this process
+    with ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        try:
+            for path in args.files:
+                progress, rate = await import_file(
+                    repo,
+                    path,
+                    executor=executor,
+                    chunk_size=args.chunk_size,
+                    prefetch=args.workers,
+                    restart=args.restart,
+                )
+                failed = failed or bool(progress.invalid)
+                print(
+                    f"{path}: imported {progress.imported}, skipped {progress.skipped}, "
+                    f"invalid {progress.invalid} ({rate:.0f} records/s)",
+                )
+        finally:
+            await db.dispose()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
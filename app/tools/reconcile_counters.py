@@ -0,0 +1,62 @@
+"""
+Check drift of users receipt counters from receipts table and optionally fix it.
+Exit code is 1 if drift is found and not fixed, so the job can alert from cron.
+
+Usage:
+    python -m app.tools.reconcile_counters [--fix] [--limit 1000]
+"""
+import argparse
+import asyncio
+import sys
+
+from app.conf.settings import settings
+from app.core.money import format_cents
+from app.db.base import Database
+from app.logger import BaseLogger
+from app.repositories.user import UserRepository
+
+
+async def reconcile(user_repo: UserRepository, *, fix: bool, limit: int) -> int:
+    """Log users with drifted counters and recount them if fix is set. Returns amount of drifted users"""
+    drifted = await user_repo.get_receipt_counters_drift(limit)
+    for row in drifted:
+        BaseLogger.log(
+            {
+                "text": "Receipt counters drift",
+                "user_id": row.id,
+                "receipt_count": row.receipt_count,
+                "actual_count": row.actual_count,
+                "receipt_total_amount": format_cents(row.receipt_total_amount),
+                "actual_total_amount": format_cents(row.actual_total_amount),
+            },
+            level="error",
+        )
+        if fix:
+            await user_repo.reconcile_receipt_counters(row.id)
+    return len(drifted)
+
+
+async def main() -> int:
+    """Run reconciliation with arguments from command line"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fix", action="store_true", help="recount drifted users")
+    parser.add_argument("--limit", type=int, default=1000, help="max users checked in one run")
+    args = parser.parse_args()
+
+    db = Database(
+        logger=BaseLogger(),
+        connection_string=settings.sqlalchemy_database_uri,
+        pool_size=1,
+        max_overflow=0,
+    )
+    try:
+        drifted = await reconcile(UserRepository(db), fix=args.fix, limit=args.limit)
+    finally:
+        await db.dispose()
+
+    print(f"Users with drifted receipt counters: {drifted}{' (fixed)' if drifted and args.fix else ''}")
+    return 1 if drifted and not args.fix else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,44 @@
+"""
+Overhead of get_current_user_id auth dependency with and without verified tokens cache.
+
+Usage:
+    python -m benchmarks.bench_auth [--calls 100000] [--tokens 100]
+"""
+import argparse
+import asyncio
+from time import perf_counter
+
+from app.core import security
+from app.core.cache import LRUCache
+
+
+async def run(calls: int, tokens: list[str]) -> float:
+    """Return mean time of one get_current_user_id call in microseconds"""
+    start = perf_counter()
+    for i in range(calls):
+        await security.get_current_user_id(tokens[i % len(tokens)])
+    return (perf_counter() - start) / calls * 1_000_000
+
+
+def main() -> None:
+    """Run benchmark and print results"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=100_000)
+    parser.add_argument("--tokens", type=int, default=100, help="amount of distinct clients tokens")
+    args = parser.parse_args()
+
+    tokens = [security.create_access_token(data={"sub": str(i)})[0] for i in range(args.tokens)]
+
+    security.token_cache = LRUCache(maxsize=0)
+    uncached = asyncio.run(run(args.calls, tokens))
+
+    security.token_cache = LRUCache(maxsize=args.tokens)
+    cached = asyncio.run(run(args.calls, tokens))
+
+    print(f"jwt.decode on every call: {uncached:8.2f} us/call")
+    print(f"verified tokens cache:    {cached:8.2f} us/call ({uncached / cached:.1f}x)")
+    print(f"cache stats: {security.token_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Payload size and serialization CPU of receipts list page for every response encoding:
+JSON and MessagePack, uncompressed and compressed with gzip and br as CompressionMiddleware does.
+Encodings whose packages are not installed are skipped.
+
+Usage:
+    python -m benchmarks.bench_encodings [--items 100] [--products 10] [--rounds 100]
+"""
+import argparse
+import random
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+from time import perf_counter
+from types import SimpleNamespace
+from uuid import UUID
+
+from app.conf.settings import settings
+from app.core.compression import BrotliEncoder, GzipEncoder, brotli
+from app.core.responses import MsgPackResponse, PydanticJSONResponse, msgpack
+from app.interactors.receipt import receipts_adapter
+from app.schemas.receipt import PaymentType, ReceiptListResponse
+
+WORDS = ["milk", "bread", "apple", "coffee", "cheese", "water", "juice", "sugar", "tea", "butter", "rice", "eggs"]
+
+
+def make_rows(items: int, products: int, seed: int = 0) -> list[SimpleNamespace]:
+    """Build db-like receipt rows with varied products, so compression ratio is realistic"""
+    rng = random.Random(seed)  # noqa: S311
+    rows = []
+    for i in range(items):
+        receipt_products = []
+        for _ in range(rng.randint(1, products * 2)):
+            price = rng.randint(10, 50000)
+            quantity = rng.randint(1, 5)
+            name = " ".join(rng.choices(WORDS, k=rng.randint(1, 3))).capitalize() + f" {rng.randint(1, 999)}"
+            receipt_products.append({"name": name, "price": price, "quantity": quantity, "total": price * quantity})
+        total = sum(product["total"] for product in receipt_products)
+        rows.append(SimpleNamespace(
+            id=i,
+            public_id=str(UUID(int=rng.getrandbits(128), version=4)),
+            user_id=1,
+            products=receipt_products,
+            payment_type=rng.choice(list(PaymentType)),
+            payment_amount=total + 1000,
+            total_amount=total,
+            rest_amount=1000,
+            created=datetime(2025, 1, 1, tzinfo=UTC) + timedelta(seconds=rng.randint(0, 10**7)),
+        ))
+    return rows
+
+
+def encoders() -> dict[str, Callable[[], GzipEncoder | BrotliEncoder] | None]:
+    """Compression variants with app settings"""
+    variants = {
+        "identity": None,
+        "gzip": lambda: GzipEncoder(settings.COMPRESSION_GZIP_LEVEL),
+    }
+    if brotli is not None:
+        variants["br"] = lambda: BrotliEncoder(settings.COMPRESSION_BROTLI_QUALITY)
+    return variants
+
+
+def measure(func: Callable[[], bytes], rounds: int) -> tuple[int, float]:
+    """Return payload size and mean time of one call in milliseconds"""
+    size = len(func())
+    start = perf_counter()
+    for _ in range(rounds):
+        func()
+    return size, (perf_counter() - start) / rounds * 1000
+
+
+def main() -> None:
+    """Run benchmark and print results"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--products", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=100)
+    args = parser.parse_args()
+
+    items = receipts_adapter.validate_python(make_rows(args.items, args.products), from_attributes=True)
+    page = ReceiptListResponse.model_construct(items=items, total=len(items), limit=args.items, offset=0)
+
+    response_classes = {"json": PydanticJSONResponse}
+    if msgpack is not None:
+        response_classes["msgpack"] = MsgPackResponse
+
+    print(f"page of {args.items} receipts with {args.products} products")
+    print(f"{'encoding':<20}{'bytes':>10}{'ms/page':>10}")
+    for name, response_class in response_classes.items():
+        for compression, make_encoder in encoders().items():
+            def encode(response_class=response_class, make_encoder=make_encoder) -> bytes:
+                body = response_class(page, exclude_unset=True).body
+                return make_encoder().compress(body, final=True) if make_encoder else body
+
+            size, elapsed = measure(encode, args.rounds)
+            print(f"{f'{name}+{compression}':<20}{size:>10}{elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Receipts inserts throughput and latency with one transaction per receipt (Database.create)
+against group commit (BatchInserter). Needs running postgres with applied migrations,
+connection is configured by the same env variables as the app.
+
+Usage:
+    python -m benchmarks.bench_group_commit [--creators 500] [--receipts 10] [--window-ms 2] [--max-size 100]
+"""
+import argparse
+import asyncio
+import statistics
+from time import perf_counter
+
+from sqlalchemy import delete
+
+from app.conf.settings import settings
+from app.db.base import Database
+from app.db.batch import BatchInserter
+from app.logger import BaseLogger
+from app.models.receipt import Receipt
+from app.models.user import User
+from app.repositories.receipt import ReceiptRepository
+from app.schemas.receipt import PaymentType
+
+
+class QuietLogger(BaseLogger):
+    """Logger skipping per-query messages"""
+
+    @staticmethod
+    def log(*args, level: str = "debug") -> None:
+        """Skip message"""
+
+
+def receipt_data(user_id: int) -> dict:
+    """Data of small receipt"""
+    return {
+        "user_id": user_id,
+        "total_amount": 2100,
+        "payment_type": PaymentType.CASH,
+        "payment_amount": 2500,
+        "rest_amount": 400,
+        "products": [{"name": "Product", "price": 1050, "quantity": 2, "total": 2100}],
+    }
+
+
+async def run(repo: ReceiptRepository, user_id: int, creators: int, receipts: int) -> dict:
+    """Run concurrent creators, each creating receipts one by one"""
+    latencies: list[float] = []
+
+    async def creator() -> None:
+        for _ in range(receipts):
+            start = perf_counter()
+            await repo.create(receipt_data(user_id))
+            latencies.append(perf_counter() - start)
+
+    start = perf_counter()
+    await asyncio.gather(*[creator() for _ in range(creators)])
+    elapsed = perf_counter() - start
+
+    return {
+        "inserts_per_second": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": statistics.quantiles(latencies, n=100)[98] * 1000,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    """Run benchmark for both modes and print results"""
+    db = Database(logger=QuietLogger(), connection_string=settings.sqlalchemy_database_uri)
+    user = await db.get_or_create(User, keys={"email": "bench-group-commit@example.com"}, defaults={"password": "-"})
+
+    batch_inserter = BatchInserter(
+        db=db,
+        table=Receipt,
+        key_column="public_id",
+        returning=["id", "created", "updated"],
+        window=args.window_ms / 1000,
+        max_size=args.max_size,
+    )
+
+    try:
+        # Open pool connections before measuring
+        await run(ReceiptRepository(db), user.id, args.creators, 1)
+
+        for name, repo in [
+            ("transaction per receipt", ReceiptRepository(db)),
+            ("group commit", ReceiptRepository(db, batch_inserter)),
+        ]:
+            result = await run(repo, user.id, args.creators, args.receipts)
+            print(
+                f"{name:<24} {result['inserts_per_second']:10.0f} inserts/s "
+                f"p50 {result['p50_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms",
+            )
+    finally:
+        await db.execute_query(Receipt, delete(Receipt).where(Receipt.user_id == user.id).returning(Receipt.id))
+        await db.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--creators", type=int, default=500)
+    parser.add_argument("--receipts", type=int, default=10, help="receipts created by every creator")
+    parser.add_argument("--window-ms", type=float, default=settings.RECEIPT_BATCH_WINDOW_MS)
+    parser.add_argument("--max-size", type=int, default=settings.RECEIPT_BATCH_MAX_SIZE)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,68 @@
+"""
+Parsing of large receipt creation body with totals calculation: FastAPI body parameter path
+(json.loads to dicts, then validation of dicts) against validation from raw JSON by pydantic-core.
+Time and peak traced memory per body are reported.
+
+Usage:
+    python -m benchmarks.bench_large_receipt [--products 50000] [--rounds 10]
+"""
+import argparse
+import json
+import tracemalloc
+from collections.abc import Callable
+from time import perf_counter
+
+from app.interactors.receipt import ReceiptInteractor
+from app.schemas.receipt import ReceiptCreateDTO
+
+
+def make_body(products: int) -> bytes:
+    """Receipt creation body"""
+    return json.dumps({
+        "products": [{"name": f"Product {i}", "price": f"{i % 500 + 0.99:.2f}", "quantity": i % 3 + 1}
+                     for i in range(products)],
+        "payment": {"payment_type": "cash", "amount": "100000000"},
+    }).encode()
+
+
+def body_parameter_path(body: bytes) -> dict:
+    """What FastAPI does for body parameter: whole body to dicts, then validation of dicts"""
+    return ReceiptInteractor.build_receipt_data(1, ReceiptCreateDTO.model_validate(json.loads(body)))
+
+
+def raw_json_path(body: bytes) -> dict:
+    """Validation from raw JSON without intermediate dicts"""
+    return ReceiptInteractor.build_receipt_data(1, ReceiptCreateDTO.model_validate_json(body))
+
+
+def measure(func: Callable[[bytes], dict], body: bytes, rounds: int) -> tuple[float, float]:
+    """Return mean time in milliseconds and peak traced memory in MB of one call"""
+    func(body)
+    start = perf_counter()
+    for _ in range(rounds):
+        func(body)
+    elapsed = (perf_counter() - start) / rounds * 1000
+
+    tracemalloc.start()
+    func(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def main() -> None:
+    """Run benchmark and print results"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    body = make_body(args.products)
+    print(f"body with {args.products} products, {len(body) / 2**20:.1f} MB")
+    for name, func in (("body parameter", body_parameter_path), ("raw json", raw_json_path)):
+        elapsed, peak = measure(func, body, args.rounds)
+        print(f"{name:<16}{elapsed:10.2f} ms{peak:10.1f} MB peak")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Amounts as integer cents against Decimal amounts for receipt with many lines: request validation
+with totals calculation, serialization of receipt row to JSON and receipt text formatting.
+Decimal path is a copy of app code before money was moved to cents.
+
+Usage:
+    python -m benchmarks.bench_money [--products 1000] [--rounds 100]
+"""
+import argparse
+from collections.abc import Callable
+from datetime import UTC, datetime
+from decimal import Decimal
+from textwrap import wrap
+from time import perf_counter
+from types import SimpleNamespace
+
+import ujson
+from pydantic import BaseModel, TypeAdapter
+
+from app.interactors.receipt import ReceiptInteractor
+from app.schemas.receipt import PaymentType, ReceiptCreateDTO, ReceiptResponse
+from benchmarks.micro import run_sync
+
+
+class DecimalProduct(BaseModel):
+    """Product with Decimal price"""
+    name: str
+    price: Decimal
+    quantity: int
+
+
+class DecimalPayment(BaseModel):
+    """Payment with Decimal amount"""
+    payment_type: PaymentType
+    amount: Decimal
+
+
+class DecimalReceiptCreate(BaseModel):
+    """Receipt creation request with Decimal amounts"""
+    products: list[DecimalProduct]
+    payment: DecimalPayment
+
+
+class DecimalProductData(DecimalProduct):
+    """Product with Decimal total"""
+    total: Decimal
+
+
+class DecimalReceiptResponse(BaseModel):
+    """Receipt response with Decimal amounts"""
+    id: int
+    public_id: str
+    products: list[DecimalProductData]
+    payment_type: PaymentType
+    payment_amount: Decimal
+    total_amount: Decimal
+    rest_amount: Decimal
+    created: datetime
+
+
+decimal_adapter = TypeAdapter(DecimalReceiptResponse)
+cents_adapter = TypeAdapter(ReceiptResponse)
+
+
+def make_request(products: int) -> dict:
+    """Receipt creation request body"""
+    return {
+        "products": [{"name": f"Product {i}", "price": f"{i % 500 + 0.99:.2f}", "quantity": i % 3 + 1}
+                     for i in range(products)],
+        "payment": {"payment_type": "cash", "amount": "100000000"},
+    }
+
+
+def decimal_receipt_data(data: DecimalReceiptCreate) -> dict:
+    """Totals calculation with Decimal amounts"""
+    products_with_total = []
+    total_amount = Decimal(0)
+    for product in data.products:
+        product_total = product.price * product.quantity
+        total_amount += product_total
+        products_with_total.append({
+            "name": product.name,
+            "price": float(product.price),
+            "quantity": product.quantity,
+            "total": float(product_total),
+        })
+    return {
+        "total_amount": total_amount,
+        "payment_type": data.payment.payment_type,
+        "payment_amount": data.payment.amount,
+        "rest_amount": data.payment.amount - total_amount,
+        "products": ujson.loads(ujson.dumps(products_with_total)),
+    }
+
+
+def decimal_text(receipt: SimpleNamespace, line_width: int) -> str:
+    """Receipt text with Decimal amounts"""
+    separator = "=" * line_width
+    small_separator = "-" * line_width
+    text = ["ФОП Джонсонюк Борис".center(line_width), separator]
+    for product in receipt.products:
+        name_lines = wrap(product["name"], line_width - 20)
+        price_line = f"{product['quantity']:.2f} x {product['price']:.2f}"
+        total = f"{product['total']:.2f}".rjust(line_width - len(price_line))
+        text.append(f"{price_line}{total}")
+        text.extend(name_lines)
+        text.append(small_separator)
+
+    payment_title = "Картка" if receipt.payment_type == PaymentType.CASHLESS else "Готівка"
+    text.extend([
+        separator,
+        f"{'СУМА':<{line_width-10}}{receipt.total_amount:>10.2f}",
+        f"{payment_title:<{line_width-10}}{receipt.payment_amount:>10.2f}",
+        f"{'Решта':<{line_width-10}}{receipt.rest_amount:>10.2f}",
+        separator,
+        receipt.created.strftime("%d.%m.%Y %H:%M").center(line_width),
+        "Дякуємо за покупку!".center(line_width),
+    ])
+    return "\n".join(text)
+
+
+def make_row(data: dict) -> SimpleNamespace:
+    """Db-like receipt row"""
+    return SimpleNamespace(id=1, public_id="00000000-0000-0000-0000-000000000001", created=datetime.now(UTC), **data)
+
+
+def measure(func: Callable[[], object], rounds: int) -> float:
+    """Return mean time of one call in milliseconds"""
+    func()
+    start = perf_counter()
+    for _ in range(rounds):
+        func()
+    return (perf_counter() - start) / rounds * 1000
+
+
+def main() -> None:
+    """Run benchmark and print results"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=100)
+    args = parser.parse_args()
+
+    body = ujson.dumps(make_request(args.products))
+    interactor = ReceiptInteractor(receipt_repo=None)
+    decimal_row = make_row(decimal_receipt_data(DecimalReceiptCreate.model_validate_json(body)))
+    cents_row = make_row(ReceiptInteractor.build_receipt_data(1, ReceiptCreateDTO.model_validate_json(body)))
+    assert decimal_row.total_amount * 100 == cents_row.total_amount
+
+    cases = {
+        "create": (
+            lambda: decimal_receipt_data(DecimalReceiptCreate.model_validate_json(body)),
+            lambda: ReceiptInteractor.build_receipt_data(1, ReceiptCreateDTO.model_validate_json(body)),
+        ),
+        "serialize": (
+            lambda: decimal_adapter.dump_json(decimal_adapter.validate_python(decimal_row, from_attributes=True)),
+            lambda: cents_adapter.dump_json(cents_adapter.validate_python(cents_row, from_attributes=True)),
+        ),
+        "format": (
+            lambda: decimal_text(decimal_row, 32),
+            lambda: run_sync(interactor.format_receipt_text(cents_row, 32)),
+        ),
+    }
+
+    print(f"receipt with {args.products} products")
+    print(f"{'case':<12}{'decimal ms':>12}{'cents ms':>12}{'speedup':>10}")
+    for name, (decimal_path, cents_path) in cases.items():
+        decimal_time = measure(decimal_path, args.rounds)
+        cents_time = measure(cents_path, args.rounds)
+        print(f"{name:<12}{decimal_time:>12.3f}{cents_time:>12.3f}{decimal_time / cents_time:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
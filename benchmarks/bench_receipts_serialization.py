@@ -0,0 +1,98 @@
+"""
+Serialization of receipts list page: per-row ReceiptResponse building with response_model=dict
+against single validation through cached TypeAdapter and single-pass pydantic-core dump.
+
+Usage:
+    python -m benchmarks.bench_receipts_serialization [--items 100] [--products 50] [--rounds 200]
+"""
+import argparse
+from datetime import UTC, datetime
+from time import perf_counter
+from types import SimpleNamespace
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app.core.responses import PydanticJSONResponse
+from app.interactors.receipt import receipts_adapter
+from app.schemas.receipt import (PaymentType, ProductData, ReceiptListResponse,
+                                 ReceiptResponse)
+
+# FastAPI validates and dumps return value through the same adapter for response_model=dict
+dict_adapter = TypeAdapter(dict)
+
+
+def make_rows(items: int, products: int) -> list[SimpleNamespace]:
+    """Build db-like receipt rows. Products are stored in JSON column after ujson round trip"""
+    return [
+        SimpleNamespace(
+            id=i,
+            public_id=f"00000000-0000-0000-0000-{i:012d}",
+            user_id=1,
+            products=[
+                {"name": f"Product {j}", "price": 1050, "quantity": 2, "total": 2100}
+                for j in range(products)
+            ],
+            payment_type=PaymentType.CASH,
+            payment_amount=200000,
+            total_amount=2100 * products,
+            rest_amount=95000,
+            created=datetime.now(UTC),
+        )
+        for i in range(items)
+    ]
+
+
+def current_path(rows: list[SimpleNamespace]) -> bytes:
+    """ReceiptResponse per row, then response_model=dict validation and json.dumps"""
+    items = [
+        ReceiptResponse(
+            id=row.id,
+            products=[ProductData(**p) for p in row.products],
+            public_id=row.public_id,
+            payment_type=row.payment_type,
+            payment_amount=row.payment_amount,
+            total_amount=row.total_amount,
+            rest_amount=row.rest_amount,
+            created=row.created,
+        ) for row in rows
+    ]
+    page = dict_adapter.validate_python({"items": items, "total": len(rows), "limit": 100, "offset": 0})
+    return JSONResponse(dict_adapter.dump_python(page, mode="json")).body
+
+
+def fast_path(rows: list[SimpleNamespace]) -> bytes:
+    """One adapter validation of the whole page and one pydantic-core dump"""
+    items = receipts_adapter.validate_python(rows, from_attributes=True)
+    page = ReceiptListResponse.model_construct(items=items, total=len(rows), limit=100, offset=0)
+    return PydanticJSONResponse(page, exclude_unset=True).body
+
+
+def measure(func, rows: list[SimpleNamespace], rounds: int) -> float:
+    """Return mean time of one page in milliseconds"""
+    func(rows)
+    start = perf_counter()
+    for _ in range(rounds):
+        func(rows)
+    return (perf_counter() - start) / rounds * 1000
+
+
+def main() -> None:
+    """Run benchmark and print results"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    rows = make_rows(args.items, args.products)
+    current = measure(current_path, rows, args.rounds)
+    fast = measure(fast_path, rows, args.rounds)
+
+    print(f"page of {args.items} receipts with {args.products} products, {len(fast_path(rows))} bytes")
+    print(f"current path: {current:8.2f} ms/page")
+    print(f"fast path:    {fast:8.2f} ms/page ({current / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Deterministic synthetic dataset of users and receipts shaped like production data for tuning indexes
+and queries. Receipts per user follow Zipf distribution, products are picked from catalog with Zipf
+popularity, payment types are mixed with per user preference and created timestamps are spread over
+years with business growth and yearly, weekly and daily seasonality.
+
+Receipts are generated day by day in worker processes and every worker writes its days with COPY
+in created order, so rows are laid out in table close to ones written by the app. The same seed
+and end date give the same data, only ids depend on sequences of database. Needs running postgres
+with applied migrations, connection is configured by the same env variables as the app.
+
+Usage:
+    python -m benchmarks.dataset [--users 100000] [--receipts 10000000] [--years 3] [--end 2026-01-01]
+                                 [--seed 0] [--workers 4] [--database NAME]
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import random
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from datetime import UTC, date, datetime, timedelta
+from itertools import accumulate
+from time import perf_counter
+from uuid import UUID
+
+import ujson
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from app.conf.settings import settings
+from app.core.security import get_password_hash
+from app.models.receipt import Receipt
+from app.models.user import User
+
+# Password of generated users
+PASSWORD = "dataset-password"
+
+USER_COLUMNS = ("id", "email", "password", "is_active", "is_superuser", "created", "updated")
+RECEIPT_COLUMNS = (
+    "user_id", "public_id", "payment_type", "total_amount", "payment_amount", "rest_amount", "products",
+    "created", "updated",
+)
+
+# Relative amount of receipts by hour of day in UTC, by weekday from Monday and by month
+HOUR_WEIGHTS = (1, 1, 1, 1, 1, 2, 6, 10, 12, 12, 11, 10, 9, 9, 10, 12, 14, 15, 13, 9, 6, 4, 2, 1)
+WEEKDAY_WEIGHTS = (0.95, 0.95, 1.0, 1.0, 1.15, 1.3, 0.9)
+MONTH_WEIGHTS = (0.85, 0.9, 1.0, 1.0, 1.0, 0.95, 0.95, 1.0, 1.0, 1.0, 1.1, 1.35)
+# The last day has this times more receipts than the first one
+GROWTH = 3
+
+# Most of products are bought one at a time
+QUANTITY_WEIGHTS = (70, 18, 7, 3, 2)
+# Mean amount of products in receipt
+MEAN_PRODUCTS = 4
+MAX_PRODUCTS = 60
+# Share of cash receipts paid without change
+EXACT_CASH_SHARE = 0.3
+# Cash payments are rounded up to banknote of this amount in cents
+BANKNOTE = 5000
+
+PRODUCT_NAMES = (
+    "Молоко", "Хліб", "Кефір", "Сир", "Масло", "Яйця", "Ковбаса", "Кава", "Чай", "Цукор", "Борошно", "Рис",
+    "Гречка", "Макарони", "Яблука", "Банани", "Картопля", "Цибуля", "Морква", "Вода", "Сік", "Шоколад",
+    "Печиво", "Курка", "Риба", "Йогурт", "Сметана", "Олія", "Сіль", "Мед",
+)
+PRODUCT_VARIANTS = ("класичний", "домашній", "органічний", "преміум", "акційний", "фермерський", "світлий", "темний")
+PRODUCT_SIZES = ("100 г", "250 г", "500 г", "1 кг", "0.5 л", "1 л", "2 л", "шт")
+
+
+def zipf_cum_weights(size: int, exponent: float) -> list[float]:
+    """Cumulative weights of ranks from 1 to size with Zipf distribution"""
+    return list(accumulate(1 / rank**exponent for rank in range(1, size + 1)))
+
+
+def spread(total: int, weights: Sequence[float]) -> list[int]:
+    """Split total to integer parts proportional to weights, remainders go to the largest fractions"""
+    weights_sum = sum(weights)
+    exact = [total * weight / weights_sum for weight in weights]
+    parts = [int(value) for value in exact]
+    by_fraction = sorted(range(len(weights)), key=lambda i: parts[i] - exact[i])
+    for i in by_fraction[:total - sum(parts)]:
+        parts[i] += 1
+    return parts
+
+
+def day_counts(receipts: int, start: date, days: int) -> list[int]:
+    """Amounts of receipts by day with growth and seasonality"""
+    weights = []
+    for i in range(days):
+        day = start + timedelta(days=i)
+        growth = 1 + (GROWTH - 1) * i / max(days - 1, 1)
+        weights.append(growth * WEEKDAY_WEIGHTS[day.weekday()] * MONTH_WEIGHTS[day.month - 1])
+    return spread(receipts, weights)
+
+
+class DatasetGenerator:
+    """
+    Generator of receipts of one day. Catalog and users preferences are derived from seed,
+    so every worker process builds the same generator
+    """
+
+    def __init__(self, seed: int, user_ids: Sequence[int], products: int, zipf: float):
+        self.seed = seed
+        rng = random.Random(f"{seed}:setup")  # noqa: S311
+
+        # Heaviest users are spread over ids instead of being the first registered ones
+        self.user_ids = list(user_ids)
+        rng.shuffle(self.user_ids)
+        self.user_weights = zipf_cum_weights(len(self.user_ids), zipf)
+        self.cashless_share = [rng.betavariate(4, 2) for _ in self.user_ids]
+
+        # Products are stored as JSON fragments for every quantity, the same as build_receipt_data makes them
+        self.prices = []
+        self.fragments = []
+        for _ in range(products):
+            name = f"{rng.choice(PRODUCT_NAMES)} {rng.choice(PRODUCT_VARIANTS)} {rng.choice(PRODUCT_SIZES)}"
+            price = int(10 ** rng.uniform(1.5, 5))
+            self.prices.append(price)
+            self.fragments.append([
+                ujson.dumps({"name": name, "price": price, "quantity": quantity, "total": price * quantity},
+                            ensure_ascii=False)
+                for quantity in range(1, len(QUANTITY_WEIGHTS) + 1)
+            ])
+        self.product_weights = zipf_cum_weights(products, 1)
+        self.quantity_weights = list(accumulate(QUANTITY_WEIGHTS))
+
+    def generate_day(self, day: date, count: int) -> bytes:
+        """Receipts of day sorted by created as rows of COPY text format"""
+        rng = random.Random(f"{self.seed}:{day.isoformat()}")  # noqa: S311
+        start = datetime(day.year, day.month, day.day, tzinfo=UTC)
+        hours = rng.choices(range(24), weights=HOUR_WEIGHTS, k=count)
+        moments = sorted(hour * 3600 + rng.random() * 3600 for hour in hours)
+        users = rng.choices(range(len(self.user_ids)), cum_weights=self.user_weights, k=count)
+        quantities = range(1, len(QUANTITY_WEIGHTS) + 1)
+
+        rows = []
+        for moment, user in zip(moments, users, strict=True):
+            size = min(1 + int(rng.expovariate(1 / (MEAN_PRODUCTS - 0.5))), MAX_PRODUCTS)
+            products = rng.choices(range(len(self.prices)), cum_weights=self.product_weights, k=size)
+            counts = rng.choices(quantities, cum_weights=self.quantity_weights, k=size)
+            total = sum(self.prices[product] * quantity for product, quantity in zip(products, counts, strict=True))
+            products_json = ",".join(
+                self.fragments[product][quantity - 1] for product, quantity in zip(products, counts, strict=True)
+            )
+
+            if rng.random() < self.cashless_share[user]:
+                payment_type, payment = "CASHLESS", total
+            else:
+                payment_type = "CASH"
+                payment = total if rng.random() < EXACT_CASH_SHARE else -(-total // BANKNOTE) * BANKNOTE
+            public_id = UUID(int=rng.getrandbits(128), version=4)
+            created = (start + timedelta(seconds=moment)).isoformat()
+            rows.append(
+                f"{self.user_ids[user]}\t{public_id}\t{payment_type}\t{total}\t{payment}\t{payment - total}\t"
+                f"[{products_json}]\t{created}\t{created}\n",
+            )
+        return "".join(rows).encode()
+
+
+# Generator and db connection of worker process, they are created once by pool initializer
+_worker: dict = {}
+
+
+def init_worker(database_uri: str, seed: int, user_ids: Sequence[int], products: int, zipf: float) -> None:
+    """Build generator and connect to db in worker process"""
+    _worker["generator"] = DatasetGenerator(seed, user_ids, products, zipf)
+    _worker["engine"] = create_engine(database_uri, poolclass=NullPool)
+    _worker["connection"] = _worker["engine"].raw_connection()
+
+
+def close_worker() -> None:
+    """Close db connection of worker"""
+    _worker.pop("connection").close()
+    _worker.pop("engine").dispose()
+
+
+def write_day(day: date, count: int) -> int:
+    """Generate receipts of day and write them with COPY in one transaction. Returns amount of receipts"""
+    connection = _worker["connection"]
+    connection.cursor().copy_expert(
+        f"COPY {Receipt.__tablename__} ({', '.join(RECEIPT_COLUMNS)}) FROM STDIN",
+        io.BytesIO(_worker["generator"].generate_day(day, count)),
+    )
+    connection.commit()
+    return count
+
+
+def sync_uri(database: str) -> str:
+    """Sync database uri for schema management and COPY"""
+    return (
+        f"{settings.DB_DRIVER_SYNC}://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}"
+        f"@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{database}"
+    )
+
+
+def generate(
+    database_uri: str,
+    *,
+    users: int,
+    receipts: int,
+    seed: int = 0,
+    years: int = 3,
+    end: date | None = None,
+    workers: int = 1,
+    products: int = 2000,
+    zipf: float = 1.1,
+) -> dict:
+    """
+    Write users and receipts created before end with COPY and set users receipt counters.
+    Returns amounts of written rows and receipts rate per second
+    """
+    end = end or datetime.now(UTC).date()
+    start = end - timedelta(days=365 * years)
+    counts = day_counts(receipts, start, (end - start).days)
+    start_time = perf_counter()
+
+    engine = create_engine(database_uri)
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        email = f"dataset-{seed}-{{}}@example.com"
+        cursor.execute(f"SELECT 1 FROM {User.__tablename__} WHERE email = %s", (email.format(0),))  # noqa: S608
+        if cursor.fetchone():
+            raise ValueError(f"Dataset with seed {seed} is already written")
+
+        cursor.execute("SELECT nextval(pg_get_serial_sequence('users', 'id')) FROM generate_series(1, %s)", (users,))
+        user_ids = [row[0] for row in cursor.fetchall()]
+        password = get_password_hash(PASSWORD)
+        registered = datetime.combine(start, datetime.min.time(), UTC).isoformat()
+        cursor.copy_expert(
+            f"COPY {User.__tablename__} ({', '.join(USER_COLUMNS)}) FROM STDIN",
+            io.StringIO("".join(
+                f"{user_id}\t{email.format(rank)}\t{password}\tt\tf\t{registered}\t{registered}\n"
+                for rank, user_id in enumerate(user_ids)
+            )),
+        )
+        connection.commit()
+
+        days = [(start + timedelta(days=i), count) for i, count in enumerate(counts) if count]
+        worker_args = (database_uri, seed, user_ids, products, zipf)
+        if workers:
+            # Every worker writes its days with own COPY, days are taken in order, so concurrently
+            # written rows are close in time like rows of concurrent requests
+            with ProcessPoolExecutor(
+                workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+                initargs=worker_args,
+            ) as executor:
+                for future in [executor.submit(write_day, day, count) for day, count in days]:
+                    future.result()
+        else:
+            init_worker(*worker_args)
+            try:
+                for day, count in days:
+                    write_day(day, count)
+            finally:
+                close_worker()
+
+        cursor.execute(
+            "UPDATE users SET receipt_count = totals.count, receipt_total_amount = totals.amount "
+            "FROM (SELECT user_id, count(*) AS count, sum(total_amount) AS amount FROM receipts "
+            "WHERE user_id = ANY(%s) GROUP BY user_id) AS totals WHERE users.id = totals.user_id",
+            (user_ids,),
+        )
+        connection.commit()
+        cursor.execute("ANALYZE users")
+        cursor.execute("ANALYZE receipts")
+        connection.commit()
+    finally:
+        connection.close()
+        engine.dispose()
+
+    elapsed = perf_counter() - start_time
+    return {"users": users, "receipts": receipts, "seconds": round(elapsed, 1), "rate": round(receipts / elapsed)}
+
+
+def main() -> None:
+    """Generate dataset with arguments from command line"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--receipts", type=int, default=10_000_000)
+    parser.add_argument("--years", type=int, default=3, help="receipts are created during these years before end")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="end date, today by default")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="0 generates in this process")
+    parser.add_argument("--products", type=int, default=2000, help="size of products catalog")
+    parser.add_argument("--zipf", type=float, default=1.1, help="exponent of receipts per user distribution")
+    parser.add_argument("--database", default=settings.POSTGRES_DB)
+    args = parser.parse_args()
+
+    result = generate(
+        sync_uri(args.database),
+        users=args.users,
+        receipts=args.receipts,
+        seed=args.seed,
+        years=args.years,
+        end=args.end,
+        workers=args.workers,
+        products=args.products,
+        zipf=args.zipf,
+    )
+    print(f"{result['users']} users and {result['receipts']} receipts written in {result['seconds']}s "
+          f"({result['rate']} receipts/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Plans of receipts list queries on synthetic dataset from benchmarks.dataset. Queries are built by the same
+code as ReceiptRepository.get_filtered, plans are printed with EXPLAIN (ANALYZE, BUFFERS) for the user
+with the most receipts and for the user with median amount of receipts.
+
+Without --database disposable database is created, filled with dataset and dropped afterwards.
+
+Usage:
+    python -m benchmarks.explain_receipts [--users 10000] [--receipts 1000000] [--seed 0] [--database NAME]
+                                          [--case page] [--no-analyze]
+"""
+import argparse
+import os
+import sys
+from datetime import UTC, datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import Select, create_engine, text
+
+from app.repositories.receipt import count_query, list_query
+from app.schemas.receipt import PaymentType, ReceiptFilter
+from benchmarks.dataset import generate, sync_uri
+from benchmarks.http_load import create_database, drop_database
+
+PAGE_SIZE = 20
+# Fields selected by list endpoint when client asks only for summary
+SUMMARY_FIELDS = ("id", "public_id", "total_amount", "created")
+
+
+def cases(today: datetime) -> dict[str, tuple[ReceiptFilter, tuple[str, ...] | None, int]]:
+    """Name of case and its filters, selected fields and offset"""
+    return {
+        "page": (ReceiptFilter(), None, 0),
+        "deep_page": (ReceiptFilter(), None, 1000),
+        "summary_fields": (ReceiptFilter(), SUMMARY_FIELDS, 0),
+        "last_month": (ReceiptFilter(date_from=(today - timedelta(days=30)).date()), None, 0),
+        "amount_range": (ReceiptFilter(min_amount="100", max_amount="500"), None, 0),
+        "cashless": (ReceiptFilter(payment_type=PaymentType.CASHLESS), None, 0),
+    }
+
+
+def explain(connection, query: Select, *, analyze: bool) -> str:
+    """Plan of query with literal parameters"""
+    sql = query.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True})
+    options = "ANALYZE, BUFFERS" if analyze else "COSTS"
+    return "\n".join(row[0] for row in connection.execute(text(f"EXPLAIN ({options}) {sql}")))
+
+
+def print_plans(database: str, case_names: list[str] | None, *, analyze: bool) -> None:
+    """Print plans of list and count queries of every case for the heaviest and the median user"""
+    engine = create_engine(sync_uri(database))
+    try:
+        with engine.connect() as connection:
+            users = connection.execute(text(
+                "SELECT (SELECT id FROM users ORDER BY receipt_count DESC LIMIT 1), "
+                "(SELECT id FROM users WHERE receipt_count > 0 ORDER BY receipt_count "
+                "OFFSET (SELECT count(*) / 2 FROM users WHERE receipt_count > 0) LIMIT 1)",
+            )).one()
+            for name, (filters, fields, offset) in cases(datetime.now(UTC)).items():
+                if case_names and name not in case_names:
+                    continue
+                for title, user_id in zip(("heaviest", "median"), users, strict=True):
+                    query = list_query(user_id, filters, fields)
+                    print(f"=== {name}, {title} user {user_id}")
+                    print(explain(connection, query.limit(PAGE_SIZE).offset(offset), analyze=analyze))
+                    if not filters.is_empty:
+                        print(f"--- {name} count")
+                        print(explain(connection, count_query(query), analyze=analyze))
+    finally:
+        engine.dispose()
+
+
+def main() -> int:
+    """Print plans with arguments from command line"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--receipts", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database", help="existing database with dataset, disposable one by default")
+    parser.add_argument("--case", action="append", help="run only these cases")
+    parser.add_argument("--no-analyze", action="store_true", help="only estimate plans without running queries")
+    args = parser.parse_args()
+
+    if args.database:
+        print_plans(args.database, args.case, analyze=not args.no_analyze)
+        return 0
+
+    database = f"bench_{uuid4().hex[:12]}"
+    create_database(database)
+    try:
+        result = generate(
+            sync_uri(database),
+            users=args.users,
+            receipts=args.receipts,
+            seed=args.seed,
+            workers=os.cpu_count() or 1,
+        )
+        print(f"dataset of {result['receipts']} receipts written in {result['seconds']}s")
+        print_plans(database, args.case, analyze=not args.no_analyze)
+    finally:
+        drop_database(database)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""
+End-to-end HTTP load benchmark.
+
+Creates disposable database on local postgres, starts app from app.main:create_app with uvicorn
+in separate process and drives it with concurrent async clients. Every client registers, logs in
+and then runs weighted mix of requests. Reports throughput and p50/p95/p99 latency per endpoint,
+saves results as JSON and compares them with stored baseline.
+
+Usage:
+    python -m benchmarks.http_load [--clients 50] [--duration 30] [--output results.json]
+                                   [--baseline benchmarks/baselines/http_load.json] [--max-regression 20]
+                                   [--dataset-receipts 1000000] [--dataset-users 10000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from uuid import uuid4
+
+import httpx
+import ujson
+from sqlalchemy import create_engine, text
+
+from app.conf.settings import settings
+from app.models import *  # noqa: F403
+from app.models.base import Base
+from benchmarks.dataset import generate, sync_uri
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "http_load.json"
+
+# Scenario name and its weight in requests mix
+SCENARIOS = {
+    "create_receipt": 3,
+    "list_receipts": 5,
+    "list_receipts_filtered": 2,
+    "get_receipt": 2,
+    "public_text": 3,
+    "login": 1,
+}
+
+
+@dataclass
+class Client:
+    """Virtual user with its auth and created receipts"""
+    http: httpx.AsyncClient
+    email: str
+    password: str = "bench-password"
+    headers: dict = field(default_factory=dict)
+    receipts: list[dict] = field(default_factory=list)
+
+
+def create_database(name: str) -> None:
+    """Create empty database with app schema"""
+    admin = create_engine(sync_uri(settings.POSTGRES_DB), isolation_level="AUTOCOMMIT")
+    with admin.connect() as connection:
+        connection.execute(text(f'CREATE DATABASE "{name}"'))
+    admin.dispose()
+
+    engine = create_engine(sync_uri(name))
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+
+def drop_database(name: str) -> None:
+    """Drop disposable database"""
+    admin = create_engine(sync_uri(settings.POSTGRES_DB), isolation_level="AUTOCOMMIT")
+    with admin.connect() as connection:
+        connection.execute(text(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)'))
+    admin.dispose()
+
+
+def free_port() -> int:
+    """Return free local tcp port"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(database: str, port: int, extra_env: dict[str, str]) -> subprocess.Popen:
+    """Start app with uvicorn in separate process"""
+    env = {**os.environ, "POSTGRES_DB": database, "ACCESS_LOG_ENABLED": "false", **extra_env}
+    return subprocess.Popen(  # noqa: S603
+        [sys.executable, "-m", "uvicorn", "--factory", "app.main:create_app",
+         "--host", "127.0.0.1", "--port", str(port), "--no-access-log", "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+async def wait_for_server(base_url: str, startup_seconds: float = 30) -> None:
+    """Wait until server accepts requests"""
+    deadline = time.monotonic() + startup_seconds
+    async with httpx.AsyncClient(base_url=base_url) as http:
+        while True:
+            try:
+                await http.get("/docs")
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.2)
+            else:
+                return
+
+
+def receipt_body(rng: random.Random) -> dict:
+    """Random receipt creation request"""
+    products = [
+        {
+            "name": f"Product {rng.randint(1, 1000)}",
+            "price": f"{rng.uniform(1, 500):.2f}",
+            "quantity": rng.randint(1, 5),
+        }
+        for _ in range(rng.randint(1, 20))
+    ]
+    return {"products": products, "payment": {"payment_type": rng.choice(["cash", "cashless"]), "amount": "100000"}}
+
+
+async def login(client: Client) -> httpx.Response:
+    """Log in client and store its access token"""
+    response = await client.http.post("/api/users/login", data={"username": client.email, "password": client.password})
+    client.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return response
+
+
+async def run_scenario(name: str, client: Client, rng: random.Random) -> httpx.Response:
+    """Send request of scenario"""
+    if name == "create_receipt" or not client.receipts:
+        response = await client.http.post("/api/receipts/", json=receipt_body(rng), headers=client.headers)
+        if response.status_code == httpx.codes.OK:
+            client.receipts.append(response.json())
+        return response
+    if name == "list_receipts":
+        return await client.http.get("/api/receipts/", params={"limit": 20}, headers=client.headers)
+    if name == "list_receipts_filtered":
+        params = {"limit": 20, "min_amount": 100, "payment_type": "cash", "include_products": "true"}
+        return await client.http.get("/api/receipts/", params=params, headers=client.headers)
+    if name == "get_receipt":
+        receipt = rng.choice(client.receipts)
+        return await client.http.get(f"/api/receipts/{receipt['id']}", headers=client.headers)
+    if name == "public_text":
+        receipt = rng.choice(client.receipts)
+        return await client.http.get(f"/api/receipts/public/{receipt['public_id']}")
+    return await login(client)
+
+
+async def drive(base_url: str, clients: int, duration: float, seed: int) -> tuple[dict[str, list[float]], dict, float]:
+    """Run clients for duration seconds. Returns latencies and errors per scenario and elapsed time"""
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as http:
+        users = [Client(http=http, email=f"bench-{uuid4().hex[:12]}@example.com") for _ in range(clients)]
+
+        async def setup(client: Client) -> None:
+            await http.post("/api/users/register", json={"email": client.email, "password": client.password})
+            await login(client)
+
+        await asyncio.gather(*[setup(client) for client in users])
+
+        names, weights = list(SCENARIOS), list(SCENARIOS.values())
+        start = time.monotonic()
+        deadline = start + duration
+
+        async def user_loop(client: Client, rng: random.Random) -> None:
+            while time.monotonic() < deadline:
+                name = rng.choices(names, weights)[0]
+                request_start = time.perf_counter()
+                try:
+                    response = await run_scenario(name, client, rng)
+                    failed = response.status_code >= httpx.codes.BAD_REQUEST
+                except httpx.HTTPError:
+                    failed = True
+                latencies[name].append(time.perf_counter() - request_start)
+                errors[name] += failed
+
+        rngs = [random.Random(seed + i) for i in range(clients)]  # noqa: S311
+        await asyncio.gather(*[user_loop(client, rng) for client, rng in zip(users, rngs, strict=True)])
+        elapsed = time.monotonic() - start
+
+    return latencies, errors, elapsed
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Return q-th percentile of values using nearest rank"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def summarize(latencies: dict[str, list[float]], errors: dict[str, int], elapsed: float) -> dict:
+    """Throughput and latency percentiles in ms per endpoint and in total"""
+    endpoints = {}
+    for name, values in sorted(latencies.items()):
+        endpoints[name] = {
+            "requests": len(values),
+            "errors": errors[name],
+            "rps": len(values) / elapsed,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+
+    all_values = [value for values in latencies.values() for value in values]
+    return {
+        "total": {
+            "requests": len(all_values),
+            "errors": sum(errors.values()),
+            "rps": len(all_values) / elapsed,
+            "p50_ms": percentile(all_values, 50) * 1000,
+            "p95_ms": percentile(all_values, 95) * 1000,
+            "p99_ms": percentile(all_values, 99) * 1000,
+        },
+        "endpoints": endpoints,
+    }
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list[str]:
+    """Return regressions: throughput drop or p95 growth by more than max_regression percents"""
+    regressions = []
+    current = {"total": results["total"], **results["endpoints"]}
+    previous = {"total": baseline["total"], **baseline["endpoints"]}
+
+    for name, stats in current.items():
+        if name not in previous:
+            continue
+        base = previous[name]
+        if stats["rps"] < base["rps"] * (1 - max_regression / 100):
+            regressions.append(f"{name}: throughput {stats['rps']:.1f} rps, baseline {base['rps']:.1f} rps")
+        if stats["p95_ms"] > base["p95_ms"] * (1 + max_regression / 100):
+            regressions.append(f"{name}: p95 {stats['p95_ms']:.1f} ms, baseline {base['p95_ms']:.1f} ms")
+    return regressions
+
+
+def print_results(results: dict) -> None:
+    """Print results table"""
+    print(f"{'endpoint':<24}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in {**results["endpoints"], "total": results["total"]}.items():
+        print(
+            f"{name:<24}{stats['requests']:>10}{stats['errors']:>8}{stats['rps']:>10.1f}"
+            f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}",
+        )
+
+
+def main() -> int:
+    """Run load benchmark. Returns non-zero exit code on regression"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="save results to JSON file")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--max-regression", type=float, default=20, help="allowed slowdown in percents")
+    parser.add_argument("--save-baseline", action="store_true", help="store results as new baseline")
+    parser.add_argument("--env", action="append", default=[], help="extra app setting as NAME=VALUE")
+    parser.add_argument("--dataset-receipts", type=int, default=0, help="fill database with synthetic receipts")
+    parser.add_argument("--dataset-users", type=int, default=10_000, help="owners of synthetic receipts")
+    args = parser.parse_args()
+
+    database = f"bench_{uuid4().hex[:12]}"
+    port = free_port()
+    create_database(database)
+    if args.dataset_receipts:
+        generate(
+            sync_uri(database),
+            users=args.dataset_users,
+            receipts=args.dataset_receipts,
+            seed=args.seed,
+            workers=os.cpu_count() or 1,
+        )
+    server = start_server(database, port, dict(item.split("=", 1) for item in args.env))
+
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        asyncio.run(wait_for_server(base_url))
+        latencies, errors, elapsed = asyncio.run(drive(base_url, args.clients, args.duration, args.seed))
+    finally:
+        server.terminate()
+        server.wait()
+        drop_database(database)
+
+    results = {"clients": args.clients, "duration": args.duration, **summarize(latencies, errors, elapsed)}
+    print_results(results)
+
+    if args.output:
+        args.output.write_text(ujson.dumps(results, indent=2))
+    if args.save_baseline:
+        args.baseline.write_text(ujson.dumps(results, indent=2))
+        return 0
+
+    if args.baseline.exists():
+        regressions = compare(results, ujson.loads(args.baseline.read_text()), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""
+Microbenchmarks of CPU-bound hot paths without database: receipt totals, receipt text formatting,
+ReceiptResponse construction and access token decoding.
+
+Every case is warmed up and then timed in several repeats. Best of repeats time per call, which is
+least affected by noise, and peak traced memory per call (tracemalloc) are compared with stored
+baseline, run fails when any case is slower or allocates more than --max-regression percents.
+
+Usage:
+    python -m benchmarks.micro [--repeats 7] [--min-time 0.2] [--filter format] [--max-regression 25]
+                               [--baseline benchmarks/baselines/micro.json] [--save-baseline] [--output results.json]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tracemalloc
+from collections.abc import Callable, Coroutine, Iterator
+from datetime import UTC, datetime
+from pathlib import Path
+from time import perf_counter_ns
+
+import ujson
+from jose import jwt
+
+from app.conf.settings import settings
+from app.core import security
+from app.core.cache import LRUCache
+from app.interactors.receipt import ReceiptInteractor
+from app.models import *  # noqa: F403
+from app.models.receipt import Receipt
+from app.schemas.receipt import PaymentType, ReceiptCreateDTO, ReceiptResponse
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "micro.json"
+WARMUP_SECONDS = 0.05
+
+
+def run_sync(coro: Coroutine) -> object:
+    """Run coroutine which never suspends without event loop"""
+    try:
+        coro.send(None)
+    except StopIteration as e:
+        return e.value
+    raise RuntimeError("Coroutine suspended")
+
+
+def make_dto(products: int) -> ReceiptCreateDTO:
+    """Receipt creation request with products"""
+    return ReceiptCreateDTO.model_validate({
+        "products": [
+            {"name": f"Product with quite long name number {i}", "price": f"{i % 50 + 0.99:.2f}", "quantity": i % 3 + 1}
+            for i in range(products)
+        ],
+        "payment": {"payment_type": PaymentType.CASH, "amount": "1000000"},
+    })
+
+
+def make_receipt(products: int) -> Receipt:
+    """Transient receipt model as it is loaded from db"""
+    data = ReceiptInteractor.build_receipt_data(1, make_dto(products))
+    return Receipt(
+        **data,
+        id=1,
+        public_id="00000000-0000-0000-0000-000000000001",
+        created=datetime.now(UTC),
+        updated=datetime.now(UTC),
+    )
+
+
+def cases() -> Iterator[tuple[str, Callable[[], object]]]:
+    """Yield benchmark name and function making one call"""
+    interactor = ReceiptInteractor(receipt_repo=None)
+
+    for products in (1, 10, 100):
+        dto = make_dto(products)
+        yield f"totals[products={products}]", lambda dto=dto: ReceiptInteractor.build_receipt_data(1, dto)
+
+    for products in (10, 100):
+        receipt = make_receipt(products)
+        for width in (32, 80):
+            yield (
+                f"format_receipt_text[products={products},width={width}]",
+                lambda receipt=receipt, width=width: run_sync(interactor.format_receipt_text(receipt, width)),
+            )
+
+    for products in (10, 100):
+        receipt = make_receipt(products)
+        yield f"receipt_response[products={products}]", lambda receipt=receipt: ReceiptResponse.model_validate(receipt)
+
+    token, _ = security.create_access_token(data={"sub": "1"})
+    yield "jwt.decode", lambda: jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.JWT_ENCODE_ALGORITHM])
+
+    security.token_cache = LRUCache(maxsize=settings.JWT_CACHE_SIZE)
+    yield "decode_access_token[cached]", lambda: security.decode_access_token(token)
+
+
+def calibrate(func: Callable[[], object], min_time: float) -> int:
+    """Warm function up and return amount of calls taking at least min_time seconds"""
+    number = 1
+    while True:
+        start = perf_counter_ns()
+        for _ in range(number):
+            func()
+        elapsed = (perf_counter_ns() - start) / 1e9
+        if elapsed >= min_time:
+            return number
+        if elapsed >= WARMUP_SECONDS:
+            return max(number, int(number * min_time / elapsed))
+        number *= 2
+
+
+def allocated_per_call(func: Callable[[], object], calls: int = 20) -> float:
+    """Peak traced memory of one call in bytes, averaged over several calls"""
+    tracemalloc.start()
+    try:
+        total = 0
+        for _ in range(calls):
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+            total += peak - current
+    finally:
+        tracemalloc.stop()
+    return total / calls
+
+
+def measure(func: Callable[[], object], repeats: int, min_time: float) -> dict:
+    """Return per call time statistics in microseconds and allocated bytes"""
+    number = calibrate(func, min_time)
+    timings = []
+    for _ in range(repeats):
+        start = perf_counter_ns()
+        for _ in range(number):
+            func()
+        timings.append((perf_counter_ns() - start) / number / 1000)
+
+    return {
+        "calls": number,
+        "min_us": min(timings),
+        "median_us": statistics.median(timings),
+        "stdev_us": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "alloc_bytes": allocated_per_call(func),
+    }
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list[str]:
+    """Return cases which are slower or allocate more than baseline by max_regression percents"""
+    regressions = []
+    limit = 1 + max_regression / 100
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if stats["min_us"] > base["min_us"] * limit:
+            regressions.append(f"{name}: {stats['min_us']:.2f} us, baseline {base['min_us']:.2f} us")
+        if stats["alloc_bytes"] > base["alloc_bytes"] * limit:
+            regressions.append(f"{name}: {stats['alloc_bytes']:.0f} B, baseline {base['alloc_bytes']:.0f} B")
+    return regressions
+
+
+def main() -> int:
+    """Run microbenchmarks. Returns non-zero exit code on regression"""
+    # Dict and set layouts depend on hash randomization and shift timings between runs
+    if os.environ.get("PYTHONHASHSEED") is None:
+        os.environ["PYTHONHASHSEED"] = "0"
+        os.execv(sys.executable, [sys.executable, "-m", "benchmarks.micro", *sys.argv[1:]])  # noqa: S606
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds of one repeat")
+    parser.add_argument("--filter", default="", help="run only cases containing this substring")
+    parser.add_argument("--output", type=Path, help="save results to JSON file")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--max-regression", type=float, default=25, help="allowed slowdown in percents")
+    parser.add_argument("--save-baseline", action="store_true", help="store results as new baseline")
+    args = parser.parse_args()
+
+    baseline = ujson.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    results = {}
+
+    print(f"{'case':<48}{'min us':>10}{'median us':>12}{'stdev us':>10}{'alloc B':>10}{'baseline us':>13}")
+    for name, func in cases():
+        if args.filter not in name:
+            continue
+        results[name] = stats = measure(func, args.repeats, args.min_time)
+        base = baseline.get(name, {}).get("min_us")
+        print(
+            f"{name:<48}{stats['min_us']:>10.2f}{stats['median_us']:>12.2f}{stats['stdev_us']:>10.2f}{stats['alloc_bytes']:>10.0f}"
+            f"{f'{base:.2f}' if base else '-':>13}",
+        )
+
+    if args.output:
+        args.output.write_text(ujson.dumps(results, indent=2))
+    if args.save_baseline:
+        args.baseline.write_text(ujson.dumps({**baseline, **results}, indent=2))
+        return 0
+
+    regressions = compare(results, baseline, args.max_regression)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,6 @@
 
 from decimal import Decimal
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from fastapi import FastAPI
@@ -9,10 +9,18 @@ from fastapi.testclient import TestClient
 from app.api.dependencies import (get_receipt_interactor, get_user_interactor,
                                   get_user_repo)
 from app.api.receipts import router as receipt_router
+from app.core.cache import TTLCache
+from app.core.query_cache import VersionedQueryCache
+from app.core.shared_cache import TwoTierCache
+from app.core.single_flight import SingleFlight
 from app.interactors.receipt import ReceiptInteractor
+from app.interactors.auth_token import TokenInteractor
+from app.interactors.idempotency import IdempotencyInteractor
 from app.interactors.user import UserInteractor
 from app.repositories.user import UserRepository
-from app.schemas.receipt import PaymentCreate, PaymentType, ProductCreate
+from app.schemas.receipt import (PaymentCreate, PaymentType, ProductCreate,
+                                 ReceiptResponse)
+from app.schemas.user import UserResponse
 
 
 class MockDB:
@@ -43,7 +51,32 @@ def mock_user_repo():
 @pytest.fixture
 def mock_user_interactor(mock_user_repo):
     """Mocked UserInteractor with mocked UserRepository"""
-    return UserInteractor(mock_user_repo)
+    return UserInteractor(mock_user_repo, cache=TwoTierCache("user", UserResponse, ttl=60, l1_size=10, l1_ttl=60))
+
+
+@pytest.fixture
+def refresh_token_repo():
+    """Mocked refresh token repo"""
+    return AsyncMock()
+
+
+@pytest.fixture
+def token_interactor(refresh_token_repo, mock_user_repo):
+    """Token interactor with mocked repos"""
+    mock_user_repo.get_by_id.return_value = MagicMock(id=1, is_active=True)
+    return TokenInteractor(refresh_token_repo, mock_user_repo)
+
+
+@pytest.fixture
+def idempotency_repo():
+    """Mocked idempotency key repo"""
+    return AsyncMock()
+
+
+@pytest.fixture
+def idempotency_interactor(idempotency_repo):
+    """Idempotency interactor with mocked repo and empty cache"""
+    return IdempotencyInteractor(idempotency_repo, cache=TTLCache(maxsize=10, ttl=60))
 
 
 @pytest.fixture
@@ -55,7 +88,13 @@ def receipt_repo():
 @pytest.fixture
 def interactor(receipt_repo):
     """Receipt interactor with mocked repo"""
-    return ReceiptInteractor(receipt_repo)
+    return ReceiptInteractor(
+        receipt_repo,
+        single_flight=SingleFlight(),
+        cache=TwoTierCache("receipt", tuple[int, ReceiptResponse], ttl=60, l1_size=10, l1_ttl=60),
+        public_cache=TwoTierCache("receipt_public", ReceiptResponse, ttl=60, l1_size=10, l1_ttl=60),
+        list_cache=VersionedQueryCache("receipt_list", max_rows=100, max_keys_per_user=10, ttl=60),
+    )
 
 
 @pytest.fixture
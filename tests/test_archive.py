@@ -0,0 +1,110 @@
+from datetime import UTC, date, datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.core.cache import LRUCache
+from app.models.receipt import Receipt
+from app.repositories.receipt import (ArchivedReceiptRepository,
+                                      ReceiptRepository, pack_receipt,
+                                      unpack_receipt)
+from app.schemas.receipt import PaymentType, ReceiptFilter
+from app.tools.archive_receipts import archive
+
+
+def make_receipt(receipt_id: int) -> Receipt:
+    """Receipt with many products as it is loaded from db"""
+    return Receipt(
+        id=receipt_id,
+        user_id=1,
+        public_id=f"public-{receipt_id}",
+        payment_type=PaymentType.CASH,
+        total_amount=100000,
+        payment_amount=100000,
+        rest_amount=0,
+        products=[{"name": "Молоко", "price": 1000, "quantity": 1, "total": 1000}] * 100,
+        created=datetime(2020, 1, 1, tzinfo=UTC),
+        updated=datetime(2020, 1, 2, tzinfo=UTC),
+    )
+
+
+def test_pack_receipt_round_trip():
+    """Archived receipt is restored with all fields, payload is compressed"""
+    receipt = make_receipt(1)
+
+    row = pack_receipt(receipt)
+    restored = unpack_receipt(SimpleNamespace(**row))
+
+    assert len(row["payload"]) < 200  # noqa: PLR2004
+    for field in ("id", "user_id", "public_id", "payment_type", "total_amount", "payment_amount", "rest_amount",
+                  "products", "created", "updated"):
+        assert getattr(restored, field) == getattr(receipt, field)
+
+
+@pytest.mark.asyncio
+async def test_archived_receipts_are_cached():
+    """Archived receipt is read and decompressed once for lookups by id and public_id"""
+    db = AsyncMock()
+    db.get.return_value = SimpleNamespace(**pack_receipt(make_receipt(1)))
+    repo = ArchivedReceiptRepository(db, cache=LRUCache(maxsize=10))
+
+    assert (await repo.get_by_id(1)).public_id == "public-1"
+    assert (await repo.get_by_public_id("public-1")).id == 1
+    assert db.get.call_count == 1
+
+
+def make_repo(table_rows: list, counter: int) -> tuple[ReceiptRepository, AsyncMock]:
+    """Receipt repository with rows of receipts table, user`s counter and mocked archive"""
+    db = MagicMock()
+    db.execute_query = AsyncMock(
+        side_effect=lambda table, _query: [counter] if table.__name__ == "User" else table_rows,
+    )
+    archive_repo = AsyncMock()
+    archive_repo.get_filtered.return_value = ["archived"]
+    return ReceiptRepository(db, archive=archive_repo), archive_repo
+
+
+@pytest.mark.asyncio
+async def test_get_filtered_reads_archive_only_past_table_receipts():
+    """Archive is not read while page is filled from receipts table or all receipts are listed"""
+    repo, archive_repo = make_repo(["first", "second"], counter=2)
+    assert await repo.get_filtered(1, ReceiptFilter(), limit=2, offset=0) == (["first", "second"], 2)
+    assert await repo.get_filtered(1, ReceiptFilter(), limit=10, offset=0) == (["first", "second"], 2)
+    archive_repo.get_filtered.assert_not_called()
+
+    # Page continues with archived receipts right after the last receipt in table
+    repo, archive_repo = make_repo(["last"], counter=5)
+    assert await repo.get_filtered(1, ReceiptFilter(), limit=3, offset=3) == (["last", "archived"], 5)
+    assert archive_repo.get_filtered.call_args.kwargs["limit"] == 2  # noqa: PLR2004
+    assert archive_repo.get_filtered.call_args.kwargs["offset"] == 0
+
+
+@pytest.mark.asyncio
+async def test_get_filtered_skips_archive_for_recent_dates():
+    """Archive is not counted or read if dates filter can`t match archived receipts"""
+    repo, archive_repo = make_repo([1], counter=10)
+
+    recent = ReceiptFilter(date_from=datetime.now(UTC).date() - timedelta(days=7))
+    await repo.get_filtered(1, recent, limit=10, offset=0)
+    archive_repo.count.assert_not_called()
+    archive_repo.get_filtered.assert_not_called()
+
+    archive_repo.count.return_value = 3
+    _, total = await repo.get_filtered(1, ReceiptFilter(date_from=date(2000, 1, 1)), limit=10, offset=0)
+    assert total == 4  # noqa: PLR2004
+    archive_repo.get_filtered.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_archive_moves_batches_until_old_receipts_left():
+    """Job stops after batch which is not full or after max_batches"""
+    repo = AsyncMock()
+    repo.archive.side_effect = [10, 10, 3]
+    created_before = datetime.now(UTC)
+
+    assert await archive(repo, created_before=created_before, batch_size=10) == 23  # noqa: PLR2004
+    assert repo.archive.call_count == 3  # noqa: PLR2004
+
+    repo.archive.side_effect = [10, 10, 10]
+    assert await archive(repo, created_before=created_before, batch_size=10, max_batches=1) == 10  # noqa: PLR2004
@@ -0,0 +1,138 @@
+from datetime import UTC, datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import status
+
+from app.core.exceptions import AppErrorException
+from app.core.security import hash_refresh_token
+from app.interactors.auth_token import TokenInteractor
+
+
+def stored_token(expires_in: timedelta = timedelta(days=1), *, revoked: bool = False) -> MagicMock:
+    """Stored refresh token of user 1"""
+    return MagicMock(
+        user_id=1,
+        family_id="test_family_id",
+        expires_at=datetime.now(UTC) + expires_in,
+        revoked=revoked,
+    )
+
+
+@pytest.mark.asyncio
+async def test_issue_tokens_success(token_interactor: TokenInteractor,
+                                    refresh_token_repo: AsyncMock,
+                                ):
+    """Test issuing access and refresh tokens"""
+    user_id = 1
+
+    result = await token_interactor.issue_tokens(user_id)
+
+    assert result["token_type"] == "bearer"
+    assert result["access_token"]
+    assert result["refresh_token"]
+
+    refresh_token_repo.create.assert_called_once()
+    create_kwargs = refresh_token_repo.create.call_args.kwargs
+    assert create_kwargs["user_id"] == user_id
+    assert create_kwargs["token_hash"] == hash_refresh_token(result["refresh_token"])
+    assert create_kwargs["token_hash"] != result["refresh_token"]
+
+
+@pytest.mark.asyncio
+async def test_refresh_success(token_interactor: TokenInteractor,
+                               refresh_token_repo: AsyncMock,
+                            ):
+    """Test rotating refresh token in one repository call"""
+    refresh_token = "valid_refresh_token"
+    refresh_token_repo.get_by_hash.return_value = stored_token()
+
+    result = await token_interactor.refresh(refresh_token)
+
+    assert result["refresh_token"] != refresh_token
+    refresh_token_repo.rotate.assert_called_once_with(
+        hash_refresh_token(refresh_token),
+        hash_refresh_token(result["refresh_token"]),
+        result["refresh_expiration_time"],
+    )
+    refresh_token_repo.create.assert_not_called()
+    refresh_token_repo.revoke_family.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_refresh_reused_token_revokes_family(token_interactor: TokenInteractor,
+                                                   refresh_token_repo: AsyncMock,
+                                                ):
+    """Test presenting already rotated token revokes whole family"""
+    refresh_token_repo.get_by_hash.return_value = stored_token(revoked=True)
+
+    with pytest.raises(AppErrorException) as exc_info:
+        await token_interactor.refresh("rotated_refresh_token")
+
+    assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+    refresh_token_repo.revoke_family.assert_called_once_with("test_family_id")
+    refresh_token_repo.rotate.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_refresh_concurrently_rotated_token_revokes_family(token_interactor: TokenInteractor,
+                                                                 refresh_token_repo: AsyncMock,
+                                                                ):
+    """Test token rotated by concurrent request after it was read revokes whole family"""
+    refresh_token_repo.get_by_hash.return_value = stored_token()
+    refresh_token_repo.rotate.return_value = None
+
+    with pytest.raises(AppErrorException) as exc_info:
+        await token_interactor.refresh("raced_refresh_token")
+
+    assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+    refresh_token_repo.revoke_family.assert_called_once_with("test_family_id")
+
+
+@pytest.mark.asyncio
+async def test_refresh_unknown_token(token_interactor: TokenInteractor,
+                                     refresh_token_repo: AsyncMock,
+                                ):
+    """Test refreshing with unknown token"""
+    refresh_token_repo.get_by_hash.return_value = None
+
+    with pytest.raises(AppErrorException) as exc_info:
+        await token_interactor.refresh("unknown_refresh_token")
+
+    assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+    refresh_token_repo.revoke_family.assert_not_called()
+    refresh_token_repo.rotate.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_refresh_expired_token(token_interactor: TokenInteractor,
+                                     refresh_token_repo: AsyncMock,
+                                ):
+    """Test refreshing with expired token"""
+    refresh_token_repo.get_by_hash.return_value = stored_token(expires_in=timedelta(seconds=-1))
+
+    with pytest.raises(AppErrorException) as exc_info:
+        await token_interactor.refresh("expired_refresh_token")
+
+    assert exc_info.value.message == "Refresh token expired"
+    assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+    refresh_token_repo.rotate.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_refresh_inactive_user(token_interactor: TokenInteractor,
+                                     refresh_token_repo: AsyncMock,
+                                     mock_user_repo: AsyncMock,
+                                ):
+    """Test refresh tokens of deactivated user are revoked instead of rotated"""
+    refresh_token_repo.get_by_hash.return_value = stored_token()
+    mock_user_repo.get_by_id.return_value = MagicMock(id=1, is_active=False)
+
+    with pytest.raises(AppErrorException) as exc_info:
+        await token_interactor.refresh("valid_refresh_token")
+
+    assert exc_info.value.message == "Inactive user"
+    assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+    mock_user_repo.get_by_id.assert_called_once_with(1)
+    refresh_token_repo.revoke_family.assert_called_once_with("test_family_id")
+    refresh_token_repo.rotate.assert_not_called()
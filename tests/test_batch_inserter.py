@@ -0,0 +1,104 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.db.batch import BatchInserter
+from app.models.receipt import Receipt
+
+
+@pytest.fixture
+def batch_db():
+    """Mocked db returning inserted rows"""
+    db = AsyncMock()
+
+    async def insert_many(table, rows, returning, after_insert=None):
+        if any(row["public_id"] == "bad" for row in rows):
+            raise ValueError("Bad row")
+        return [SimpleNamespace(public_id=row["public_id"], id=i) for i, row in enumerate(reversed(rows))]
+
+    db.insert_many.side_effect = insert_many
+    return db
+
+
+@pytest.fixture
+def batch_inserter(batch_db) -> BatchInserter:
+    """Batch inserter with mocked db"""
+    return BatchInserter(
+        db=batch_db,
+        table=Receipt,
+        key_column="public_id",
+        returning=["id"],
+        window=0.01,
+        max_size=100,
+    )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_inserts_coalesced(batch_inserter: BatchInserter, batch_db: AsyncMock):
+    """Test concurrent inserts are written with one insert and every caller gets its own row"""
+    public_ids = [f"receipt_{i}" for i in range(10)]
+
+    rows = await asyncio.gather(*[batch_inserter.insert({"public_id": public_id}) for public_id in public_ids])
+
+    assert [row.public_id for row in rows] == public_ids
+    batch_db.insert_many.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_batch_max_size(batch_inserter: BatchInserter, batch_db: AsyncMock):
+    """Test batch is flushed when it reaches max size"""
+    batch_inserter.max_size = 3
+    batch_inserter.window = 10
+
+    rows = await asyncio.wait_for(
+        asyncio.gather(*[batch_inserter.insert({"public_id": f"receipt_{i}"}) for i in range(6)]),
+        timeout=1,
+    )
+
+    assert len(rows) == 6  # noqa: PLR2004
+    assert batch_db.insert_many.call_count == 2  # noqa: PLR2004
+
+
+@pytest.mark.asyncio
+async def test_bad_row_fails_only_its_caller(batch_inserter: BatchInserter):
+    """Test failing row does not fail other rows of the batch"""
+    results = await asyncio.gather(
+        batch_inserter.insert({"public_id": "good"}),
+        batch_inserter.insert({"public_id": "bad"}),
+        return_exceptions=True,
+    )
+
+    assert results[0].public_id == "good"
+    assert isinstance(results[1], ValueError)
+
+
+@pytest.mark.asyncio
+async def test_unanswered_callers_get_error(batch_inserter: BatchInserter, batch_db: AsyncMock):
+    """Test callers whose rows are not returned or whose batch is cancelled don`t wait forever"""
+    batch_db.insert_many.side_effect = None
+    batch_db.insert_many.return_value = [SimpleNamespace(public_id="first", id=1)]
+    results = await asyncio.wait_for(asyncio.gather(
+        batch_inserter.insert({"public_id": "first"}),
+        batch_inserter.insert({"public_id": "skipped"}),
+        return_exceptions=True,
+    ), timeout=1)
+
+    assert results[0].public_id == "first"
+    assert isinstance(results[1], RuntimeError)
+
+    started = asyncio.Event()
+
+    async def hang(*_args, **_kwargs):
+        started.set()
+        await asyncio.Event().wait()
+
+    batch_db.insert_many.side_effect = hang
+    waiting = asyncio.create_task(batch_inserter.insert({"public_id": "cancelled"}))
+    await started.wait()
+    for task in batch_inserter._tasks:
+        task.cancel()
+
+    with pytest.raises(RuntimeError):
+        await asyncio.wait_for(waiting, timeout=1)
@@ -0,0 +1,102 @@
+from datetime import UTC, datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware, parse_qvalues
+from app.core.responses import (MsgPackResponse, PydanticJSONResponse,
+                                accepts_msgpack, negotiated_response)
+from app.schemas.receipt import ReceiptListItem
+
+BIG_BODY = "receipt " * 1000
+
+
+@pytest.fixture
+def client():
+    """App with compression middleware"""
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500, gzip_level=6, brotli_quality=4)
+
+    @app.get("/big", response_class=PlainTextResponse)
+    async def big():
+        return BIG_BODY
+
+    @app.get("/small", response_class=PlainTextResponse)
+    async def small():
+        return "receipt"
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for _ in range(3):
+                yield "chunk "
+        return StreamingResponse(chunks())
+
+    return TestClient(app)
+
+
+def test_parse_qvalues():
+    """Values are parsed with their quality"""
+    assert parse_qvalues("gzip;q=0.5, br, identity;q=0") == {"gzip": 0.5, "br": 1.0, "identity": 0.0}
+
+
+def test_gzip_response(client):
+    """Big response is compressed"""
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < len(BIG_BODY)
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.text == BIG_BODY
+
+
+def test_br_preferred(client):
+    """Brotli is chosen when both encodings are accepted"""
+    pytest.importorskip("brotli")
+
+    response = client.get("/big", headers={"Accept-Encoding": "gzip, br"})
+
+    assert response.headers["content-encoding"] == "br"
+    assert response.text == BIG_BODY
+
+
+def test_small_or_not_accepted_response_is_not_compressed(client):
+    """Responses below threshold and without accepted encoding are sent as is"""
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/big", headers={"Accept-Encoding": "gzip;q=0, br;q=0"}).headers
+
+
+def test_streaming_response(client):
+    """Streaming response is compressed chunk by chunk"""
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text == "chunk chunk chunk "
+
+
+def test_accepts_msgpack():
+    """MessagePack is used only when it is not less preferred than JSON"""
+    pytest.importorskip("msgpack")
+
+    assert accepts_msgpack("application/msgpack")
+    assert accepts_msgpack("application/json;q=0.5, application/x-msgpack")
+    assert not accepts_msgpack("application/json, application/msgpack;q=0.5")
+    assert not accepts_msgpack("*/*")
+    assert not accepts_msgpack(None)
+
+
+def test_msgpack_response():
+    """MessagePack response has the same values as JSON response"""
+    msgpack = pytest.importorskip("msgpack")
+    created = datetime(2025, 1, 1, tzinfo=UTC)
+    item = ReceiptListItem.model_construct(id=1, total_amount=1050, created=created)
+
+    response = negotiated_response(item, "application/msgpack", exclude_unset=True)
+
+    assert isinstance(response, MsgPackResponse)
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.body) == {"id": 1, "total_amount": "10.50", "created": "2025-01-01T00:00:00Z"}
+    assert isinstance(negotiated_response(item, "application/json"), PydanticJSONResponse)
@@ -0,0 +1,151 @@
+import asyncio
+from datetime import UTC, datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import status
+from pydantic import BaseModel
+
+from app.core.exceptions import AppErrorException
+from app.interactors.idempotency import (IdempotencyInteractor,
+                                         request_fingerprint)
+
+
+class DummyResponse(BaseModel):
+    """Response of processed request"""
+    id: int
+
+
+@pytest.mark.asyncio
+async def test_run_replay_from_cache(idempotency_interactor: IdempotencyInteractor,
+                                     idempotency_repo: AsyncMock,
+                                ):
+    """Test retry gets the first response without running operation again"""
+    idempotency_repo.claim.return_value = True
+    operation = AsyncMock(return_value=DummyResponse(id=1))
+
+    first = await idempotency_interactor.run(1, "key", "hash", operation, DummyResponse)
+    second = await idempotency_interactor.run(1, "key", "hash", operation, DummyResponse)
+
+    assert first == second
+    operation.assert_called_once()
+    idempotency_repo.claim.assert_called_once()
+    idempotency_repo.save_response.assert_called_once_with(1, "key", {"id": 1})
+
+
+@pytest.mark.asyncio
+async def test_run_concurrent_duplicates(idempotency_interactor: IdempotencyInteractor,
+                                         idempotency_repo: AsyncMock,
+                                    ):
+    """Test concurrent duplicates wait for the first request instead of running operation"""
+    idempotency_repo.claim.return_value = True
+
+    async def operation():
+        await asyncio.sleep(0.01)
+        return DummyResponse(id=1)
+
+    operation_mock = AsyncMock(side_effect=operation)
+
+    results = await asyncio.gather(*[
+        idempotency_interactor.run(1, "key", "hash", operation_mock, DummyResponse)
+        for _ in range(5)
+    ])
+
+    assert all(result.id == 1 for result in results)
+    operation_mock.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_run_response_stored_by_another_process(idempotency_interactor: IdempotencyInteractor,
+                                                      idempotency_repo: AsyncMock,
+                                                    ):
+    """Test stored response is returned when key was claimed by another process"""
+    idempotency_repo.claim.return_value = False
+    idempotency_repo.get.return_value = MagicMock(
+        request_hash="hash",
+        response={"id": 7},
+        expires_at=datetime.now(UTC) + timedelta(hours=1),
+    )
+    operation = AsyncMock()
+
+    result = await idempotency_interactor.run(1, "key", "hash", operation, DummyResponse)
+
+    assert result == DummyResponse(id=7)
+    operation.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_run_key_reused_with_another_request(idempotency_interactor: IdempotencyInteractor,
+                                                   idempotency_repo: AsyncMock,
+                                                ):
+    """Test key used with another request body is rejected"""
+    idempotency_repo.claim.return_value = False
+    idempotency_repo.get.return_value = MagicMock(
+        request_hash="another_hash",
+        response={"id": 7},
+        expires_at=datetime.now(UTC) + timedelta(hours=1),
+    )
+
+    with pytest.raises(AppErrorException) as exc_info:
+        await idempotency_interactor.run(1, "key", "hash", AsyncMock(), DummyResponse)
+
+    assert exc_info.value.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+async def test_run_key_reused_in_another_mode(idempotency_interactor: IdempotencyInteractor,
+                                              idempotency_repo: AsyncMock,
+                                            ):
+    """Test retry of asynchronous request without respond-async doesn`t replay 202 response"""
+    idempotency_repo.claim.return_value = True
+    body = DummyResponse(id=1)
+    await idempotency_interactor.run(1, "key", request_fingerprint(body, "respond-async"),
+                                     AsyncMock(return_value=body), DummyResponse)
+
+    assert request_fingerprint(body) != request_fingerprint(body, "respond-async")
+    with pytest.raises(AppErrorException) as exc_info:
+        await idempotency_interactor.run(1, "key", request_fingerprint(body), AsyncMock(), DummyResponse)
+
+    assert exc_info.value.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+async def test_run_failed_operation_releases_key(idempotency_interactor: IdempotencyInteractor,
+                                                 idempotency_repo: AsyncMock,
+                                            ):
+    """Test failed request releases key, so it can be retried"""
+    idempotency_repo.claim.return_value = True
+    operation = AsyncMock(side_effect=ValueError("Failed"))
+
+    with pytest.raises(ValueError, match="Failed"):
+        await idempotency_interactor.run(1, "key", "hash", operation, DummyResponse)
+
+    idempotency_repo.release.assert_called_once_with(1, "key")
+    idempotency_repo.save_response.assert_not_called()
+    assert idempotency_interactor.cache.get((1, "key")) is None
+
+
+@pytest.mark.asyncio
+async def test_run_cancelled_first_request(idempotency_interactor: IdempotencyInteractor,
+                                           idempotency_repo: AsyncMock,
+                                      ):
+    """Test cancelled request releases key and waiting duplicate processes request instead of hanging"""
+    idempotency_repo.claim.return_value = True
+    started = asyncio.Event()
+
+    async def operation():
+        if not started.is_set():
+            started.set()
+            await asyncio.Event().wait()
+        return DummyResponse(id=2)
+
+    first = asyncio.create_task(idempotency_interactor.run(1, "key", "hash", operation, DummyResponse))
+    await started.wait()
+    duplicate = asyncio.create_task(idempotency_interactor.run(1, "key", "hash", operation, DummyResponse))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert (await asyncio.wait_for(duplicate, timeout=1)).id == 2  # noqa: PLR2004
+    assert first.cancelled()
+    idempotency_repo.release.assert_called_once_with(1, "key")
+    idempotency_repo.save_response.assert_called_once_with(1, "key", {"id": 2})
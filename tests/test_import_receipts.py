@@ -0,0 +1,84 @@
+import json
+from datetime import UTC, datetime
+from types import SimpleNamespace
+from uuid import UUID
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.tools.import_receipts import Checkpoint, import_file, public_id_key, validate_chunk
+
+
+def receipt_line(user_id: int = 1, amount: str = "100", **kwargs) -> str:
+    """JSONL line of receipt with two products of 30.50 in total"""
+    return json.dumps({
+        "user_id": user_id,
+        "products": [{"name": "Молоко", "price": "10.25", "quantity": 2}, {"name": "Хліб", "price": 10, "quantity": 1}],
+        "payment": {"payment_type": "cash", "amount": amount},
+        **kwargs,
+    }) + "\n"
+
+
+def test_validate_chunk():
+    """Totals are calculated as for API receipts, invalid records are reported with their numbers"""
+    csv_row = {
+        "user_id": "2",
+        "payment_type": "cashless",
+        "payment_amount": "5",
+        "products": '[{"name": "Сир", "price": "5", "quantity": 1}]',
+        "created": "2024-01-31 10:00:00",
+        "public_id": "",
+    }
+    records = [receipt_line(public_id="given"), "\n", receipt_line(amount="-1"), csv_row]
+
+    key = public_id_key("salt")
+    rows, errors = validate_chunk(key, 10, records)
+
+    assert rows[0][:6] == (1, "given", "CASH", 3050, 10000, 6950)
+    assert json.loads(rows[0][6])[0] == {"name": "Молоко", "price": 1025, "quantity": 2, "total": 2050}
+    assert rows[0][7] is None
+    assert rows[1][:6] == (2, rows[1][1], "CASHLESS", 500, 500, 0)
+    assert rows[1][7] == datetime(2024, 1, 31, 10, tzinfo=UTC)
+    assert errors == [{"record": 12, "errors": [{"type": "greater_than", "loc": ["payment", "amount"],
+                                                 "msg": "Input should be greater than 0", "ctx": {"gt": 0}}]}]
+
+    overflow = receipt_line(products=[{"name": "Золото", "price": "90000000000000000", "quantity": 2}])
+    assert validate_chunk(key, 20, [overflow]) == (
+        [], [{"record": 20, "errors": [{"type": "value_error", "loc": [], "msg": "Receipt total is too large"}]}],
+    )
+
+    # Generated public ids depend only on salt of import and record number, so repeated import is skipped by db
+    assert validate_chunk(key, 13, [csv_row])[0][0][1] == rows[1][1]
+    assert validate_chunk(public_id_key("other"), 13, [csv_row])[0][0][1] != rows[1][1]
+    assert UUID(rows[1][1]).version == 4  # noqa: PLR2004
+
+
+@pytest.mark.asyncio
+async def test_import_file_resumes_from_checkpoint(tmp_path):
+    """Interrupted import continues after the last committed chunk"""
+    path = tmp_path / "receipts.jsonl"
+    path.write_text("".join(receipt_line(amount="-1" if i == 3 else "100") for i in range(10)))  # noqa: PLR2004
+    repo = AsyncMock()
+    repo.import_batch.side_effect = lambda rows: [SimpleNamespace(user_id=row[0]) for row in rows]
+    failing = AsyncMock()
+    failing.import_batch.side_effect = [[], ConnectionError]
+
+    with pytest.raises(ConnectionError):
+        await import_file(failing, path, executor=None, chunk_size=4, prefetch=1, list_cache=AsyncMock())
+    progress, _ = await import_file(repo, path, executor=None, chunk_size=4, prefetch=1, list_cache=AsyncMock())
+
+    assert [len(call.args[0]) for call in repo.import_batch.call_args_list] == [4, 2]
+    assert (progress.records, progress.imported, progress.skipped, progress.invalid) == (10, 6, 3, 1)
+    assert json.loads((tmp_path / "receipts.jsonl.errors.jsonl").read_text())["record"] == 3  # noqa: PLR2004
+
+    # Finished file is not imported again, restart starts from the beginning
+    await import_file(repo, path, executor=None, chunk_size=4, list_cache=AsyncMock())
+    assert repo.import_batch.call_count == 2  # noqa: PLR2004
+    progress, _ = await import_file(repo, path, executor=None, chunk_size=4, restart=True, list_cache=AsyncMock())
+    assert (progress.records, progress.imported, progress.invalid) == (10, 9, 1)
+
+    # Salt saved before the first chunk keeps generated public ids across resume and restart
+    resumed, restarted = ([row[1] for call in calls for row in call.args[0]]
+                          for calls in (repo.import_batch.call_args_list[:2], repo.import_batch.call_args_list[2:]))
+    assert restarted == [row[1] for row in failing.import_batch.call_args_list[0].args[0]] + resumed
+    assert Checkpoint(path).salt != Checkpoint(tmp_path / "other.jsonl").salt
@@ -0,0 +1,28 @@
+from unittest.mock import AsyncMock
+
+from fastapi.testclient import TestClient
+
+from app.conf.settings import settings
+from app.interactors.receipt import ReceiptInteractor
+from app.main import create_app
+
+
+def test_lifespan_warms_up_and_disposes_pool():
+    """Pool is warmed up and checked on startup and closed on shutdown"""
+    app = create_app()
+    app.state.db = db = AsyncMock()
+
+    with TestClient(app):
+        db.warm_up.assert_awaited_once_with(settings.DB_POOL_WARMUP_CONNECTIONS)
+        db.check.assert_awaited_once()
+        db.dispose.assert_not_awaited()
+
+    db.dispose.assert_awaited_once()
+
+
+def test_dependencies_are_app_scoped():
+    """Interactors are created once with app"""
+    app = create_app()
+
+    assert isinstance(app.state.receipt_interactor, ReceiptInteractor)
+    assert app.state.receipt_interactor.receipt_repo.batch_inserter is app.state.receipt_batch_inserter
@@ -0,0 +1,189 @@
+import inspect
+from datetime import UTC, date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
+
+from app.conf.settings import StorageBackend, settings
+from app.repositories.idempotency_key import IdempotencyKeyRepository
+from app.repositories.interfaces import (AbstractIdempotencyKeyRepository, AbstractReceiptRepository,
+                                         AbstractRefreshTokenRepository, AbstractUserRepository)
+from app.repositories.memory import (MemoryIdempotencyKeyRepository,
+                                     MemoryReceiptRepository,
+                                     MemoryRefreshTokenRepository,
+                                     MemoryStorage, MemoryUserRepository)
+from app.repositories.receipt import ReceiptRepository
+from app.repositories.refresh_token import RefreshTokenRepository
+from app.repositories.user import UserRepository
+from app.schemas.receipt import PaymentType, ReceiptFilter
+
+
+@pytest.fixture
+def storage():
+    """Empty in-memory storage"""
+    return MemoryStorage()
+
+
+def receipt_data(user_id: int, total: int, payment_type: PaymentType = PaymentType.CASH, **kwargs) -> dict:
+    """Data for receipt creation, total is in cents"""
+    return {
+        "user_id": user_id,
+        "total_amount": total,
+        "payment_type": payment_type,
+        "payment_amount": total,
+        "rest_amount": 0,
+        "products": [{"name": "Product", "price": total, "quantity": 1, "total": total}],
+        **kwargs,
+    }
+
+
+@pytest.mark.asyncio
+async def test_user_create_get_and_update(storage, hashed_password: str):
+    """Users are indexed by id and email, email stays unique"""
+    repo = MemoryUserRepository(storage)
+    user = await repo.create(email="a@example.com", password=hashed_password, first_name="A")
+    other = await repo.create(email="b@example.com", password=hashed_password)
+
+    assert await repo.create(email="a@example.com", password=hashed_password) is user
+    assert await repo.get_by_id(user.id) is user
+    assert user.is_active is True
+
+    await repo.update(user.id, {"email": "c@example.com"})
+    assert await repo.get_by_email("a@example.com") is None
+    assert await repo.get_by_email("c@example.com") is user
+
+    with pytest.raises(IntegrityError):
+        await repo.update(other.id, {"email": "c@example.com"})
+    assert await repo.update(100, {"first_name": "B"}) is None
+
+
+@pytest.mark.asyncio
+async def test_receipts_get_filtered(storage):
+    """Filters, newest first ordering, pagination and total count match db query"""
+    repo = MemoryReceiptRepository(storage)
+    now = datetime.now(UTC)
+    for i, total in enumerate([1000, 2000, 3000, 4000]):
+        payment_type = PaymentType.CASH if i % 2 else PaymentType.CASHLESS
+        await repo.create(receipt_data(1, total, payment_type, created=now + timedelta(seconds=i)))
+    await repo.create(receipt_data(2, 2500))
+
+    receipts, total = await repo.get_filtered(1, ReceiptFilter(), limit=2, offset=1)
+    assert total == 4  # noqa: PLR2004
+    assert [r.total_amount for r in receipts] == [3000, 2000]
+
+    filters = ReceiptFilter(min_amount=Decimal("15"), max_amount=Decimal("35"), payment_type="cash")
+    receipts, total = await repo.get_filtered(1, filters, limit=10, offset=0)
+    assert total == 1
+    assert receipts[0].total_amount == 2000  # noqa: PLR2004
+
+    filters = ReceiptFilter(date_to=date(2000, 1, 1))
+    assert await repo.get_filtered(1, filters, limit=10, offset=0) == ([], 0)
+
+
+@pytest.mark.asyncio
+async def test_receipts_update_user_counters(storage, hashed_password: str):
+    """Created receipts are added to owner`s counters, which are used as unfiltered total"""
+    user = await MemoryUserRepository(storage).create(email="a@example.com", password=hashed_password)
+    repo = MemoryReceiptRepository(storage)
+    await repo.create(receipt_data(user.id, 1050))
+    await repo.create(receipt_data(user.id, 225))
+
+    assert user.receipt_count == 2  # noqa: PLR2004
+    assert user.receipt_total_amount == 1275  # noqa: PLR2004
+
+    user.receipt_count = 5
+    assert (await repo.get_filtered(user.id, ReceiptFilter(), limit=1, offset=0))[1] == 5  # noqa: PLR2004
+    assert (await repo.get_filtered(user.id, ReceiptFilter(min_amount=Decimal("5")), limit=1, offset=0))[1] == 1
+
+
+@pytest.mark.asyncio
+async def test_receipts_sparse_fields_and_public_id(storage):
+    """Only requested fields are returned, receipts are found by public_id"""
+    repo = MemoryReceiptRepository(storage)
+    receipt = await repo.create(receipt_data(1, 1000))
+
+    rows, _ = await repo.get_filtered(1, ReceiptFilter(), limit=10, offset=0, fields=["id", "total_amount"])
+    assert vars(rows[0]) == {"id": receipt.id, "total_amount": 1000}
+    assert await repo.get_by_public_id(receipt.public_id) is receipt
+    assert await repo.get_by_public_id("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_rotated_once(storage):
+    """Token is rotated only once into the same family and whole family can be revoked"""
+    repo = MemoryRefreshTokenRepository(storage)
+    expires_at = datetime.now(UTC) + timedelta(days=1)
+    await repo.create(1, "hash-1", "family", expires_at)
+
+    rotated = await repo.rotate("hash-1", "hash-2", expires_at)
+    assert (rotated.user_id, rotated.family_id, rotated.token_hash) == (1, "family", "hash-2")
+    assert await repo.rotate("hash-1", "hash-3", expires_at) is None
+    assert await repo.get_by_hash("hash-3") is None
+    assert len(await repo.revoke_family("family")) == 1
+    assert (await repo.get_by_hash("hash-2")).revoked is True
+
+
+@pytest.mark.asyncio
+async def test_idempotency_key_claim(storage):
+    """Key is claimed once, released only without response and deleted after expiration"""
+    repo = MemoryIdempotencyKeyRepository(storage)
+    now = datetime.now(UTC)
+
+    assert await repo.claim(1, "key", "hash", now) is True
+    assert await repo.claim(1, "key", "hash", now) is False
+    await repo.save_response(1, "key", {"id": 1})
+    assert await repo.release(1, "key") == []
+    assert (await repo.get(1, "key")).response == {"id": 1}
+    assert len(await repo.delete_expired(now)) == 1
+    assert await repo.get(1, "key") is None
+
+
+def test_api_with_memory_backend(monkeypatch):
+    """Full API works in process without database"""
+    monkeypatch.setattr(settings, "STORAGE_BACKEND", StorageBackend.MEMORY)
+    from app.main import create_app
+
+    with TestClient(create_app()) as client:
+        credentials = {"email": "user@example.com", "password": "password"}
+        assert client.post("/api/users/register", json=credentials).status_code == status.HTTP_201_CREATED
+        token = client.post(
+            "/api/users/login",
+            data={"username": credentials["email"], "password": credentials["password"]},
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        receipt = client.post(
+            "/api/receipts/",
+            json={
+                "products": [{"name": "Product", "price": "10.50", "quantity": 2}],
+                "payment": {"payment_type": "cash", "amount": "50"},
+            },
+            headers=headers,
+        ).json()
+        assert receipt["total_amount"] == "21.00"
+
+        page = client.get("/api/receipts/", params={"min_amount": 20}, headers=headers).json()
+        assert page["total"] == 1
+        assert page["items"][0]["id"] == receipt["id"]
+
+        text = client.get(f"/api/receipts/public/{receipt['public_id']}").text
+        assert "21.00" in text
+
+
+@pytest.mark.parametrize(("interface", "implementations"), [
+    (AbstractUserRepository, (UserRepository, MemoryUserRepository)),
+    (AbstractReceiptRepository, (ReceiptRepository, MemoryReceiptRepository)),
+    (AbstractRefreshTokenRepository, (RefreshTokenRepository, MemoryRefreshTokenRepository)),
+    (AbstractIdempotencyKeyRepository, (IdempotencyKeyRepository, MemoryIdempotencyKeyRepository)),
+])
+def test_backends_implement_interface(interface, implementations):
+    """Both backends implement every method of repository interface with the same parameters"""
+    for implementation in implementations:
+        assert issubclass(implementation, interface)
+        assert not implementation.__abstractmethods__
+        for name in interface.__abstractmethods__:
+            expected = inspect.signature(getattr(interface, name)).parameters
+            assert inspect.signature(getattr(implementation, name)).parameters == expected, (implementation, name)
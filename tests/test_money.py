@@ -0,0 +1,52 @@
+from decimal import Decimal
+
+import pytest
+from pydantic import ValidationError
+
+from app.core.money import format_cents, from_cents, to_cents
+from app.schemas.receipt import PaymentCreate, ProductData, ReceiptFilter
+
+
+@pytest.mark.parametrize(
+    ("amount", "cents"),
+    [
+        (10, 1000),
+        ("10.5", 1050),
+        (Decimal("0.01"), 1),
+        (10.1, 1010),
+        (0.285, 29),
+        ("10.005", 1001),
+        ("-1.005", -101),
+    ],
+)
+def test_to_cents(amount, cents: int):
+    """Amounts are converted exactly, fractions of cent are rounded half up"""
+    assert to_cents(amount) == cents
+
+
+@pytest.mark.parametrize("amount", ["abc", "nan", "inf", None, "1e30"])
+def test_to_cents_invalid(amount):
+    """Not numbers and amounts not fitting into bigint are rejected"""
+    with pytest.raises(ValueError, match="Invalid amount"):
+        to_cents(amount)
+
+
+def test_format_cents():
+    """Cents are formatted as decimal amounts"""
+    assert [format_cents(cents) for cents in (0, 5, 1050, -5, -1050)] == ["0.00", "0.05", "10.50", "-0.05", "-10.50"]
+    assert from_cents(1050) == Decimal("10.50")
+
+
+def test_money_fields():
+    """Request amounts are parsed to cents, amounts are returned in JSON as decimal strings"""
+    payment = PaymentCreate.model_validate_json('{"payment_type": "cash", "amount": 25.1}')
+    product = ProductData(name="Milk", price=1050, quantity=2, total=2100)
+
+    assert payment.amount == 2510  # noqa: PLR2004
+    assert payment.model_dump_json() == '{"payment_type":"cash","amount":"25.10"}'
+    assert product.model_dump()["total"] == 2100  # noqa: PLR2004
+    assert product.model_dump_json() == '{"name":"Milk","price":"10.50","quantity":2,"total":"21.00"}'
+    assert ReceiptFilter(min_amount="0.5").min_amount == 50  # noqa: PLR2004
+
+    with pytest.raises(ValidationError):
+        PaymentCreate(payment_type="cash", amount="ten")
@@ -0,0 +1,162 @@
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.core.query_cache import VersionedQueryCache
+from app.conf.settings import settings
+from app.core.resp import RespClient, RespServer
+from app.core.shared_cache import query_cache_enabled
+from app.interactors.receipt import ReceiptInteractor
+from app.schemas.receipt import (PaymentCreate, PaymentType, ReceiptCreateDTO,
+                                 ReceiptFilter)
+
+
+def make_cache(**kwargs) -> VersionedQueryCache:
+    """Small cache with local versions"""
+    return VersionedQueryCache("list", **{"max_rows": 10, "max_keys_per_user": 2, "ttl": 60, **kwargs})
+
+
+async def test_bump_invalidates_user_results():
+    """Results are served until user`s version is bumped, other users are not affected"""
+    cache = make_cache()
+    cache.set(1, await cache.version(1), "page", "first", rows=1)
+    cache.set(2, await cache.version(2), "page", "other", rows=1)
+
+    assert cache.get(1, await cache.version(1), "page") == "first"
+
+    await cache.bump(1)
+
+    assert cache.get(1, await cache.version(1), "page") is None
+    assert cache.get(2, await cache.version(2), "page") == "other"
+    assert cache.stats()["rows"] == 1
+
+
+async def test_result_loaded_before_bump_is_not_served():
+    """Result of read which started before change is never served after it"""
+    cache = make_cache()
+    version = await cache.version(1)
+
+    await cache.bump(1)
+    cache.set(1, version, "page", "stale", rows=1)
+
+    assert cache.get(1, await cache.version(1), "page") is None
+
+
+async def test_limits():
+    """Every user keeps limited amount of results and total rows are bounded"""
+    cache = make_cache()
+    for page in range(3):
+        cache.set(1, 0, page, page, rows=1)
+
+    assert cache.get(1, 0, 0) is None
+    assert cache.get(1, 0, 2) == 2  # noqa: PLR2004
+
+    # Least recently used result is evicted to fit
+    cache.set(2, 0, "big", "big", rows=9)
+
+    assert cache.get(1, 0, 1) is None
+    assert cache.get(1, 0, 2) == 2  # noqa: PLR2004
+    assert cache.get(2, 0, "big") == "big"
+    assert cache.stats()["rows"] == 10  # noqa: PLR2004
+
+    cache.set(3, 0, "huge", "huge", rows=11)
+    assert cache.get(3, 0, "huge") is None
+
+
+async def test_versions_shared_between_workers():
+    """Bump in one worker invalidates results cached by another one"""
+    server = RespServer()
+    port = await server.start()
+    client = RespClient("127.0.0.1", port)
+    first, second = make_cache(client=client), make_cache(client=client)
+
+    second.set(1, await second.version(1), "page", "first", rows=1)
+    await first.bump(1)
+
+    assert await second.version(1) == 1
+    assert second.get(1, await second.version(1), "page") is None
+
+    await client.close()
+    await server.close()
+
+
+async def test_unavailable_shared_store_disables_cache():
+    """Results are not cached when version can`t be read"""
+    server = RespServer()
+    port = await server.start()
+    await server.close()
+    cache = make_cache(client=RespClient("127.0.0.1", port))
+
+    version = await cache.version(1)
+    cache.set(1, version, "page", "first", rows=1)
+
+    assert version is None
+    assert cache.get(1, version, "page") is None
+    assert cache.stats()["version_errors"] == 1
+
+
+
+@pytest.mark.parametrize(("slot", "workers", "enabled"), [(None, 0, True), (0, 1, True), (1, 4, False)])
+def test_query_cache_disabled_for_workers_without_shared_store(monkeypatch, slot, workers, enabled):
+    """Local versions are used only by single process, workers would miss each other`s bumps"""
+    monkeypatch.setattr(settings, "WORKER_SLOT", slot)
+    monkeypatch.setattr(settings, "WORKERS", workers)
+
+    assert query_cache_enabled() is enabled
+
+
+async def test_disabled_cache_is_not_used():
+    """Disabled cache never serves results"""
+    cache = make_cache(enabled=False)
+
+    version = await cache.version(1)
+    cache.set(1, version, "page", "first", rows=1)
+    await cache.bump(1)
+
+    assert version is None
+    assert cache.get(1, version, "page") is None
+    assert cache.stats()["keys"] == 0
+
+
+async def test_corrupted_shared_version_disables_cache():
+    """Version which is not a number is treated as unknown"""
+    server = RespServer()
+    port = await server.start()
+    client = RespClient("127.0.0.1", port)
+    await client.set("list:version:1", b"broken")
+
+    assert await make_cache(client=client).version(1) is None
+
+    await client.close()
+    await server.close()
+
+@pytest.mark.asyncio
+async def test_receipts_list_cached_until_receipt_created(interactor: ReceiptInteractor,
+                                                          receipt_repo: AsyncMock,
+                                                          valid_products,
+                                                          valid_payment: PaymentCreate,
+                                                        ):
+    """Test the same page is read from db once and read again after user creates receipt"""
+    receipt_repo.get_filtered.return_value = ([], 0)
+    receipt_repo.create.return_value = MagicMock(
+        id=1,
+        public_id="public_id",
+        products=[],
+        total_amount=4675,
+        rest_amount=325,
+        created=datetime.now(),
+    )
+    expected_db_reads = 2
+
+    await interactor.get_filtered_receipts(user_id=1, filters=ReceiptFilter(), limit=10, offset=0)
+    await interactor.get_filtered_receipts(user_id=1, filters=ReceiptFilter(), limit=10, offset=0)
+    assert receipt_repo.get_filtered.call_count == 1
+
+    await interactor.create_receipt(1, ReceiptCreateDTO(products=valid_products, payment=valid_payment))
+    await interactor.get_filtered_receipts(user_id=1, filters=ReceiptFilter(), limit=10, offset=0)
+    assert receipt_repo.get_filtered.call_count == expected_db_reads
+
+    await interactor.get_filtered_receipts(user_id=1, filters=ReceiptFilter(payment_type=PaymentType.CASH), limit=10,
+                                           offset=0)
+    assert receipt_repo.get_filtered.call_count == expected_db_reads + 1
@@ -0,0 +1,61 @@
+import pytest
+from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi.testclient import TestClient
+
+from app.api import dependencies
+from app.api.dependencies import ip_rate_limit
+from app.core import rate_limit
+from app.core.exceptions import http_error_handler
+from app.core.rate_limit import TokenBucketLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controlled monotonic time of limiter"""
+    now = [0.0]
+    monkeypatch.setattr(rate_limit, "monotonic", lambda: now[0])
+    return now
+
+
+def test_bucket_refills_with_rate(clock):
+    """Burst is allowed, then requests pass with refill rate"""
+    limiter = TokenBucketLimiter(rate=2, capacity=4, max_keys=10)
+
+    assert [limiter.acquire("user", cost=2) for _ in range(3)] == [0, 0, 1.0]
+    clock[0] = 1
+    assert limiter.acquire("user", cost=2) == 0
+    assert limiter.acquire("other", cost=4) == 0
+    assert limiter.acquire("user", cost=100) == 2.0  # noqa: PLR2004
+    assert limiter.rejected == 2  # noqa: PLR2004
+
+
+def test_idle_and_extra_buckets_are_evicted(clock):
+    """Refilled buckets are evicted and storage never exceeds max keys"""
+    limiter = TokenBucketLimiter(rate=1, capacity=10, max_keys=3)
+    for key in range(5):
+        limiter.acquire(key)
+    assert len(limiter) == 3  # noqa: PLR2004
+
+    clock[0] = 20
+    limiter.acquire("new")
+    assert len(limiter) == 1
+
+
+def test_rate_limited_route(monkeypatch, clock):
+    """Exceeding limit returns 429 with Retry-After"""
+    monkeypatch.setattr(dependencies, "ip_limiter", TokenBucketLimiter(rate=0.5, capacity=2, max_keys=10))
+    monkeypatch.setitem(dependencies.settings.RATE_LIMIT_COSTS, "test.route", 2)
+
+    app = FastAPI()
+    app.add_exception_handler(HTTPException, http_error_handler)
+
+    @app.get("/", dependencies=[Depends(ip_rate_limit("test.route"))])
+    async def route():
+        return {}
+
+    client = TestClient(app)
+    assert client.get("/").status_code == status.HTTP_200_OK
+
+    response = client.get("/")
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert response.headers["retry-after"] == "4"
@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.repositories.receipt import update_user_counters
+from app.tools.reconcile_counters import reconcile
+
+
+def inserted_row(user_id: int, total: int) -> SimpleNamespace:
+    """Row returned by receipts insert"""
+    return SimpleNamespace(user_id=user_id, total_amount=total)
+
+
+@pytest.mark.asyncio
+async def test_update_user_counters_aggregates_batch():
+    """Batch is added to counters with one update per user, users are locked in id order"""
+    session = AsyncMock()
+
+    await update_user_counters(session, [inserted_row(2, 150), inserted_row(1, 1000), inserted_row(2, 250)])
+
+    lock_query = str(session.execute.call_args_list[0][0][0])
+    assert "FOR UPDATE" in lock_query
+    assert "ORDER BY users.id" in lock_query
+    assert session.execute.call_args_list[1][0][1] == [
+        {"counter_user_id": 1, "counter_count": 1, "counter_amount": 1000},
+        {"counter_user_id": 2, "counter_count": 2, "counter_amount": 400},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_update_user_counters_single_user_and_empty_batch():
+    """Single user is not locked separately, receipts skipped by conflict don`t change counters"""
+    session = AsyncMock()
+
+    await update_user_counters(session, [])
+    session.execute.assert_not_called()
+
+    await update_user_counters(session, [inserted_row(1, 1000)])
+    session.execute.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_reconcile_fixes_only_drifted_users():
+    """Drifted users are reported and recounted only with fix"""
+    user_repo = AsyncMock()
+    user_repo.get_receipt_counters_drift.return_value = [
+        SimpleNamespace(
+            id=3,
+            receipt_count=5,
+            actual_count=4,
+            receipt_total_amount=5000,
+            actual_total_amount=4000,
+        ),
+    ]
+
+    assert await reconcile(user_repo, fix=False, limit=10) == 1
+    user_repo.reconcile_receipt_counters.assert_not_called()
+
+    assert await reconcile(user_repo, fix=True, limit=10) == 1
+    user_repo.reconcile_receipt_counters.assert_called_once_with(3)
+    user_repo.get_receipt_counters_drift.assert_called_with(10)
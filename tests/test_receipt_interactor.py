@@ -1,11 +1,16 @@
 from datetime import datetime
-from decimal import Decimal
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from fastapi import HTTPException, status
 from fastapi.testclient import TestClient
 
+from app.api.dependencies import (get_current_active_user_id,
+                                  get_idempotency_interactor,
+                                  get_receipt_interactor)
+from app.api.receipts import select_fields
+from app.conf.settings import settings
+from app.core.security import get_current_user_id
 from app.interactors.receipt import ReceiptInteractor
 from app.models.receipt import Receipt
 from app.schemas.receipt import (PaymentCreate, PaymentType, ReceiptCreateDTO,
@@ -21,18 +26,18 @@ async def test_create_receipt_success(interactor: ReceiptInteractor,
     """Test creating receipts successfully"""
     expected_products = [{
             "name": "Test Product 1",
-            "price": Decimal("10.50"),
-            "quantity": Decimal("2"),
-            "total": Decimal("21.00"),
+            "price": 1050,
+            "quantity": 2,
+            "total": 2100,
         }, {
             "name": "Test Product 2",
-            "price": Decimal("25.75"),
-            "quantity": Decimal("1"),
-            "total": Decimal("25.75"),
+            "price": 2575,
+            "quantity": 1,
+            "total": 2575,
         }]
-    expected_total = Decimal("46.75") # 10.50 * 2 + 25.75 * 1
-    expected_rest = Decimal("3.25") # 50.00 - 46.75
-    payment_amount = Decimal("50.00")
+    expected_total = 4675 # 10.50 * 2 + 25.75 * 1 in cents
+    expected_rest = 325 # 50.00 - 46.75
+    payment_amount = 5000
     user_id = 1
     create_dto = ReceiptCreateDTO(
         products=valid_products,
@@ -83,9 +88,9 @@ async def test_get_receipt_success(interactor: ReceiptInteractor,
         public_id=valid_public_id,
         products=[],
         payment_type=PaymentType.CASH,
-        payment_amount=Decimal("50.00"),
-        total_amount=Decimal("46.75"),
-        rest_amount=Decimal("3.25"),
+        payment_amount=5000,
+        total_amount=4675,
+        rest_amount=325,
         created=datetime.now(),
     )
     receipt_repo.get_by_id.return_value = mock_receipt
@@ -116,6 +121,7 @@ async def test_get_receipt_not_found(interactor: ReceiptInteractor,
 @pytest.mark.asyncio
 async def test_get_receipt_wrong_user(interactor: ReceiptInteractor,
                                       receipt_repo: AsyncMock,
+                                      valid_public_id: str,
                                     ):
     """Test creating receipts unsuccessfully (Wrong user)"""
     receipt_id = 1
@@ -124,6 +130,13 @@ async def test_get_receipt_wrong_user(interactor: ReceiptInteractor,
     mock_receipt = MagicMock(
         id=receipt_id,
         user_id=wrong_user_id,  # Different user
+        public_id=valid_public_id,
+        products=[],
+        payment_type=PaymentType.CASH,
+        payment_amount=5000,
+        total_amount=4675,
+        rest_amount=325,
+        created=datetime.now(),
     )
     receipt_repo.get_by_id.return_value = mock_receipt
 
@@ -152,9 +165,9 @@ async def test_get_filtered_receipts(interactor: ReceiptInteractor,
             public_id=valid_public_id,
             products=[],
             payment_type=PaymentType.CASH,
-            payment_amount=Decimal("50.00"),
-            total_amount=Decimal("46.75"),
-            rest_amount=Decimal("3.25"),
+            payment_amount=5000,
+            total_amount=4675,
+            rest_amount=325,
             created=datetime.now(),
         ),
         MagicMock(
@@ -162,9 +175,9 @@ async def test_get_filtered_receipts(interactor: ReceiptInteractor,
             public_id=f"{valid_public_id}_2",
             products=[],
             payment_type=PaymentType.CASHLESS,
-            payment_amount=Decimal("30.00"),
-            total_amount=Decimal("30.00"),
-            rest_amount=Decimal("0.00"),
+            payment_amount=3000,
+            total_amount=3000,
+            rest_amount=0,
             created=datetime.now(),
         ),
     ]
@@ -186,6 +199,7 @@ async def test_get_filtered_receipts(interactor: ReceiptInteractor,
         filters=filters,
         limit=limit,
         offset=offset,
+        fields=None,
     )
 
 
@@ -202,14 +216,14 @@ async def test_get_receipt_text_success(interactor: ReceiptInteractor,
         user_id=1,
         products=[{
             "name": "Test Product",
-            "price": Decimal("10.50"),
-            "quantity": Decimal("2"),
-            "total": Decimal("21.00"),
+            "price": 1050,
+            "quantity": 2,
+            "total": 2100,
         }],
         payment_type=PaymentType.CASH,
-        payment_amount=Decimal("25.00"),
-        total_amount=Decimal("21.00"),
-        rest_amount=Decimal("4.00"),
+        payment_amount=2500,
+        total_amount=2100,
+        rest_amount=400,
         created=datetime.now(),
     )
     receipt_repo.get_by_public_id.return_value = mock_receipt
@@ -254,14 +268,14 @@ async def test_public_receipt_text_endpoint_success(client: TestClient,
         user_id=1,
         products=[{
             "name": "Public Test Product",
-            "price": Decimal("15.50"),
-            "quantity": Decimal("2"),
-            "total": Decimal("31.00"),
+            "price": 1550,
+            "quantity": 2,
+            "total": 3100,
         }],
         payment_type=PaymentType.CASH,
-        payment_amount=Decimal("40.00"),
-        total_amount=Decimal("31.00"),
-        rest_amount=Decimal("9.00"),
+        payment_amount=4000,
+        total_amount=3100,
+        rest_amount=900,
         created=datetime.now(),
     )
     receipt_repo.get_by_public_id.return_value = mock_receipt
@@ -311,3 +325,68 @@ async def test_public_receipt_text_endpoint_invalid_width(client: TestClient,
 
     assert response_min.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
     assert response_max.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_select_fields_default_skips_products():
+    """Test products are not selected for list by default"""
+    assert "products" not in select_fields(None, include_products=False)
+    assert "products" in select_fields(None, include_products=True)
+    assert select_fields("id, total_amount,id", include_products=False) == ["id", "total_amount"]
+
+
+def test_select_fields_unknown_field():
+    """Test requesting unknown field is rejected"""
+    with pytest.raises(HTTPException) as exc_info:
+        select_fields("id,user_id", include_products=False)
+
+    assert exc_info.value.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_create_receipt_endpoint_validates_body(app, interactor: ReceiptInteractor, receipt_repo: AsyncMock,
+                                                idempotency_interactor, monkeypatch):
+    """Test receipt body is validated from raw JSON with field constraints and limited in size"""
+    app.dependency_overrides[get_current_user_id] = lambda: 1
+    app.dependency_overrides[get_current_active_user_id] = lambda: 1
+    app.dependency_overrides[get_receipt_interactor] = lambda: interactor
+    app.dependency_overrides[get_idempotency_interactor] = lambda: idempotency_interactor
+    receipt_repo.create.side_effect = lambda data: MagicMock(id=1, public_id="public_id", created=datetime.now(),
+                                                             **data)
+    client = TestClient(app)
+    body = {
+        "products": [{"name": f"Product {i}", "price": "1.05", "quantity": 2} for i in range(50000)],
+        "payment": {"payment_type": "cash", "amount": 2000},
+    }
+
+    response = client.post("/receipts/", json=body)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["total_amount"] == "105000.00"
+    assert len(response.json()["products"]) == 50000  # noqa: PLR2004
+
+    body["products"][1]["quantity"] = 0
+    response = client.post("/receipts/", json=body)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["detail"][0]["loc"] == ["body", "products", 1, "quantity"]
+
+    monkeypatch.setattr(settings, "RECEIPT_MAX_BODY_BYTES", 1000)
+    response = client.post("/receipts/", json=body)
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    assert "requestBody" in app.openapi()["paths"]["/receipts/"]["post"]
+
+
+def test_create_receipt_endpoint_rejects_total_overflow(app, interactor: ReceiptInteractor, receipt_repo: AsyncMock,
+                                                        idempotency_interactor):
+    """Test receipt with total which doesn`t fit db column is rejected before it reaches db"""
+    app.dependency_overrides[get_current_user_id] = lambda: 1
+    app.dependency_overrides[get_current_active_user_id] = lambda: 1
+    app.dependency_overrides[get_receipt_interactor] = lambda: interactor
+    app.dependency_overrides[get_idempotency_interactor] = lambda: idempotency_interactor
+    body = {
+        "products": [{"name": "Product", "price": "90000000000000000", "quantity": 2}],
+        "payment": {"payment_type": "cash", "amount": 1},
+    }
+
+    response = TestClient(app).post("/receipts/", json=body)
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "Receipt total is too large" in response.json()["detail"]
+    receipt_repo.create.assert_not_called()
@@ -0,0 +1,39 @@
+from datetime import datetime
+from decimal import Decimal
+
+import ujson
+from fastapi.encoders import jsonable_encoder
+
+from app.core.responses import PydanticJSONResponse
+from app.schemas.receipt import (PaymentType, ProductData, ReceiptListItem,
+                                 ReceiptListResponse)
+
+
+def test_pydantic_json_response_matches_default_encoding(valid_public_id: str):
+    """Test fast response encodes receipts page the same way as FastAPI`s default response"""
+    receipt = ReceiptListItem(
+        id=1,
+        public_id=valid_public_id,
+        products=[ProductData(name="Test Product", price=Decimal("10.50"), quantity=2, total=Decimal("21.00"))],
+        payment_type=PaymentType.CASH,
+        payment_amount=Decimal("25.00"),
+        total_amount=Decimal("21.00"),
+        rest_amount=Decimal("4.00"),
+        created=datetime.now(),
+    )
+    page = ReceiptListResponse.model_construct(items=[receipt], total=1, limit=10, offset=0)
+
+    response = PydanticJSONResponse(page)
+
+    assert ujson.loads(response.body) == jsonable_encoder(page)
+    assert response.headers["content-type"] == "application/json"
+
+
+def test_pydantic_json_response_exclude_unset(valid_public_id: str):
+    """Test not selected receipt fields are not returned"""
+    receipt = ReceiptListItem.model_validate({"id": 1, "public_id": valid_public_id})
+    page = ReceiptListResponse.model_construct(items=[receipt], total=1, limit=10, offset=0)
+
+    response = PydanticJSONResponse(page, exclude_unset=True)
+
+    assert ujson.loads(response.body)["items"] == [{"id": 1, "public_id": valid_public_id}]
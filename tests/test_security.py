@@ -0,0 +1,78 @@
+from time import time
+
+import pytest
+from fastapi import HTTPException, status
+from jose import jwt
+
+from app.conf.settings import settings
+from app.core import security
+from app.core.cache import LRUCache
+from app.core.security import (create_access_token, decode_access_token,
+                               get_current_user_id)
+
+
+@pytest.fixture(autouse=True)
+def token_cache(monkeypatch):
+    """Fresh verified tokens cache for every test"""
+    cache = LRUCache(maxsize=2)
+    monkeypatch.setattr(security, "token_cache", cache)
+    return cache
+
+
+def test_decode_access_token_cached(token_cache: LRUCache, monkeypatch):
+    """Test second decoding of the same token is served from cache"""
+    token, _ = create_access_token(data={"sub": "1"})
+
+    assert decode_access_token(token) == 1
+
+    def fail_decode(*args, **kwargs):
+        raise AssertionError("jwt.decode must not be called for cached token")
+
+    monkeypatch.setattr(security.jwt, "decode", fail_decode)
+
+    assert decode_access_token(token) == 1
+    assert token_cache.hits == 1
+    assert token_cache.misses == 1
+
+
+def test_decode_access_token_cached_expired(token_cache: LRUCache):
+    """Test expired cache entry is evicted and token is decoded again"""
+    token, _ = create_access_token(data={"sub": "1"})
+    decode_access_token(token)
+
+    key = next(iter(token_cache._data))
+    token_cache.set(key, (1, time() - 1))
+
+    assert decode_access_token(token) == 1
+    assert token_cache.get(key)[1] > time()
+
+
+def test_decode_access_token_lru_eviction(token_cache: LRUCache):
+    """Test cache size is bounded"""
+    for user_id in range(5):
+        token, _ = create_access_token(data={"sub": str(user_id)})
+        decode_access_token(token)
+
+    assert len(token_cache) == token_cache.maxsize
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_id_invalid_token(token_cache: LRUCache):
+    """Test invalid token is rejected and not cached"""
+    with pytest.raises(HTTPException) as exc_info:
+        await get_current_user_id("invalid_token")
+
+    assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+    assert len(token_cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_id_token_without_exp(token_cache: LRUCache):
+    """Test signed token without expiration is rejected as invalid instead of failing"""
+    token = jwt.encode({"sub": "1"}, settings.SECRET_KEY, algorithm=settings.JWT_ENCODE_ALGORITHM)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await get_current_user_id(token)
+
+    assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+    assert len(token_cache) == 0
@@ -0,0 +1,133 @@
+from unittest.mock import MagicMock
+
+import pytest
+import ujson
+from fastapi import FastAPI, status
+from fastapi.testclient import TestClient
+
+from app.api.status import router as status_router
+from app.conf.settings import settings
+from app.core.worker_stats import read_workers_stats
+from app.server import Master, worker_pool_size
+
+
+@pytest.fixture
+def stats_dir(tmp_path, monkeypatch):
+    """Stats dir with two workers and one broken file"""
+    (tmp_path / "worker-1.json").write_text(
+        ujson.dumps({"pid": 1, "requests": 10, "connections": 1, "rss_mb": 80, "single_flight": {"saved": 7}}),
+    )
+    (tmp_path / "worker-2.json").write_text(
+        ujson.dumps({
+            "pid": 2,
+            "requests": 5,
+            "connections": 2,
+            "rss_mb": 90,
+            "caches": {"user": {"l1_hits": 2, "l2_hits": 1, "misses": 1}},
+        }),
+    )
+    (tmp_path / "worker-3.json").write_text("{")
+    monkeypatch.setattr(settings, "WORKER_STATS_DIR", tmp_path)
+    return tmp_path
+
+
+def test_worker_pool_size(monkeypatch):
+    """Connections budget is divided between workers, every worker has at least one connection"""
+    monkeypatch.setattr(settings, "DB_POOL_BUDGET", 100)
+
+    assert worker_pool_size(4) == 25  # noqa: PLR2004
+    assert worker_pool_size(300) == 1
+
+
+def exited_worker(exitcode: int) -> MagicMock:
+    """Process of exited worker"""
+    return MagicMock(pid=100, exitcode=exitcode, **{"is_alive.return_value": False})
+
+
+@pytest.fixture
+def master(tmp_path, monkeypatch):
+    """Master with one slot whose every worker crashes at once"""
+    monkeypatch.setattr(settings, "WORKER_RESTART_DELAY_SECONDS", 1)
+    monkeypatch.setattr(settings, "WORKER_RESTART_MAX_DELAY_SECONDS", 4)
+    monkeypatch.setattr(settings, "WORKER_CRASH_LIMIT", 5)
+    monkeypatch.setattr(settings, "WORKER_CRASH_WINDOW_SECONDS", 60)
+    master = Master(MagicMock(), workers=1, stats_dir=tmp_path)
+    master.spawn = MagicMock(side_effect=lambda _slot: exited_worker(1))
+    master.processes = [exited_worker(1)]
+    return master
+
+
+def test_master_restarts_crashed_worker_with_backoff(master):
+    """Delay before restart doubles with every consecutive crash up to max"""
+    spawned_at = []
+    for now in range(20):
+        master.supervise(float(now))
+        spawned_at += [now] * (master.spawn.call_count - len(spawned_at))
+
+    # Crash of spawned worker is noticed on the next tick
+    assert spawned_at == [1, 4, 9, 14]
+    assert master.should_exit is True
+    assert master.exit_code == 1
+
+
+def test_master_forgets_crashes_after_clean_exit_and_window(master):
+    """Worker exiting by itself is restarted at once, old crashes don`t count"""
+    master.supervise(0.0)
+    master.supervise(1.0)
+    master.processes = [exited_worker(0)]
+    master.supervise(2.0)
+    master.processes = [exited_worker(1)]
+    master.supervise(3.0)
+    master.supervise(4.0)
+    master.processes = [exited_worker(1)]
+    master.supervise(100.0)
+
+    assert master.spawn.call_count == 3  # noqa: PLR2004
+    assert master.restart_at == {0: 101.0}
+    assert master.should_exit is False
+
+
+def test_read_workers_stats_skips_broken_files(stats_dir):
+    """Partially written stats are skipped"""
+    assert [stats["pid"] for stats in read_workers_stats(stats_dir)] == [1, 2]
+
+
+@pytest.fixture
+def status_client(monkeypatch):
+    """Client of app with status endpoint enabled by token"""
+    monkeypatch.setattr(settings, "STATUS_TOKEN", "status-token")
+    app = FastAPI()
+    app.include_router(status_router, prefix="/api/status")
+    return TestClient(app)
+
+
+def test_status_aggregates_workers(stats_dir, status_client):
+    """Status endpoint returns workers stats and their totals"""
+    response = status_client.get("/api/status/", headers={"X-Status-Token": "status-token"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["total"] == {
+        "workers": 2,
+        "requests": 15,
+        "connections": 3,
+        "rss_mb": 170,
+        "single_flight_saved": 7,
+        "cache_hit_rates": {"user": 0.75},
+    }
+
+
+@pytest.mark.parametrize("token", [None, "wrong"])
+def test_status_requires_token(stats_dir, status_client, token):
+    """Status is hidden from requests without configured token"""
+    headers = {"X-Status-Token": token} if token else {}
+
+    assert status_client.get("/api/status/", headers=headers).status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_status_disabled_without_token(stats_dir, status_client, monkeypatch):
+    """Status is disabled when token is not configured"""
+    monkeypatch.setattr(settings, "STATUS_TOKEN", None)
+
+    response = status_client.get("/api/status/", headers={"X-Status-Token": "status-token"})
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,217 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from time import time
+
+import pytest
+from pydantic import BaseModel
+
+from app.core.resp import RespClient, RespError, RespServer
+from app.core.shared_cache import HEADER, TwoTierCache
+
+
+class Profile(BaseModel):
+    """Cached value"""
+    id: int
+    name: str
+
+
+@pytest.fixture
+async def resp_server():
+    """Stand-in shared store"""
+    server = RespServer()
+    port = await server.start()
+    yield server, port
+    await server.close()
+
+
+@pytest.fixture
+async def client(resp_server):
+    """Client of stand-in shared store"""
+    _, port = resp_server
+    client = RespClient("127.0.0.1", port)
+    yield client
+    await client.close()
+
+
+def make_cache(client: RespClient | None, **kwargs) -> TwoTierCache:
+    """Cache of profiles like one worker has"""
+    return TwoTierCache("profile", Profile, **{"ttl": 60, "l1_size": 10, "l1_ttl": 5, "client": client, **kwargs})
+
+
+async def test_client_commands(client: RespClient):
+    """Client talks to stand-in server with Redis commands"""
+    assert await client.ping()
+    assert await client.get("key") is None
+
+    await client.set("key", b"\x00binary\r\n")
+    assert await client.get("key") == b"\x00binary\r\n"
+
+    await client.set("short", b"value", ttl_ms=1)
+    await asyncio.sleep(0.01)
+    assert await client.get("short") is None
+
+    assert await client.delete("key", "missing") == 1
+    with pytest.raises(RespError):
+        await client.execute("UNKNOWN")
+
+
+async def test_value_shared_between_workers(client: RespClient):
+    """Value loaded by one worker is served to another one from shared tier"""
+    first, second = make_cache(client), make_cache(client)
+    loads = []
+
+    async def load():
+        loads.append(1)
+        return Profile(id=1, name="Test")
+
+    assert await first.get_or_load(1, load) == Profile(id=1, name="Test")
+    assert await second.get_or_load(1, load) == Profile(id=1, name="Test")
+    assert await second.get_or_load(1, load) == Profile(id=1, name="Test")
+
+    assert len(loads) == 1
+    assert second.stats()["l2_hits"] == 1
+    assert second.stats()["l1_hits"] == 1
+    assert second.hit_rate == 1.0
+
+
+async def test_delete_invalidates_shared_tier(client: RespClient):
+    """Deleted value is loaded again by other workers after their short L1 ttl"""
+    first, second = make_cache(client, l1_ttl=0), make_cache(client, l1_ttl=0)
+    await first.set(1, Profile(id=1, name="Old"))
+
+    await second.delete(1)
+
+    assert await first.get(1) is None
+
+
+async def test_big_values_are_compressed():
+    """Big values are stored compressed and decoded back"""
+    cache = make_cache(None)
+    profile = Profile(id=1, name="x" * 10000)
+
+    payload = cache.encode(profile, time() + 60, 0.1)
+    value, _, delta = cache.decode(payload)
+
+    assert len(payload) < len(profile.name)
+    assert HEADER.unpack_from(payload)[2] == 1
+    assert value == profile
+    assert delta == 0.1  # noqa: PLR2004
+
+
+async def test_early_refresh_before_expiration(monkeypatch):
+    """Value close to expiration with slow load is refreshed before it expires"""
+    cache = make_cache(None)
+    cache.l1.set(1, (Profile(id=1, name="Old"), time() + 1, 10))
+
+    async def load():
+        return Profile(id=1, name="New")
+
+    # random() close to 1 means long exponential tail, so refresh happens for sure
+    monkeypatch.setattr("app.core.shared_cache.random.random", lambda: 0.99)
+    assert (await cache.get_or_load(1, load)).name == "New"
+    assert cache.stats()["early_refreshes"] == 1
+
+    # Fresh value with fast load is not refreshed
+    assert (await cache.get_or_load(1, load)).name == "New"
+    assert cache.stats()["early_refreshes"] == 1
+
+
+async def test_shared_tier_failure_falls_back_to_loader(resp_server):
+    """Cache keeps working as L1 only when shared store is down"""
+    server, port = resp_server
+    client = RespClient("127.0.0.1", port, timeout=0.5)
+    cache = make_cache(client)
+    await server.close()
+
+    async def load():
+        return Profile(id=1, name="Test")
+
+    assert await cache.get_or_load(1, load) == Profile(id=1, name="Test")
+    assert await cache.get_or_load(1, load) == Profile(id=1, name="Test")
+    assert cache.stats()["l2_errors"] == 2  # noqa: PLR2004
+    await client.close()
+
+
+async def test_truncated_reply_is_connection_error():
+    """Connection closed in the middle of reply is reported as connection failure"""
+    async def reply_partially(reader, writer):
+        await reader.readline()
+        writer.write(b"$10\r\nabc")
+        writer.close()
+
+    server = await asyncio.start_server(reply_partially, "127.0.0.1", 0)
+    client = RespClient("127.0.0.1", server.sockets[0].getsockname()[1])
+    cache = make_cache(client)
+
+    with pytest.raises(ConnectionError):
+        await client.get("key")
+    assert await cache.get(1) is None
+    assert cache.stats()["l2_errors"] == 1
+
+    server.close()
+    await server.wait_closed()
+    await client.close()
+
+
+async def test_corrupted_value_is_miss(client: RespClient):
+    """Value which can`t be decoded is treated as missing and replaced by loaded one"""
+    cache = make_cache(client)
+    await client.set("profile:1", HEADER.pack(time() + 60, 0, 0) + b"{broken")
+    await client.set("profile:2", b"short")
+
+    async def load():
+        return Profile(id=1, name="Test")
+
+    assert await cache.get_or_load(1, load) == Profile(id=1, name="Test")
+    assert await cache.get(2) is None
+    assert cache.stats()["l2_errors"] == 2  # noqa: PLR2004
+    assert await make_cache(client).get(1) == Profile(id=1, name="Test")
+
+
+def slow_loader(name: str) -> tuple[Callable[[], Awaitable[Profile]], asyncio.Event, asyncio.Event]:
+    """Loader which waits for release, with events of its start and release"""
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def load():
+        started.set()
+        await release.wait()
+        return Profile(id=1, name=name)
+
+    return load, started, release
+
+
+async def test_delete_during_load_discards_loaded_value():
+    """Value loaded before invalidation is not cached and new callers don`t join outdated load"""
+    cache = make_cache(None)
+    load_old, started, release = slow_loader("Old")
+
+    async def load_new():
+        return Profile(id=1, name="New")
+
+    loading = asyncio.create_task(cache.get_or_load(1, load_old))
+    await started.wait()
+    await cache.delete(1)
+
+    assert await cache.get_or_load(1, load_new) == Profile(id=1, name="New")
+    release.set()
+    assert await loading == Profile(id=1, name="Old")
+    assert await cache.get_or_load(1, load_new) == Profile(id=1, name="New")
+    assert cache.stats()["stale_loads"] == 1
+
+
+async def test_delete_in_other_worker_during_load(client: RespClient):
+    """Invalidation by other worker during load keeps loaded value out of both tiers"""
+    first, second = make_cache(client), make_cache(client)
+    load_old, started, release = slow_loader("Old")
+
+    async def load_new():
+        return Profile(id=1, name="New")
+
+    loading = asyncio.create_task(first.get_or_load(1, load_old))
+    await started.wait()
+    await second.delete(1)
+    release.set()
+    await loading
+
+    assert await first.get_or_load(1, load_new) == Profile(id=1, name="New")
+    assert await make_cache(client).get(1) == Profile(id=1, name="New")
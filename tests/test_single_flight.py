@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.single_flight import SingleFlight
+from app.interactors.receipt import ReceiptInteractor
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_result():
+    """Concurrent calls with the same key run once, calls with other keys run separately"""
+    single_flight = SingleFlight()
+    calls = []
+
+    async def func():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    results = await asyncio.gather(*[single_flight.do("key", func) for _ in range(5)], single_flight.do("other", func))
+
+    assert results == ["value"] * 6
+    assert len(calls) == 2  # noqa: PLR2004
+    assert single_flight.stats() == {"in_flight": 0, "calls": 2, "saved": 4}
+
+    await single_flight.do("key", func)
+    assert len(calls) == 3  # noqa: PLR2004
+
+
+@pytest.mark.asyncio
+async def test_failure_propagates_to_all_waiters():
+    """Exception of shared call is raised for every caller"""
+    single_flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("db error")
+
+    results = await asyncio.gather(*[single_flight.do("key", fail) for _ in range(3)], return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_doesnt_cancel_others():
+    """Waiters get result even if the first caller is cancelled"""
+    single_flight = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "value"
+
+    first = asyncio.create_task(single_flight.do("key", slow))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(single_flight.do("key", slow))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "value"
+
+
+@pytest.mark.asyncio
+async def test_public_receipt_text_is_coalesced(receipt_repo):
+    """Concurrent requests of the same public receipt make one db request"""
+    interactor = ReceiptInteractor(receipt_repo, single_flight=SingleFlight())
+
+    async def get_by_public_id(public_id):
+        await asyncio.sleep(0.01)
+
+    receipt_repo.get_by_public_id.side_effect = get_by_public_id
+
+    results = await asyncio.gather(
+        *[interactor.get_receipt_text("public-id", 32) for _ in range(10)],
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, HTTPException) for result in results)
+    receipt_repo.get_by_public_id.assert_awaited_once_with("public-id")
+    assert interactor.single_flight.saved == 9  # noqa: PLR2004
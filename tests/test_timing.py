@@ -0,0 +1,58 @@
+from unittest.mock import MagicMock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.timing import ServerTimingMiddleware, format_server_timing, span
+
+
+def make_client(*, emit_header: bool, logger: MagicMock) -> TestClient:
+    """Client for app with one endpoint recording spans"""
+    app = FastAPI()
+    app.add_middleware(ServerTimingMiddleware, logger=logger, emit_header=emit_header, access_log=True)
+
+    @app.get("/timed")
+    async def timed():
+        with span("db.async_get"):
+            pass
+        with span("db.async_get"):
+            pass
+        with span("format"):
+            pass
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_server_timing_header():
+    """Test spans of request are sent in Server-Timing header and access log"""
+    logger = MagicMock()
+    client = make_client(emit_header=True, logger=logger)
+
+    response = client.get("/timed")
+
+    server_timing = response.headers["server-timing"]
+    assert "db.async_get;dur=" in server_timing
+    assert 'desc="2 calls"' in server_timing
+    assert "format;dur=" in server_timing
+    assert "total;dur=" in server_timing
+    assert logger.log.call_args[0][0]["server_timing"] == server_timing
+
+
+def test_server_timing_header_disabled():
+    """Test timings are only logged when header is disabled"""
+    logger = MagicMock()
+    client = make_client(emit_header=False, logger=logger)
+
+    response = client.get("/timed")
+
+    assert "server-timing" not in response.headers
+    assert "format;dur=" in logger.log.call_args[0][0]["server_timing"]
+
+
+def test_span_outside_request():
+    """Test spans outside of request are ignored"""
+    with span("format"):
+        pass
+
+    assert format_server_timing([], 1.0) == "total;dur=1.00"
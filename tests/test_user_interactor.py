@@ -1,4 +1,4 @@
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from fastapi import status
@@ -240,3 +240,58 @@ async def test_change_password_invalid_old_password(mock_user_interactor: UserIn
     mock_user_repo.get_by_id.assert_called_once_with(user_id)
     mock_pwd_context.verify.assert_called_once_with(old_password, hashed_password)
     mock_user_repo.update_password.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_user_cached(mock_user_interactor: UserInteractor,
+                               mock_user_repo: AsyncMock,
+                               mock_user: dict,
+                            ):
+    """Test user`s profile is read from db once and then served from cache"""
+    mock_user_repo.get_by_id.return_value = MagicMock(**mock_user)
+
+    first = await mock_user_interactor.get_user(mock_user["id"])
+    second = await mock_user_interactor.get_user(mock_user["id"])
+
+    assert first == second
+    assert first.email == mock_user["email"]
+    assert not hasattr(first, "password")
+    mock_user_repo.get_by_id.assert_called_once_with(mock_user["id"])
+
+
+@pytest.mark.asyncio
+async def test_update_user_invalidates_cache(mock_user_interactor: UserInteractor,
+                                             mock_user_repo: AsyncMock,
+                                             mock_user: dict,
+                                        ):
+    """Test updated user`s profile is not served from cache"""
+    user_id = mock_user["id"]
+    mock_user_repo.get_by_id.return_value = MagicMock(**mock_user)
+    await mock_user_interactor.get_user(user_id)
+
+    mock_user_repo.update.return_value = MagicMock(**{**mock_user, "first_name": "Updated"})
+    mock_user_repo.get_by_id.return_value = MagicMock(**{**mock_user, "first_name": "Updated"})
+    await mock_user_interactor.update_user(user_id, UserUpdateDTO(first_name="Updated"))
+
+    result = await mock_user_interactor.get_user(user_id)
+    expected_db_reads = 2
+
+    assert result.first_name == "Updated"
+    assert mock_user_repo.get_by_id.call_count == expected_db_reads
+
+
+@pytest.mark.asyncio
+async def test_change_password_invalidates_cache(mock_user_interactor: UserInteractor,
+                                                 mock_user_repo: AsyncMock,
+                                                 mock_user: dict,
+                                            ):
+    """Test changing password drops cached user`s profile"""
+    user_id = mock_user["id"]
+    mock_user_repo.get_by_id.return_value = MagicMock(**mock_user)
+    await mock_user_interactor.get_user(user_id)
+
+    with patch("app.interactors.user.verify_password", return_value=True), \
+         patch("app.interactors.user.get_password_hash", return_value="new_hashed_password"):
+        await mock_user_interactor.change_password(user_id, "old_password", "new_password")
+
+    assert await mock_user_interactor.cache.get(user_id) is None
@@ -0,0 +1,227 @@
+import asyncio
+from datetime import UTC, datetime
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.exc import DBAPIError
+
+from app.db.write_behind import (ReceiptJournal, ReceiptWriteBehind, assign_journals,
+                                 slot_journal_path, slot_journals)
+from app.interactors.receipt import ReceiptInteractor
+from app.schemas.receipt import PaymentCreate, PaymentType, ReceiptCreateDTO
+
+
+def make_receipt_data(public_id: str) -> dict:
+    """Receipt data accepted by write-behind queue"""
+    return {
+        "user_id": 1,
+        "public_id": public_id,
+        "total_amount": 2100,
+        "payment_type": PaymentType.CASH,
+        "payment_amount": 2500,
+        "rest_amount": 400,
+        "products": [{"name": "Test Product", "price": 1050, "quantity": 2, "total": 2100}],
+        "created": datetime.now(UTC),
+    }
+
+
+@pytest.fixture
+def journal(tmp_path: Path) -> ReceiptJournal:
+    """Journal in temporary directory"""
+    return ReceiptJournal(tmp_path / "receipts.journal")
+
+
+def db_error(sqlstate: str, message: str) -> DBAPIError:
+    """Error raised by db layer for asyncpg error with SQLSTATE"""
+    orig = Exception(message)
+    orig.sqlstate = sqlstate
+    return DBAPIError("INSERT INTO receipts", {}, orig)
+
+
+@pytest.fixture
+def write_behind_db():
+    """Mocked db"""
+    return AsyncMock()
+
+
+@pytest.fixture
+def write_behind(write_behind_db, journal: ReceiptJournal) -> ReceiptWriteBehind:
+    """Write-behind queue with mocked db"""
+    return ReceiptWriteBehind(
+        db=write_behind_db,
+        journal=journal,
+        logger=MagicMock(),
+        max_size=10,
+        batch_size=100,
+        flush_interval=0.01,
+    )
+
+
+def test_journal_replay_skips_flushed(journal: ReceiptJournal):
+    """Test only receipts not written to db are replayed"""
+    journal.append([make_receipt_data("first"), make_receipt_data("second")])
+    journal.mark_flushed(["first"])
+    with journal.path.open("a") as f:
+        f.write('{"receipt": {"public_id": "partial"')
+
+    replayed = journal.replay()
+
+    assert [record["public_id"] for record in replayed] == ["second"]
+    assert replayed[0]["total_amount"] == 2100  # noqa: PLR2004
+    assert replayed[0]["payment_type"] == PaymentType.CASH
+
+
+
+def test_assign_journals_to_worker_slots(journal: ReceiptJournal):
+    """Test journals of slots which won`t run are replayed by running slots and nothing is replayed twice"""
+    ReceiptJournal(slot_journal_path(journal.path, 0)).append([make_receipt_data("slot0")])
+    ReceiptJournal(slot_journal_path(journal.path, 1)).append([make_receipt_data("slot1")])
+    ReceiptJournal(slot_journal_path(journal.path, 3)).append([make_receipt_data("slot3")])
+    journal.append([make_receipt_data("single")])
+    with journal.path.open("a") as f:
+        f.write('{"receipt": {"public_id": "partial"')
+
+    assign_journals(journal.path, workers=2)
+
+    assert not journal.path.exists()
+    assert sorted(slot_journals(journal.path)) == [0, 1]
+    replayed = {
+        slot: [record["public_id"] for record in ReceiptJournal(path).replay()]
+        for slot, path in slot_journals(journal.path).items()
+    }
+    assert replayed == {0: ["slot0", "single"], 1: ["slot1", "slot3"]}
+
+@pytest.mark.asyncio
+async def test_write_behind_flushes_batch(write_behind: ReceiptWriteBehind,
+                                          write_behind_db: AsyncMock,
+                                          journal: ReceiptJournal,
+                                        ):
+    """Test concurrently accepted receipts are written to db with one insert"""
+    await write_behind.start()
+
+    await asyncio.gather(*[write_behind.put(make_receipt_data(f"receipt_{i}")) for i in range(5)])
+    assert write_behind.get_pending("receipt_0") is not None
+
+    await write_behind.stop()
+
+    write_behind_db.insert_many.assert_called_once()
+    rows = write_behind_db.insert_many.call_args[0][1]
+    assert len(rows) == 5  # noqa: PLR2004
+    assert write_behind.pending_count == 0
+    assert journal.replay() == []
+
+
+@pytest.mark.asyncio
+async def test_write_behind_notifies_flushed(write_behind: ReceiptWriteBehind):
+    """Test flushed batch is passed to callback after it is written, e.g. to invalidate caches"""
+    write_behind.on_flushed = AsyncMock()
+    await write_behind.start()
+
+    await write_behind.put(make_receipt_data("receipt"))
+    await write_behind.stop()
+
+    batch = write_behind.on_flushed.call_args[0][0]
+    assert [record["public_id"] for record in batch] == ["receipt"]
+
+
+@pytest.mark.asyncio
+async def test_write_behind_replays_journal_on_start(write_behind: ReceiptWriteBehind,
+                                                     write_behind_db: AsyncMock,
+                                                     journal: ReceiptJournal,
+                                                    ):
+    """Test receipts from journal are available and written to db after restart"""
+    journal.append([make_receipt_data("not_flushed")])
+
+    await write_behind.start()
+    assert write_behind.get_pending("not_flushed") is not None
+    await write_behind.stop()
+
+    rows = write_behind_db.insert_many.call_args[0][1]
+    assert [row["public_id"] for row in rows] == ["not_flushed"]
+    assert write_behind_db.insert_many.call_args.kwargs["conflict_columns"] == ["public_id"]
+
+
+@pytest.mark.asyncio
+async def test_accept_receipt_available_by_public_id(receipt_repo: AsyncMock,
+                                                     write_behind: ReceiptWriteBehind,
+                                                     valid_products,
+                                                     valid_payment: PaymentCreate,
+                                                    ):
+    """Test accepted receipt can be read by public_id before it is written to db"""
+    interactor = ReceiptInteractor(receipt_repo, write_behind)
+    await write_behind.start()
+
+    accepted = await interactor.accept_receipt(1, ReceiptCreateDTO(products=valid_products, payment=valid_payment))
+    text = await interactor.get_receipt_text(accepted.public_id, 32)
+
+    assert accepted.total_amount == 4675  # noqa: PLR2004
+    assert "46.75" in text
+    receipt_repo.create.assert_not_called()
+    receipt_repo.get_by_public_id.assert_not_called()
+
+    await write_behind.stop()
+
+
+@pytest.mark.asyncio
+async def test_write_behind_dead_letters_bad_receipt(write_behind: ReceiptWriteBehind,
+                                                     write_behind_db: AsyncMock,
+                                                     journal: ReceiptJournal,
+                                                    ):
+    """Test receipt which db refuses while being available doesn`t block others and is moved to dead-letter file"""
+    def insert_many(_table, rows, **_kwargs):
+        if any(row["public_id"] == "bad" for row in rows):
+            raise db_error("22003", "value out of int64 range")
+        return []
+
+    write_behind_db.insert_many.side_effect = insert_many
+    await write_behind.start()
+    await asyncio.gather(*[write_behind.put(make_receipt_data(public_id)) for public_id in ("first", "bad", "last")])
+    await write_behind.stop()
+
+    written = [call.args[1] for call in write_behind_db.insert_many.call_args_list if len(call.args[1]) == 1]
+    assert [rows[0]["public_id"] for rows in written] == ["first", "bad", "last"]
+    assert write_behind.pending_count == 0
+    assert journal.replay() == []
+    [dead] = journal.dead_letter_path.read_text().splitlines()
+    assert '"public_id":"bad"' in dead
+    assert "int64" in dead
+
+
+@pytest.mark.asyncio
+async def test_write_behind_keeps_receipts_while_db_unavailable(write_behind: ReceiptWriteBehind,
+                                                                write_behind_db: AsyncMock,
+                                                                journal: ReceiptJournal,
+                                                               ):
+    """Test receipts stay in journal and are not dead-lettered when db is down"""
+    write_behind_db.insert_many.side_effect = ConnectionError
+    write_behind_db.check.side_effect = ConnectionError
+    await write_behind.start()
+    await write_behind.put(make_receipt_data("receipt"))
+
+    with pytest.raises(ConnectionError):
+        await write_behind.stop()
+
+    assert [record["public_id"] for record in journal.replay()] == ["receipt"]
+    assert not journal.dead_letter_path.exists()
+
+
+@pytest.mark.asyncio
+async def test_write_behind_retries_transient_error(write_behind: ReceiptWriteBehind,
+                                                    write_behind_db: AsyncMock,
+                                                    journal: ReceiptJournal,
+                                                   ):
+    """Test serialization failure while db is available is retried instead of dead-lettered"""
+    write_behind_db.insert_many.side_effect = [db_error("40001", "could not serialize access"), []]
+    await write_behind.start()
+    await write_behind.put(make_receipt_data("receipt"))
+
+    for _ in range(100):
+        if write_behind.pending_count == 0:
+            break
+        await asyncio.sleep(0.01)
+    await write_behind.stop()
+
+    assert write_behind_db.insert_many.call_count == 2  # noqa: PLR2004
+    assert journal.replay() == []
+    assert not journal.dead_letter_path.exists()